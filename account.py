@@ -1,69 +1,328 @@
 import os
+import bisect
+import threading
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-from helper import validate_date_format, validate_amount
+from helper import validate_date_format, validate_amount, validate_dates, validate_amounts, to_cents, from_cents
+from ledger_index import LedgerIndex, BalanceHistory, transaction_keys, KEY_SCALE
+from ledger_schema import compact_ledger, concat_ledger
+from storage import LedgerStore
+from metrics import METRICS
 from datetime import datetime
 
+class LedgerSnapshot:
+    """
+    A published version of the ledger frame and its index. Writers never
+    mutate a published frame or index, so readers need no lock or copy.
+    """
+
+    def __init__(self, version, df, index, store=None):
+        self.version = version
+        self.df = df
+        self._index = index
+        # Statements read a store shared with other processes directly
+        self.store = store
+        self._balance_history = None
+
+    @property
+    def ledger_index(self):
+        # Built on first use when the writer had not built it yet
+        if self._index is None:
+            self._index = LedgerIndex(self.df)
+        return self._index
+
+    @property
+    def balance_history(self):
+        # Built once per published version, on the first point-in-time query
+        if self._balance_history is None:
+            self._balance_history = BalanceHistory(self.df)
+        return self._balance_history
+
+
 class Account:
-    def __init__(self, config, test_enabled=False):
+    def __init__(self, config, test_enabled=False, store=None):
 
+        # Called with (account_id, date) after a posting, or (None, None) when the whole ledger changes
+        self.listeners = []
+        # Writers are serialized; readers take snapshot() without locking
+        self._write_lock = threading.RLock()
+        self.version = 0
+        self.store = store
+        # With a shared store: each account's version when this process last held its lock, and whether it holds locks now
+        self._store_versions = {}
+        self._store_transaction = False
         self.df = None
         self.config = config
 
         if not test_enabled:
-            filename = "/data.txt"
             pd.options.display.float_format = "{:,.2f}".format
-            self.df = pd.read_csv(os.path.dirname(os.path.realpath(__file__)) + filename, delimiter=',', encoding="utf-8", skipinitialspace=True)
+            if self.store is None and config.get("storage_dir"):
+                self.store = LedgerStore(os.path.join(os.path.dirname(os.path.realpath(__file__)), config["storage_dir"], "ledger"))
+
+            if self.store is not None and not self.store.is_empty():
+                if self.shared:
+                    # Read before the ledger, so postings made in between are merged on first lock
+                    self._store_versions = self.store.versions()
+                # Postings logged since the last snapshot may have shifted later balances
+                self.df, logged_accounts = self.store.load()
+                self.rebuild_balances(logged_accounts)
+            else:
+                filename = "/data.txt"
+                self.df = pd.read_csv(os.path.dirname(os.path.realpath(__file__)) + filename, delimiter=',', encoding="utf-8", skipinitialspace=True)
+                if self.store is not None:
+                    self.store.compact(self.df)
 
         if self.df is None:
             self.df = pd.DataFrame(columns=['account_id', 'date', 'transaction_code', 'type', 'amount', 'balance'])
 
-    def compute_balance(self, account):
-        account_balances = self.df.sort_values(by=["transaction_code"])
-        new_balance = 0.0
-        for index, row in account_balances.iterrows():
-            if row["account_id"] == account:
-                if row["type"] == "D":
-                    new_balance += row["amount"]
-                elif row["type"] == "W":
-                    new_balance -= row["amount"]
+    @property
+    def df(self):
+        return self._df
 
-                account_balances.at[index, "balance"] = new_balance
+    @df.setter
+    def df(self, value):
+        self._df = compact_ledger(value) if value is not None else None
+        # The ledger index is rebuilt lazily from the new frame
+        self._index = None
+        self._publish()
+        self._notify(None, None)
 
-        self.df = account_balances
+    def _publish(self):
+        # Swapping in the new snapshot is a single atomic reference assignment
+        self.version += 1
+        self._snapshot = LedgerSnapshot(self.version, self._df, self._index, self.store if self.shared else None)
 
+    def snapshot(self):
+        """
+        The latest published version of the ledger, safe to read from any thread.
+        """
+        return self._snapshot
 
-    def clean_transaction(self, date, account, type, amount):
-        # Filter transactions for the same account_id and date
-        self.df["date"] = pd.to_numeric(self.df["date"], downcast='integer', errors='coerce')
-        filtered_df = self.df[(self.df["account_id"] == account) & (self.df["date"] == int(date))]
-        # Determine the latest running number
-        if not filtered_df.empty:
-            latest_transaction_code = filtered_df["transaction_code"].max()
-            latest_running_number = int(latest_transaction_code.split("-")[1])
-        else:
-            latest_running_number = 0
-
-        next_running_number = latest_running_number + 1
+    def _writable_df(self):
+        # Copy on write: the published frame is never changed in place
+        if self._df is self._snapshot.df:
+            METRICS.count("frames_copied")
+            self._df = self._df.copy()
+        return self._df
+
+    def _notify(self, account, date):
+        for listener in self.listeners:
+            listener(account, date)
+
+    @property
+    def ledger_index(self):
+        if self._index is None:
+            self._index = LedgerIndex(self._df)
+            # Share the index with the published snapshot of the same frame
+            if self._snapshot.df is self._df and self._snapshot._index is None:
+                self._snapshot._index = self._index
+        return self._index
+
+    def balance_as_of(self, account, date):
+        """
+        The account's balance at the end of a YYYYMMdd date, by binary search of its end-of-day balances.
+        """
+        return self.snapshot().balance_history.balance_as_of(account, date)
+
+    def balances_as_of(self, accounts, dates):
+        """
+        Balances at the end of each date for arrays of (account, YYYYMMdd date) pairs, in one vectorized call.
+        """
+        return self.snapshot().balance_history.balances_as_of(accounts, dates)
+
+    @property
+    def shared(self):
+        # Whether other processes post to the same store
+        return getattr(self.store, "shared", False)
+
+    @contextmanager
+    def shared_write(self, accounts=None):
+        """
+        Hold the write lock while posting to the accounts, or to every account
+        when None. With a shared store, the accounts are also locked in the
+        store for one transaction, in which every row logged commits together,
+        and the rows other processes have posted to them are merged in first,
+        so overdraft checks and running numbers cover them.
+        """
+        with self._write_lock:
+            if not self.shared or self._store_transaction:
+                yield
+                return
+            df, index = self._df, self._index
+            try:
+                with self.store.transaction(accounts) as versions:
+                    self._store_transaction = True
+                    self._merge_stored(versions)
+                    yield
+            except BaseException:
+                # Nothing was committed, so the ledger goes back to its last committed version
+                self._df, self._index = df, index
+                self._publish()
+                self._notify(None, None)
+                raise
+            finally:
+                self._store_transaction = False
+            self._store_versions.update(versions)
+
+    def _merge_stored(self, versions):
+        # An account locked by other transactions since this process last held it may have rows it has not seen
+        stale = [account for account, version in versions.items() if version - 1 != self._store_versions.get(account, 0)]
+        if not stale:
+            return
+        stored_df, _ = self.store.load(stale)
+        new_rows = []
+        for account, rows in stored_df.groupby("account_id", observed=True, sort=False):
+            _, _, keys = transaction_keys(rows["transaction_code"])
+            new_rows.append(rows[~np.isin(keys, self.ledger_index.keys.get(account, []))])
+        new_rows = pd.concat(new_rows) if new_rows else stored_df
+        if new_rows.empty:
+            return
+
+        self._df, self._index = self._insert_rows(new_rows)
+        self._publish()
+        for account, date in new_rows.groupby("account_id", observed=True)["date"].min().items():
+            self._notify(account, int(date))
+
+    def _persist(self, rows_df):
+        # Log new postings durably; called before they are published, so readers never see an unlogged posting
+        if self.store is None:
+            return
+        with METRICS.stage("account.persist"):
+            self.store.append(rows_df)
+
+    def _compact(self):
+        # Fold the log into a new snapshot of the published ledger once it grows large
+        if self.store is not None and self.store.wal_rows >= self.config.get("compact_every", 10000):
+            with METRICS.stage("account.compact"):
+                self.store.compact(self._df)
+
+    def _signed_amounts(self, df, positions):
+        # Signed amounts in integer cents, so running balances never drift
+        amounts = to_cents(df["amount"].iloc[positions].to_numpy(dtype=float))
+        types = df["type"].iloc[positions].to_numpy()
+        return np.where(types == "W", -amounts, np.where(np.isin(types, ["D", "I"]), amounts, 0))
+
+    def _rebalance(self, df, index, starts):
+        """
+        Recompute each account's running balance from its ledger entry
+        starts[account] onwards in one grouped cumsum, and refresh the
+        account's entries in index.
+        """
+        with METRICS.stage("account.rebalance"):
+            tails = [index.account_positions(account)[start:] for account, start in starts.items()]
+            lengths = np.array([len(tail) for tail in tails], dtype=np.int64)
+            positions = np.concatenate(tails).astype(np.int64) if tails else np.array([], dtype=np.int64)
+            METRICS.count("rows_scanned", len(positions))
+
+            # Each tail opens at the balance of the entry before it
+            opening_positions = np.array([index.account_positions(account)[start - 1] if start > 0 else -1
+                                          for account, start in starts.items()], dtype=np.int64)
+            opening_balances = np.zeros(len(starts), dtype=np.int64)
+            opened = opening_positions >= 0
+            opening_balances[opened] = to_cents(df["balance"].iloc[opening_positions[opened]].to_numpy(dtype=float))
+
+            cumulative = np.cumsum(self._signed_amounts(df, positions))
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            before = np.concatenate(([0], cumulative))[offsets[:-1]]
+            balances = np.repeat(opening_balances - before, lengths) + cumulative
+            df.iloc[positions, df.columns.get_loc("balance")] = from_cents(balances)
+            balance_column = df["balance"].to_numpy(dtype=float)
+
+            for (account, start), first, last in zip(starts.items(), offsets[:-1], offsets[1:]):
+                account_balances = balances[first:last]
+                index.update_balance(account, from_cents(account_balances[-1]))
+                index.update_month_ends(account, start, from_cents(account_balances))
+                index.update_suffix_minimums(account, start, account_balances,
+                                             lambda: to_cents(balance_column[index.account_positions(account)[:start]]))
+
+    def _insert_rows(self, new_rows):
+        """
+        Append new rows in one concat and slot them into a copy of the index,
+        duplicating only their accounts' entries, then rebalance each of those
+        accounts from its earliest new row. Returns the unpublished frame and index.
+        """
+        start = len(self._df)
+        df = concat_ledger([self._df, new_rows])
+        METRICS.count("frames_copied")
+        _, _, keys = transaction_keys(new_rows["transaction_code"])
+        rows_by_account = pd.Series(keys).groupby(new_rows["account_id"].to_numpy(), sort=False).indices
+
+        index = self.ledger_index.copy(*rows_by_account)
+        starts = {account: index.merge(account, keys[rows], start + rows) for account, rows in rows_by_account.items()}
+        self._rebalance(df, index, starts)
+        return df, index
+
+    def compute_balance(self, account):
+        # Full rebuild of one account's running balance
+        with self._write_lock, METRICS.stage("account.compute_balance"):
+            # The current index may be shared with the published snapshot, so the account is rebalanced into a copy
+            index = self.ledger_index.copy(account)
+            if account in index:
+                self._rebalance(self._writable_df(), index, {account: 0})
+            self._index = index
+            self._publish()
+
+    def rebuild_balances(self, accounts=None):
+        # Full rebuild of the accounts' running balances in one grouped cumsum
+        with self._write_lock, METRICS.stage("account.rebuild_balances"):
+            df = self._df if accounts is None else self._df[self._df["account_id"].isin(accounts)]
+            METRICS.count("rows_scanned", len(self._df))
+            if not df.empty:
+                METRICS.count("rows_sorted", len(df))
+                _, _, keys = transaction_keys(df["transaction_code"])
+                ordered = df.iloc[np.argsort(keys, kind="stable")]
+                signed = pd.Series(self._signed_amounts(ordered, np.arange(len(ordered))), index=ordered.index)
+                self._writable_df().loc[ordered.index, "balance"] = from_cents(signed.groupby(ordered["account_id"]).cumsum().to_numpy())
+            self._index = None
+            self._publish()
+
+    def post_transaction(self, date, account, type, amount):
+        """
+        Post one validated transaction without printing. Returns the new ledger row.
+        """
+        with self.shared_write([account]), METRICS.stage("account.post_transaction"):
+            if self.shared:
+                # Postings merged from other processes may have spent the balance checked before the lock
+                error = self.check_transaction(date, account, type, amount)
+                if error is not None:
+                    raise ValueError(error)
+            return self._post_transaction(date, account, type, amount)
+
+    def _post_transaction(self, date, account, type, amount):
+        # Determine the next running number for the same account_id and date
+        next_running_number = self.ledger_index.next_running_number(account, date)
         new_transaction_code = f"{date}-{next_running_number:02}"
 
         # Create the new row
         new_row = {
             "account_id": account,
-            "date": date,
+            "date": int(date),
             "transaction_code": new_transaction_code,
             "type": type.upper(),
             "amount": float(amount),
             "balance": 0.0,
         }
 
-        # Append the new row to the DataFrame
-        self.df = pd.concat([self.df, pd.DataFrame([new_row])], ignore_index=True)
-        self.df = self.df.sort_values(by=["account_id", "date", "transaction_code"]).reset_index(drop=True)
+        # Append the new row and slot it into a copy of the account's ordered ledger
+        df = concat_ledger([self._df, pd.DataFrame([new_row])])
+        METRICS.count("frames_copied")
+        index = self.ledger_index.copy(account)
+        start = index.insert(account, date, next_running_number, len(df) - 1)
 
-        # Recompute the account's balance
-        self.compute_balance(account)
+        # Recompute the account's balance from the insertion point forward
+        self._rebalance(df, index, {account: start})
+        self._persist(df.iloc[[len(df) - 1]])
+        self._df, self._index = df, index
+        self._publish()
+        self._compact()
+        self._notify(account, int(date))
+        return dict(new_row, balance=float(df["balance"].iat[len(df) - 1]))
+
+    def clean_transaction(self, date, account, type, amount):
+        self.post_transaction(date, account, type, amount)
 
-        account_balances = self.df[self.df["account_id"] == account].copy()
+        account_balances = self._df.iloc[self.ledger_index.account_positions(account)].copy()
         account_balances.rename({"date": self.config["date_col"], "transaction_code": self.config["tansaction_col"],
                                  "type": self.config["type_col"], "amount": self.config["amount_col"]},
                                 axis="columns", inplace=True)
@@ -72,42 +331,280 @@ class Account:
         print(account_balances[[self.config["date_col"], self.config["tansaction_col"], self.config["type_col"], self.config["amount_col"]]] )
         print("")
 
+    def post_interest(self, date, interest):
+        """
+        Post one I row per account dated date, appended in a single concat.
+        interest is a Series of amounts indexed by account_id; negative
+        amounts post interest adjustments.
+        """
+        with self.shared_write(interest.index), METRICS.stage("account.post_interest"):
+            self._post_interest(date, interest)
+
+    def _post_interest(self, date, interest):
+        interest = interest[interest != 0]
+        if interest.empty:
+            return
+
+        date = int(date)
+        new_rows = pd.DataFrame({
+            "account_id": interest.index,
+            "date": date,
+            "transaction_code": [f"{date}-{self.ledger_index.next_running_number(account, date):02}" for account in interest.index],
+            "type": "I",
+            "amount": interest.to_numpy(dtype=float),
+            "balance": 0.0,
+        })
+
+        # Each interest row is carried into every later balance of its account
+        df, index = self._insert_rows(new_rows)
+        self._persist(df.iloc[len(self._df):])
+        self._df, self._index = df, index
+        self._publish()
+        self._compact()
+        for account in interest.index:
+            self._notify(account, date)
+
+    def _validate_batch(self, lines):
+        """
+        Vectorized transaction validation of raw <Date> <Account> <Type> <Amount>
+        lines, with the same rules as validate_transactions_input. Returns the
+        parsed fields and the reason each invalid line was rejected.
+        """
+        with METRICS.stage("account.validate"):
+            METRICS.count("rows_scanned", len(lines))
+            return self._validate_lines(lines)
+
+    def _validate_lines(self, lines):
+        # A batch of no or only blank lines splits into fewer columns; the missing ones are filled as strings
+        fields = lines.astype(str).str.strip().str.split(r"[\s,]+", expand=True, regex=True).reindex(columns=range(5)).astype(str)
+        batch = pd.DataFrame({
+            "date": fields[0].fillna(""),
+            "account_id": fields[1],
+            "type": fields[2].fillna("").str.upper(),
+            "amount": fields[3].fillna(""),
+        })
+
+        valid_date, date_reasons = validate_dates(batch["date"])
+        valid_amount, amount_reasons = validate_amounts(batch["amount"])
+        batch["reason"] = np.select(
+            [(fields[3].isna() | fields[4].notna()).to_numpy(), ~valid_date, ~batch["type"].isin(["D", "W"]).to_numpy(), ~valid_amount],
+            ["Please enter a valid transaction details",
+             date_reasons,
+             "Type is not recognized. Type is D for deposit, W for withdrawal, case insensitive",
+             amount_reasons],
+            default="")
+        return batch
+
+    def _reject_overdrafts(self, batch):
+        """
+        Reject withdrawals that would take an account below zero on their date
+        or on any later date. The batch is merged with each account's ledger in
+        transaction order, after the ledger's rows of the same date, and the
+        ledger rows after the account's last batch row are covered by the
+        index's suffix minimums. Returns the reason each line is rejected, or "".
+        """
+        reasons = np.full(len(batch), "", dtype=object)
+        if batch.empty:
+            return reasons
+
+        codes, account_ids = pd.factorize(batch["account_id"])
+        amounts = to_cents(batch["amount"].to_numpy(dtype=float))
+        withdrawals = (batch["type"] == "W").to_numpy()
+        # Batch rows sort after the ledger's rows of the same date, then in batch order
+        batch_keys = batch["date"].astype(np.int64).to_numpy() * KEY_SCALE + KEY_SCALE - 1
+        first_keys = pd.Series(batch_keys).groupby(codes).min().to_numpy()
+        last_keys = pd.Series(batch_keys).groupby(codes).max().to_numpy()
+        deposits = pd.Series(np.where(withdrawals, 0, amounts)).groupby(codes).sum().to_numpy(dtype=np.int64)
+
+        # Only the ledger rows between an account's first and last batch rows interleave with the batch
+        opening_positions = np.full(len(account_ids), -1)
+        # Lowest ledger balance after the account's last batch row, which every batch deposit raises
+        tail_minimums = np.full(len(account_ids), np.iinfo(np.int64).max)
+        ledger_codes, ledger_keys, ledger_positions = [], [], []
+        for code, account in enumerate(account_ids):
+            keys, positions = self.ledger_index.keys.get(account, []), self.ledger_index.account_positions(account)
+            first, last = bisect.bisect_right(keys, first_keys[code]), bisect.bisect_right(keys, last_keys[code])
+            if first > 0:
+                opening_positions[code] = positions[first - 1]
+            if last < len(keys):
+                tail_minimums[code] = int(self.ledger_index.suffix_minimums[account][last]) + deposits[code]
+            ledger_codes += [code] * (last - first)
+            ledger_keys += keys[first:last]
+            ledger_positions += positions[first:last]
+        opened = opening_positions >= 0
+        opening_balances = np.zeros(len(account_ids), dtype=np.int64)
+        opening_balances[opened] = to_cents(self._df["balance"].iloc[opening_positions[opened]].to_numpy(dtype=float))
+
+        # Balances after each row with every batch deposit and no batch withdrawal, in merged order
+        merged_codes = np.concatenate((np.asarray(ledger_codes, dtype=np.int64), codes))
+        merged_keys = np.concatenate((np.asarray(ledger_keys, dtype=np.int64), batch_keys))
+        signed = np.concatenate((self._signed_amounts(self._df, ledger_positions), np.where(withdrawals, 0, amounts)))
+        withdrawn = np.concatenate((np.zeros(len(ledger_keys), dtype=np.int64), np.where(withdrawals, amounts, 0)))
+        order = np.lexsort((np.arange(len(merged_keys)), merged_keys, merged_codes))
+        merged_codes, signed, withdrawn = merged_codes[order], signed[order], withdrawn[order]
+        group_starts = np.searchsorted(merged_codes, merged_codes)
+        deposited = np.cumsum(signed)
+        balances = opening_balances[merged_codes] + deposited - np.concatenate(([0], deposited))[group_starts]
+
+        # Lowest balance after each row: the suffix minimum of the account's later merged rows and ledger tail
+        suffix_minimums = pd.Series(balances[::-1]).groupby(merged_codes[::-1]).cummin().to_numpy()[::-1]
+        same_account = np.append(merged_codes[1:] == merged_codes[:-1], False)
+        next_minimums = np.where(same_account, np.append(suffix_minimums[1:], 0), np.iinfo(np.int64).max)
+        later_minimums = np.minimum(next_minimums, tail_minimums[merged_codes])
+
+        # Accounts where accepting every withdrawal keeps each balance non-negative need no further pass
+        withdrawn_so_far = np.cumsum(withdrawn)
+        withdrawn_so_far -= np.concatenate(([0], withdrawn_so_far))[group_starts]
+        rows = order - len(ledger_keys)
+        is_withdrawal = rows >= 0
+        is_withdrawal[is_withdrawal] = withdrawals[rows[is_withdrawal]]
+        overdrawn = np.unique(merged_codes[is_withdrawal & (np.minimum(balances, later_minimums) - withdrawn_so_far < 0)])
+
+        # A rejected withdrawal raises every later balance, so those accounts are walked in order
+        current, total = -1, 0
+        checked = np.flatnonzero(is_withdrawal & np.isin(merged_codes, overdrawn))
+        for code, row, balance, later_minimum in zip(merged_codes[checked].tolist(), rows[checked].tolist(),
+                                                     balances[checked].tolist(), later_minimums[checked].tolist()):
+            if code != current:
+                current, total = code, 0
+            if balance - total - amounts[row] < 0:
+                reasons[row] = "You cannot withdraw more than your current balance."
+            elif later_minimum - total - amounts[row] < 0:
+                reasons[row] = f"You cannot withdraw {batch['amount'].iat[row]} on {batch['date'].iat[row]} as it would overdraw a later balance."
+            else:
+                total += int(amounts[row])
+        return reasons
+
+    def _post_batch(self, batch):
+        """
+        Post validated transactions in batch order with a single merge and
+        rebalance, rejecting withdrawals that would overdraw on their date or
+        any later date, as check_transaction does. Returns the
+        batch with each line's transaction_code and balance, or its reason.
+        """
+        with self.shared_write(batch["account_id"].unique()), METRICS.stage("account.post_batch"):
+            return self._post_accepted(batch)
+
+    def _post_accepted(self, batch):
+        reasons = self._reject_overdrafts(batch)
+        result = batch.assign(reason=reasons, transaction_code="", balance=np.nan)
+        batch = batch[reasons == ""]
+
+        if not batch.empty:
+            # Running numbers per account and day continue from the ledger, in batch order
+            dates = batch["date"].astype(np.int64)
+            previous_numbers = pd.Series([self.ledger_index.next_running_number(account, date) - 1
+                                          for account, date in zip(batch["account_id"], dates)], index=batch.index)
+            running_numbers = previous_numbers + batch.groupby(["account_id", dates]).cumcount() + 1
+
+            new_rows = pd.DataFrame({
+                "account_id": batch["account_id"],
+                "date": dates,
+                "transaction_code": batch["date"] + "-" + running_numbers.astype(str).str.zfill(2),
+                "type": batch["type"],
+                "amount": batch["amount"].astype(float),
+                "balance": 0.0,
+            })
+            start = len(self._df)
+            df, index = self._insert_rows(new_rows)
+            self._persist(df.iloc[start:])
+            self._df, self._index = df, index
+            self._publish()
+            self._compact()
+            for account, date in new_rows.groupby("account_id")["date"].min().items():
+                self._notify(account, date)
+
+            result.loc[batch.index, "transaction_code"] = new_rows["transaction_code"]
+            result.loc[batch.index, "balance"] = self._df["balance"].iloc[start:].to_numpy()
+        return result
+
+    def post_transactions(self, lines):
+        """
+        Validate and post a Series of <Date> <Account> <Type> <Amount> lines as
+        one batch. Returns each line's transaction_code and balance, or the
+        reason it was rejected.
+        """
+        batch = self._validate_batch(lines)
+        valid = batch["reason"] == ""
+        result = batch.assign(transaction_code="", balance=np.nan)
+        if valid.any():
+            result.loc[valid] = self._post_batch(batch[valid].drop(columns="reason"))
+        return result
+
+    def import_transactions(self, path, chunksize=100_000):
+        """
+        Bulk import a file of <Date> <Account> <Type> <Amount> lines. The file is
+        validated in chunks and the accepted transactions are appended with a
+        single merge and rebalance. Returns the rejected lines with a reason.
+        """
+        valid_chunks, rejected_chunks = [], []
+        with open(path, encoding="utf-8") as file:
+            line_number = 0
+            while True:
+                lines = [line for _, line in zip(range(chunksize), file)]
+                if not lines:
+                    break
+                lines = pd.Series(lines, index=range(line_number + 1, line_number + len(lines) + 1))
+                line_number += len(lines)
+                lines = lines[lines.str.strip() != ""]
+                if lines.empty:
+                    continue
+                batch = self._validate_batch(lines)
+                valid_chunks.append(batch[batch["reason"] == ""])
+                rejected_chunks.append(batch[batch["reason"] != ""])
+
+        batch = pd.concat(valid_chunks) if valid_chunks else pd.DataFrame(columns=["date", "account_id", "type", "amount", "reason"])
+        rejected = pd.concat(rejected_chunks) if rejected_chunks else batch.copy()
+
+        result = self._post_batch(batch.drop(columns="reason"))
+        overdrafts = result.loc[result["reason"] != "", rejected.columns]
+        rejected = pd.concat([rejected, overdrafts]).sort_index()
+
+        print(f"Imported {(result['reason'] == '').sum()} transactions, rejected {len(rejected)}.")
+        return rejected
+
+    def check_transaction(self, date, account, type, amount):
+        """
+        Validate one transaction's fields. Returns the reason it is rejected, or None.
+        """
+        if not validate_date_format(date):
+            return f"{date} is not a valid YYYYMMdd date."
+        if type.lower() not in ['d', 'w']:
+            return "Type is not recognized. Type is D for deposit, W for withdrawal, case insensitive"
+        if not validate_amount(amount):
+            return f"{amount} is not a valid amount."
+
+        if type.lower() == 'w':
+            if not self.shared:
+                return self._check_withdrawal(date, account, amount)
+            # Other processes' postings to the account are merged in before its balance is checked
+            with self.shared_write([account]):
+                return self._check_withdrawal(date, account, amount)
+        return None
+
+    def _check_withdrawal(self, date, account, amount):
+        # Check the withdrawal against the account's latest balance
+        if account not in self.ledger_index:
+            return "You cannot withdraw before you have a balance."
+        if to_cents(self.ledger_index.latest_balance(account)) - to_cents(float(amount)) < 0:
+            return "You cannot withdraw more than your current balance."
+        # A backdated withdrawal lowers every later balance too
+        if self.ledger_index.lowest_balance_from(account, date) - to_cents(float(amount)) < 0:
+            return f"You cannot withdraw {amount} on {date} as it would overdraw a later balance."
+        return None
+
     def validate_transactions_input(self, response):
         response_list = response.split()
 
         if len(response_list) != 4:
             print("Please enter a valid transaction details")
-        else:
-            date = response_list[0]
-            account = response_list[1]
-            type = response_list[2].lower()
-            amount = response_list[3]
-
-            if not validate_date_format(date):
-                print(f"{date} is not a valid YYYYMMdd date.")
-                return False
-            if type not in ['d', 'w']:
-                print(f"Type is not recognized. Type is D for deposit, W for withdrawal, case insensitive")
-                return False
-            if not validate_amount(amount):
-                print(f"{amount} is not a valid amount.")
-                return False
-
-            # Find the latest transaction_code for given account_id
-            if account in self.df['account_id'].values:
-                latest_transactions_balance = self.df[self.df["account_id"] == account].sort_values(by=["transaction_code"]).iloc[-1]
-
-                if not latest_transactions_balance.empty:
-                    if type == 'w':
-                        new_balance = latest_transactions_balance["balance"] - float(amount)
-                        if new_balance < 0:
-                            print("You cannot withdraw more than your current balance.")
-                            return False
-            else:
-                if type == 'w':
-                    print("You cannot withdraw before you have a balance.")
+            return False
 
-            return True
+        error = self.check_transaction(*response_list)
+        if error is not None:
+            print(error)
+            return False
+        return True
 
     def transactions_input(self):
         while True:
@@ -121,6 +618,10 @@ class Account:
                 if not validate_success:
                     continue
                 else:
-                    # Perform insert logic
-                    self.clean_transaction(*response.split())
+                    # Perform insert logic; another process may have spent the balance since it was checked
+                    try:
+                        self.clean_transaction(*response.split())
+                    except ValueError as error:
+                        print(error)
+                        continue
                     break
@@ -0,0 +1,208 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+import numpy as np
+import pandas as pd
+import yaml
+
+from account import Account
+from rule import Rule
+from compute_transaction import ComputeTransaction
+from helper import from_day_ordinals, to_day_ordinals
+from metrics import METRICS
+
+
+def synthetic_ledger(accounts, transactions_per_account, rules_per_year=12, year=2023, seed=0):
+    """
+    A ledger of accounts x transactions_per_account rows spread over a year,
+    with running balances, and rules_per_year interest rules.
+    """
+    rng = np.random.default_rng(seed)
+    first_day = to_day_ordinals([int(f"{year}0101")])[0]
+    rows = accounts * transactions_per_account
+
+    account_codes = np.repeat(np.arange(accounts), transactions_per_account)
+    days = first_day + np.sort(rng.integers(0, 365, size=(accounts, transactions_per_account)), axis=1).ravel()
+
+    # Each account opens with a deposit large enough to cover its small withdrawals
+    first_of_account = np.arange(rows) % transactions_per_account == 0
+    withdrawals = ~first_of_account & (rng.random(rows) < 0.3)
+    amounts = np.where(first_of_account, 10.0 * transactions_per_account, np.round(rng.uniform(1, 10, rows), 2))
+    signed = np.where(withdrawals, -amounts, amounts)
+
+    dates = from_day_ordinals(days)
+    account_ids = pd.Series(np.char.mod("AC%07d", account_codes))
+    running_numbers = pd.Series(np.ones(rows, dtype=np.int64)).groupby([account_codes, dates]).cumsum()
+    ledger_df = pd.DataFrame({
+        "account_id": account_ids,
+        "date": dates,
+        "transaction_code": pd.Series(dates.astype(str)) + "-" + running_numbers.astype(str).str.zfill(2),
+        "type": np.where(withdrawals, "W", "D"),
+        "amount": amounts,
+        "balance": pd.Series(signed).groupby(account_codes).cumsum().round(2),
+    })
+
+    rule_days = np.union1d([first_day], first_day + rng.choice(np.arange(1, 365), size=max(rules_per_year - 1, 0), replace=False))
+    rules_df = pd.DataFrame({
+        "date": from_day_ordinals(rule_days),
+        "rule_id": [f"RULE{number:02}" for number in range(1, len(rule_days) + 1)],
+        "rate": np.round(rng.uniform(1, 3, len(rule_days)), 2),
+    })
+    return ledger_df, rules_df
+
+
+def _setup(config, ledger_df, rules_df):
+    account = Account(config, test_enabled=True)
+    account.df = ledger_df.copy()
+    with redirect_stdout(io.StringIO()):
+        rule = Rule(config)
+    rule.df = rules_df.copy()
+    return account, rule
+
+
+def bench_post(config, account, rule, repeat, rng):
+    # Single postings on random accounts and days, including backdated ones
+    account_ids = account.df["account_id"].unique()
+    for account_id, date in zip(rng.choice(account_ids, repeat), rng.choice(account.df["date"].to_numpy(), repeat)):
+        account.clean_transaction(str(date), account_id, "D", "10.00")
+    return repeat
+
+
+def bench_rule_update(config, account, rule, repeat, rng):
+    for day in rng.choice(rule.timeline.days, repeat):
+        rule.clean_rule(str(from_day_ordinals([day])[0]), "BENCH", "2.00")
+    return repeat
+
+
+def bench_ingest(config, account, rule, repeat, rng):
+    # A file of deposits a tenth the size of the ledger
+    lines = max(len(account.df) // 10, 1000)
+    batch = pd.DataFrame({
+        "date": rng.choice(account.df["date"].to_numpy(), lines),
+        "account_id": rng.choice(account.df["account_id"].unique(), lines),
+        "type": "D",
+        "amount": "5.00",
+    })
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "transactions.txt")
+        batch.to_csv(path, sep=" ", header=False, index=False)
+        account.import_transactions(path)
+    return lines
+
+
+def bench_statement(config, account, rule, repeat, rng):
+    # A statement cache of size 0 so every statement is computed
+    compute_transaction = ComputeTransaction(dict(config, statement_cache_size=0))
+    for account_id, month in zip(rng.choice(account.df["account_id"].unique(), repeat), rng.choice(account.df["date"].to_numpy() // 100, repeat)):
+        compute_transaction.statement(account, rule, account_id, str(month))
+    return repeat
+
+
+def bench_month_end(config, account, rule, repeat, rng):
+    month = str(int(account.df["date"].max()) // 100)
+    interest = ComputeTransaction(config).post_month_end_interest(account, rule, month)
+    return len(interest)
+
+
+BENCHMARKS = {
+    "post": bench_post,
+    "rule_update": bench_rule_update,
+    "ingest": bench_ingest,
+    "statement": bench_statement,
+    "month_end": bench_month_end,
+}
+
+
+def run_benchmark(name, config, ledger_df, rules_df, repeat=20, memory=True, seed=0):
+    """
+    Time one benchmark on fresh copies of the ledger and rules, then measure
+    its peak traced memory in a second run. Setup is excluded from both.
+    """
+    account, rule = _setup(config, ledger_df, rules_df)
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        operations = BENCHMARKS[name](config, account, rule, repeat, np.random.default_rng(seed))
+        seconds = time.perf_counter() - start
+
+    peak_mb = None
+    if memory:
+        account, rule = _setup(config, ledger_df, rules_df)
+        with redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            BENCHMARKS[name](config, account, rule, repeat, np.random.default_rng(seed))
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+
+    return {"benchmark": name, "rows": len(ledger_df), "operations": operations, "seconds": seconds,
+            "throughput": operations / seconds if seconds > 0 else float("inf"), "peak_mb": peak_mb}
+
+
+def run_benchmarks(config, rows_list, transactions_per_account=100, rules_per_year=12, benchmarks=None, repeat=20, memory=True):
+    results = []
+    for rows in rows_list:
+        accounts = max(rows // transactions_per_account, 1)
+        ledger_df, rules_df = synthetic_ledger(accounts, min(transactions_per_account, rows), rules_per_year)
+        for name in benchmarks or BENCHMARKS:
+            results.append(run_benchmark(name, config, ledger_df, rules_df, repeat, memory))
+    return results
+
+
+def save_baseline(results, path):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+
+def compare_baseline(results, path, tolerance=0.25):
+    """
+    Results whose throughput fell more than tolerance below the saved baseline.
+    """
+    with open(path, encoding="utf-8") as file:
+        baseline = {(result["benchmark"], result["rows"]): result for result in json.load(file)}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["benchmark"], result["rows"]))
+        if previous is not None and result["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(dict(result, baseline_throughput=previous["throughput"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark postings, rule updates and statements on a synthetic ledger.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--transactions-per-account", type=int, default=100)
+    parser.add_argument("--rules-per-year", type=int, default=12)
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=20, help="operations per single-posting, rule and statement benchmark")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak memory run")
+    parser.add_argument("--save", help="save the results as a baseline JSON file")
+    parser.add_argument("--compare", help="compare the results against a baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop against the baseline")
+    parser.add_argument("--metrics", help="write per-stage timers and counters to this file (.json, otherwise Prometheus text)")
+    args = parser.parse_args()
+
+    with open(os.path.dirname(os.path.realpath(__file__)) + '/config.yaml') as f:
+        config = yaml.load(f, Loader=yaml.FullLoader)["settings"]
+    # Benchmarks run in memory only
+    config["storage_dir"] = None
+    METRICS.configure(dict(config, metrics_enabled=bool(args.metrics), metrics_file=args.metrics))
+
+    results = run_benchmarks(config, args.rows, args.transactions_per_account, args.rules_per_year,
+                             args.benchmarks, args.repeat, not args.no_memory)
+    print(pd.DataFrame(results).to_string(index=False, float_format="{:,.3f}".format))
+    METRICS.dump()
+
+    if args.save:
+        save_baseline(results, args.save)
+    if args.compare:
+        regressions = compare_baseline(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression['benchmark']} at {regression['rows']} rows, "
+                  f"{regression['throughput']:,.1f}/s against {regression['baseline_throughput']:,.1f}/s")
+        sys.exit(1 if regressions else 0)
@@ -1,241 +1,343 @@
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-from helper import validate_month_format
+from helper import validate_month_format, to_day_ordinals, from_day_ordinals, to_cents, from_cents
+from metrics import METRICS
+from interest import monthly_interest, batch_monthly_interest, interest_adjustments, month_bounds
+
+class StatementCache:
+    """
+    LRU cache of statements keyed by (account_id, YYYYMM month), with hit/miss
+    counters. Safe to share between reader threads and the writer's invalidations.
+    Each statement is tagged with the snapshot versions it was computed from.
+    """
+
+    def __init__(self, size=128):
+        self.size = size
+        self.statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, account_id, month):
+        with self._lock:
+            entry = self.statements.get((account_id, str(month)))
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.statements.move_to_end((account_id, str(month)))
+            return entry[1]
+
+    def put(self, account_id, month, statement_df, version=None, latest_version=None):
+        """
+        Cache a statement computed from the snapshots of version. It is dropped
+        when latest_version() shows a newer snapshot was published meanwhile,
+        as that version's invalidation may already have run.
+        """
+        with self._lock:
+            # Checked under the lock, so an invalidation for a newer version runs after the put
+            if latest_version is not None and latest_version() != version:
+                return
+            entry = self.statements.get((account_id, str(month)))
+            if entry is not None and version is not None and entry[0] is not None and entry[0] > version:
+                return
+            self.statements[(account_id, str(month))] = (version, statement_df)
+            self.statements.move_to_end((account_id, str(month)))
+            if len(self.statements) > self.size:
+                self.statements.popitem(last=False)
+
+    def invalidate_account(self, account_id, date):
+        # A posting changes its own month and every later balance of the account
+        with self._lock:
+            if account_id is None:
+                self.statements.clear()
+                return
+            for key in [key for key in self.statements if key[0] == account_id and int(key[1]) >= int(date) // 100]:
+                del self.statements[key]
+
+    def invalidate_rates(self, first_date, until_date):
+        # A rule changes the rates from its date until the next rule
+        with self._lock:
+            if first_date is None:
+                self.statements.clear()
+                return
+            for key in [key for key in self.statements
+                        if int(key[1]) >= int(first_date) // 100 and (until_date is None or int(key[1]) <= (int(until_date) - 1) // 100)]:
+                del self.statements[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.statements)}
+
 
 class ComputeTransaction:
     def __init__(self, config):
         self.config = config
-        self.account_df = None
-        self.interest_rules_df = None
+        self.statement_cache = StatementCache(config.get("statement_cache_size", 128))
 
 
-    def validate_input(self, response, account_df):
+    def check_statement(self, account, account_id, month):
+        """
+        Validate a statement request. Returns the reason it is rejected, or None.
+        """
+        ledger = account.snapshot() if hasattr(account, "snapshot") else account
+        store = self._shared_store(ledger)
+        if not (account_id in ledger.ledger_index if store is None else store.has_account(account_id)):
+            return f"Account {account_id} not found."
+        first_month, last_month = self.month_range(month)
+        if not validate_month_format(first_month) or not validate_month_format(last_month):
+            return f"{month} is not a valid YYYYMM date."
+        if int(last_month) < int(first_month):
+            return f"{month} is not a valid YYYYMM-YYYYMM range."
+        return None
+
+    @staticmethod
+    def month_range(month):
+        # A YYYYMM month or a YYYYMM-YYYYMM range as its first and last months; a trailing "-" leaves last_month empty
+        first_month, separator, last_month = str(month).partition("-")
+        return first_month, last_month if separator else first_month
+
+    def validate_input(self, response, account):
         response_list = response.split()
 
         if len(response_list) != 2:
             print("Please enter a valid account and month")
             return False
-        else:
-            account_id = response_list[0]
-            month = response_list[1]
-
-            filter_account_df = account_df[account_df["account_id"] == account_id]
-            if filter_account_df.empty:
-                print(f"Account {account_id} not found.")
-                return False
-
-            if not validate_month_format(month):
-                print(f"{month} is not a valid YYYYMM date.")
-                return False
 
+        error = self.check_statement(account, *response_list)
+        if error is not None:
+            print(error)
+            return False
         return True
 
-    def _compute_monthly_interest(self, transactions, month):
-        applicable_rules = self.interest_rules_df.copy()
-        monthly_interest = 0.0
-
-        month_start = pd.to_datetime(f"{month}01", format="%Y%m%d")
-        month_end = (month_start + pd.offsets.MonthEnd(0)).strftime("%Y%m%d")
-        month_start = month_start.strftime("%Y%m%d")
-
-        # Get previous month interest if exist
-        previous_month_interest = applicable_rules[(applicable_rules["date"] < pd.to_datetime(month_start, format="%Y%m%d"))].sort_values(
-            by=["date"]).tail(1).reset_index(drop=True)
-        previous_month_interest.loc[0, "date"] = month_start
-
-        selected_month_rule_df = applicable_rules[
-            (applicable_rules["date"] >= pd.to_datetime(month_start, format="%Y%m%d")) &
-            (applicable_rules["date"] <= pd.to_datetime(month_end, format="%Y%m%d"))
-            ]
-
-        new_interest_rate_df = selected_month_rule_df.reset_index(drop=True)
-
-        if not previous_month_interest.empty:
-            new_interest_rate_df = pd.concat([previous_month_interest, selected_month_rule_df], ignore_index=True).reset_index(drop=True)
-
-        new_interest_rate_df["date"] = pd.to_datetime(new_interest_rate_df["date"])
-        new_interest_rate_df = new_interest_rate_df.sort_values(by="date").reset_index(drop=True)
-
-        # Prepare the rules with end dates
-        new_interest_rate_df["end_date"] = new_interest_rate_df["date"].shift(-1)
-        new_interest_rate_df.iloc[-1, new_interest_rate_df.columns.get_loc("end_date")] = pd.to_datetime(month_end)
-
-        # Iterate through each rule period
-        for _, rule in new_interest_rate_df.iterrows():
+    @staticmethod
+    def _snapshots(account, rule):
+        # Read the ledger and rules from one published version each, never the writer's live state
+        return (account.snapshot() if hasattr(account, "snapshot") else account,
+                rule.snapshot() if hasattr(rule, "snapshot") else rule)
 
-            start_date = rule["date"]
-            end_date = rule["end_date"]
+    @staticmethod
+    def _shared_store(ledger):
+        # A store other processes post to, which the snapshot may be behind
+        return getattr(ledger, "store", None)
 
-            # There will have 2 cases, 1 is update the rate another is update the transaction
-
-            # Fetch balance for the period
-            period_balance = transactions[
-                (transactions["date"] >= start_date) & (transactions["date"] < end_date)
-                ]["balance"].max() if not transactions.empty else 0.0
-
-
-
-
-
-            # Default to the last balance if no transaction occurred
-            if pd.isna(period_balance):
-                period_balance = transactions["balance"].iloc[-1] if not transactions.empty else 0.0
-
-            # Calculate interest for the period
-            days = (end_date - start_date).days
-            rate = rule["rate"] / 100  # Convert percentage to fraction
-            monthly_interest += period_balance * rate * days
-
-        return round(monthly_interest, 2)
-
-    def _process_account_transactions(self, account_data, month):
+    def _account_rows(self, ledger, account_id, first_month, last_month):
         """
-        Process transactions for a single account and compute monthly interest.
+        The account's rows in transaction order, covering YYYYMM first_month
+        to last_month, and the balance carried into first_month. A shared store
+        is read directly, so the rows include every process's postings.
         """
-        processed = []
-        balance = 0.0
-        month_start = pd.to_datetime(f"{month}01", format="%Y%m%d")
-        month_end = (month_start + pd.offsets.MonthEnd(0)).strftime("%Y%m%d")
-
-        # Iterate through transactions
-        for i, row in account_data.iterrows():
-            # Add transaction to processed list
-            processed.append({
-                "date": row["date"].strftime("%Y%m%d"),
-                "transaction_code": row["transaction_code"],
-                "type": row["type"],
-                "amount": f"{row['amount']:.2f}",
-                "balance": f"{row['balance']:.2f}",
-            })
-
-        # Add interest row at the end of the month
-        monthly_interest = self._compute_monthly_interest(account_data, month)
-        if monthly_interest > 0:
-            processed.append({
-                "date": month_end,
-                "transaction_code": "",
-                "type": "I",
-                "amount": f"{monthly_interest:.2f}",
-                "balance": f"{balance + monthly_interest:.2f}",
-            })
-
-        return processed
-
-    def _compute_transactions_with_interest(self, month_end):
-        results = []
-        last_balance = 0.0
-        last_date = None
-        interest_accumulated = 0.0
-
-        # Prepare interest rules with end dates
-        self.interest_rules_df["end_date"] = self.interest_rules_df["date"].shift(-1)
-        self.interest_rules_df.iloc[-1, self.interest_rules_df.columns.get_loc("end_date")] = self.last_day_of_month
-
-        for i, txn in self.account_df.iterrows():
-            txn_date = txn["date"]
-            txn_amount = txn["amount"]
-            txn_type = txn["type"]
-            txn_balance = txn["balance"]
-
-            # Apply interest for gaps between last_date and txn_date
-            if last_date is not None and txn_date > last_date:
-                interest_accumulated += self._apply_interest_for_gap(last_date, txn_date, last_balance)
-
-            if last_date is not None:
-                # Update balance based on transaction type
-                if txn_type == "D":  # Deposit
-                    last_balance += txn_amount
-                elif txn_type == "W":  # Withdrawal
-                    last_balance -= txn_amount
-            else:
-                last_balance = txn_balance
-
-            # Record the transaction
-            results.append({
-                "Date": txn_date.strftime("%Y%m%d"),
-                "Txn Id": txn["transaction_code"],
-                "Type": txn_type,
-                "Amount": f"{txn_amount:.2f}",
-                "Balance": f"{txn_balance:.2f}",
-            })
-            last_date = txn_date
-
-        # Apply interest for the remaining period in the month
-        interest_accumulated += self._apply_interest_for_gap(last_date - timedelta(days=1), datetime.strptime(month_end, '%Y%m%d'), last_balance)
-
-        # Add interest row if applicable
-        if interest_accumulated > 0:
-            results.append({
-                "Date": month_end,
-                "Txn Id": "",
-                "Type": "I",
-                "Amount": f"{interest_accumulated:.2f}",
-                "Balance": f"{last_balance + interest_accumulated:.2f}",
-            })
-
-        return pd.DataFrame(results)
-
-    def _apply_interest_for_gap(self, start_date, end_date, balance):
+        store = self._shared_store(ledger)
+        if store is None:
+            return (ledger.df.iloc[ledger.ledger_index.account_positions(account_id)],
+                    ledger.ledger_index.opening_balance(account_id, first_month))
+        first_date, last_date = from_day_ordinals([month_bounds(first_month)[0], month_bounds(last_month)[1]])
+        return store.month_transactions(account_id, first_date, last_date), store.opening_balance(account_id, first_date)
+
+    def _statement_arrays(self, month_df, month_end, opening_balance, rate_timeline):
         """
-        Calculate interest for the period between start_date and end_date.
+        The statement's raw columns: the month's transactions followed by the
+        computed interest row, if any. Nothing is formatted here.
         """
+        return self._month_columns(from_day_ordinals(to_day_ordinals(month_df["date"])),
+                                   month_df["transaction_code"].to_numpy(dtype=object),
+                                   month_df["type"].to_numpy(dtype=object),
+                                   month_df["amount"].to_numpy(dtype=float),
+                                   month_df["balance"].to_numpy(dtype=float), month_end, opening_balance, rate_timeline)
+
+    def _month_columns(self, dates, transaction_codes, types, amounts, balances, month_end, opening_balance, rate_timeline):
+        # One month's rows in transaction order followed by its computed interest row, if any
+        # Interest already posted for the month is shown as is instead of recomputed
+        posted_interest = types == "I"
+        transaction_codes = np.where(posted_interest, "", transaction_codes)
+
+        if not posted_interest.any():
+            METRICS.count("rules_evaluated", len(rate_timeline))
+            interest_accumulated = monthly_interest(to_day_ordinals(dates), balances, rate_timeline,
+                                                    to_day_ordinals([int(month_end)])[0], opening_balance)
+
+            # Add interest row if applicable
+            if interest_accumulated > 0:
+                last_balance = balances[-1] if len(balances) else opening_balance
+                dates = np.append(dates, int(month_end))
+                transaction_codes = np.append(transaction_codes, "")
+                types = np.append(types, "I")
+                amounts = np.append(amounts, interest_accumulated)
+                balances = np.append(balances, from_cents(to_cents(last_balance) + to_cents(interest_accumulated)))
+
+        return dates, transaction_codes, types, amounts, balances
+
+    @staticmethod
+    def _format_statement(dates, transaction_codes, types, amounts, balances):
+        # Format the statement in one vectorized pass
+        return pd.DataFrame({
+            "Date": dates.astype(str),
+            "Txn Id": transaction_codes,
+            "Type": types,
+            "Amount": np.char.mod("%.2f", amounts),
+            "Balance": np.char.mod("%.2f", balances),
+        })
+
+    @staticmethod
+    def _filter_month(account_df, account_id, month):
+        # The account's rows within the month sorted by transaction_code, and the month end
+        first_day, last_day = month_bounds(month)
+        days = to_day_ordinals(account_df["date"])
+        in_month = (account_df["account_id"] == account_id).to_numpy() & (days >= first_day) & (days <= last_day)
+        METRICS.count("rows_scanned", len(account_df))
+        METRICS.count("rows_sorted", int(in_month.sum()))
+        return account_df[in_month].sort_values(by="transaction_code").reset_index(drop=True), str(from_day_ordinals([last_day])[0])
+
+    def preprocess(self, account_df, account_id, month, opening_balance, rate_timeline):
+        """
+        The formatted statement of the account's rows in account_df for a YYYYMM
+        month, given the balance carried into the month.
+        """
+        with METRICS.stage("statement.preprocess"):
+            month_df, month_end = self._filter_month(account_df, account_id, month)
 
-        applicable_rules = self.interest_rules_df[
-            (self.interest_rules_df["date"] <= end_date) & (self.interest_rules_df["end_date"] > start_date)
-            ]
-
-        interest = 0.0
-        for _, rule in applicable_rules.iterrows():
-            period_start = max(start_date, rule["date"])
-            period_end = min(end_date, rule["end_date"])
-            days = (period_end - period_start).days
-            rate = rule["rate"] / 100  # Convert percentage to decimal
-
-            # Calculate interest for this period
-            interest += balance * rate * days
-
-        return round(interest  / 365 , 2)
-
-
-    def preprocess(self, account_id, month):
-        # Filter by account_id and month if provided
-
-        self.account_df = self.account_df[self.account_df["account_id"] == account_id]
-        month_start = pd.to_datetime(f"{month}01", format="%Y%m%d")
-        month_end = (month_start + pd.offsets.MonthEnd(0)).strftime("%Y%m%d")
-        month_start = month_start.strftime("%Y%m%d")
-
-        self.account_df = self.account_df[
-            (self.account_df["date"] >= pd.to_datetime(month_start, format="%Y%m%d")) &
-            (self.account_df["date"] <= pd.to_datetime(month_end, format="%Y%m%d"))
-        ]
-        self.last_day_of_month = month_end
+            # Process transactions for the filtered data
+            return self._format_statement(*self._statement_arrays(month_df, month_end, opening_balance, rate_timeline))
 
-        # Sort account_df by transaction_code and interest_rules_df by date
-        self.account_df = self.account_df.sort_values(by="transaction_code").reset_index(drop=True)
-        self.interest_rules_df = self.interest_rules_df.sort_values(by="date").reset_index(drop=True)
+    def statement_rows(self, account, rule, account_id, month):
+        """
+        Yield the account's statement for a YYYYMM month as unformatted records.
+        """
+        with METRICS.stage("statement.rows"):
+            ledger, rules = self._snapshots(account, rule)
+            account_df, opening_balance = self._account_rows(ledger, account_id, month, month)
+            month_df, month_end = self._filter_month(account_df, account_id, month)
+            columns = self._statement_arrays(month_df, month_end, opening_balance, rules.timeline)
+        for date, transaction_code, type, amount, balance in zip(*columns):
+            yield {"account_id": account_id, "date": int(date), "transaction_code": transaction_code, "type": type,
+                   "amount": float(amount), "balance": float(balance)}
+
+    def _range_columns(self, account, rule, account_id, first_month, last_month):
+        """
+        Each month's statement columns from YYYYMM first_month to last_month,
+        in one pass over the account's rows in transaction order. Interest
+        computed for a month is credited at the month end and carried into
+        every later balance and month of the range.
+        """
+        with METRICS.stage("statement.range"):
+            ledger, rules = self._snapshots(account, rule)
+            rows, opening_balance = self._account_rows(ledger, account_id, first_month, last_month)
+            METRICS.count("rows_scanned", len(rows))
+            days = to_day_ordinals(rows["date"])
+            dates = from_day_ordinals(days)
+            transaction_codes = rows["transaction_code"].to_numpy(dtype=object)
+            types = rows["type"].to_numpy(dtype=object)
+            amounts = rows["amount"].to_numpy(dtype=float)
+            balances = to_cents(rows["balance"].to_numpy(dtype=float))
+
+            # Rows are in date order, so each month is the slice between its first day and the next month's
+            months = np.arange(np.datetime64(f"{first_month[:4]}-{first_month[4:]}", "M"),
+                               np.datetime64(f"{last_month[:4]}-{last_month[4:]}", "M") + np.timedelta64(2, "M"))
+            month_firsts = months.astype("datetime64[D]").astype(np.int64)
+            bounds = np.searchsorted(days, month_firsts)
+            rate_timeline = rules.timeline
+            opening_balance = int(to_cents(opening_balance))
+            carried = 0
+
+        for month in range(len(months) - 1):
+            month_rows = slice(bounds[month], bounds[month + 1])
+            month_end = from_day_ordinals([month_firsts[month + 1] - 1])[0]
+            columns = self._month_columns(dates[month_rows], transaction_codes[month_rows], types[month_rows], amounts[month_rows],
+                                          from_cents(balances[month_rows] + carried), month_end, from_cents(opening_balance),
+                                          rate_timeline)
+            if len(columns[0]) > bounds[month + 1] - bounds[month]:
+                carried += int(to_cents(columns[3][-1]))
+            if len(columns[0]):
+                opening_balance = int(to_cents(columns[4][-1]))
+            yield columns
+
+    def range_statement_rows(self, account, rule, account_id, first_month, last_month):
+        """
+        Yield the account's statement over a range of YYYYMM months as unformatted records.
+        """
+        for columns in self._range_columns(account, rule, account_id, first_month, last_month):
+            for date, transaction_code, type, amount, balance in zip(*columns):
+                yield {"account_id": account_id, "date": int(date), "transaction_code": transaction_code, "type": type,
+                       "amount": float(amount), "balance": float(balance)}
 
-        # Process transactions for the filtered data
-        return self._compute_transactions_with_interest(month_end)
+    def range_statement(self, account, rule, account_id, first_month, last_month):
+        """
+        The account's statement over a range of YYYYMM months, formatted like statement().
+        """
+        months = list(self._range_columns(account, rule, account_id, first_month, last_month))
+        return self._format_statement(*[np.concatenate([columns[field] for columns in months]) for field in range(5)])
 
+    def post_month_end_interest(self, account, rule, month):
+        """
+        Compute and post the month's interest for every account in one pass.
+        """
+        # Every account is locked while its interest is computed and posted
+        with account.shared_write(), METRICS.stage("statement.month_end_interest"):
+            METRICS.count("rows_scanned", len(account.df))
+            METRICS.count("rules_evaluated", len(rule.timeline))
+            interest = batch_monthly_interest(account.df, rule.timeline, month, account.ledger_index.opening_balances(month))
+            month_end = int(from_day_ordinals([month_bounds(month)[1]])[0])
+            account.post_interest(month_end, interest)
+        return interest
+
+    def recalculate_interest(self, account, previous_timeline, timeline):
+        """
+        After a rule is added or replaced, post an I adjustment at the end of
+        every month whose posted interest used rates that have since changed.
+        Returns the adjustments posted.
+        """
+        with account.shared_write(), METRICS.stage("statement.recalculate_interest"):
+            METRICS.count("rows_scanned", len(account.df))
+            adjustments = interest_adjustments(account.df, previous_timeline, timeline)
+            for date, month_adjustments in adjustments.groupby("date"):
+                account.post_interest(date, month_adjustments.set_index("account_id")["amount"])
+        return adjustments
+
+    def statement(self, account, rule, account_id, month):
+        """
+        The account's statement for a YYYYMM month, served from the cache when
+        still valid, or for a YYYYMM-YYYYMM range of months.
+        """
+        first_month, last_month = self.month_range(month)
+        if first_month != last_month:
+            return self.range_statement(account, rule, account_id, first_month, last_month)
+        # A one-month range such as 202301-202301 is that month's statement
+        month = first_month
+
+        # Keep the cache in step with postings and rule changes
+        if self.statement_cache.invalidate_account not in account.listeners:
+            account.listeners.append(self.statement_cache.invalidate_account)
+        if self.statement_cache.invalidate_rates not in rule.listeners:
+            rule.listeners.append(self.statement_cache.invalidate_rates)
+
+        with METRICS.stage("statement"):
+            ledger, rules = self._snapshots(account, rule)
+            # Other processes' postings to a shared store never invalidate the cache, so it is bypassed
+            shared = self._shared_store(ledger) is not None
+            statement_df = None if shared else self.statement_cache.get(account_id, month)
+            METRICS.count("statement_cache_misses" if statement_df is None else "statement_cache_hits")
+            if statement_df is None:
+                # Only the requested account's rows; the published snapshot is never written to
+                account_df, opening_balance = self._account_rows(ledger, account_id, month, month)
+                statement_df = self.preprocess(account_df, account_id, month, opening_balance, rules.timeline)
+                if not shared:
+                    self.statement_cache.put(account_id, month, statement_df, (ledger.version, rules.version),
+                                             lambda: (account.snapshot().version, rule.snapshot().version))
+            return statement_df
 
     def print_input(self, account, rule):
-        # Ensure 'date' columns are in datetime format
-        account.df["date"] = pd.to_datetime(account.df["date"], format="%Y%m%d")
-        rule.df["date"] = pd.to_datetime(rule.df["date"], format="%Y%m%d")
-
         while True:
             print(f"{self.config['print_input']}\n{self.config['empty_input']}")
             response = input("> ")
             if response == "":
                 break
             else:
-                validate_success = self.validate_input(response, account.df)
+                validate_success = self.validate_input(response, account)
                 if not validate_success:
                     continue
                 else:
-                    self.account_df = account.df.copy()
-                    self.interest_rules_df = rule.df.copy()
-                    result_df = self.preprocess(*response.split())
+                    result_df = self.statement(account, rule, *response.split())
                     print(result_df)
                     break
@@ -1,40 +1,144 @@
-import re
-from datetime import datetime
+import numpy as np
+
+# Money is computed in integer cents and rates in integer hundredths of a percent
+MONEY_SCALE = 100
+RATE_SCALE = 100
+
+
+def _strings(values):
+    return np.asarray(values, dtype=str).reshape(-1)
+
+
+def _reasons(mask, values, message):
+    # Empty reason for valid rows, "<value> <message>" otherwise
+    reasons = np.full(len(values), "", dtype=object)
+    reasons[~mask] = np.strings.add(values[~mask], message)
+    return reasons
+
+
+def _calendar_mask(values, digits):
+    # Exactly `digits` ASCII digits forming a real YYYYMM(dd) calendar date
+    fixed = np.where(np.strings.str_len(values) == digits, values, "").astype(f"<U{digits}")
+    # Each character of a fixed-width string is one uint32 code point, so digits are parsed without int()
+    codes = fixed.view(np.uint32).reshape(-1, digits).astype(np.int64) - ord("0")
+    well_formed = ((codes >= 0) & (codes <= 9)).all(axis=1)
+    numbers = codes @ 10 ** np.arange(digits - 1, -1, -1, dtype=np.int64)
+    if digits == 8:
+        days, numbers = numbers % 100, numbers // 100
+    years, months = numbers // 100, numbers % 100
+    valid = well_formed & (years >= 1) & (months >= 1) & (months <= 12)
+    if digits == 8:
+        month_starts = ((np.where(valid, years, 1970) - 1970) * 12 + np.where(valid, months, 1) - 1).astype("datetime64[M]")
+        month_lengths = ((month_starts + np.timedelta64(1, "M")).astype("datetime64[D]") - month_starts.astype("datetime64[D]")).astype(np.int64)
+        valid &= (days >= 1) & (days <= month_lengths)
+    return valid
+
+
+def _number_parts(values):
+    # Digits with an optional 1 or 2 digit fraction.
+    # Returns the mask, whether the number is above zero and its count of whole digits.
+    if not values.size:
+        # np.strings.partition rejects zero-size arrays
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+    whole, dot, fraction = np.strings.partition(values, ".")
+    well_formed = np.strings.isdecimal(whole) & ((dot == "") | (np.strings.isdecimal(fraction) & (np.strings.str_len(fraction) <= 2)))
+    whole_digits = np.strings.str_len(np.strings.lstrip(whole, "0"))
+    positive = (whole_digits > 0) | (np.strings.str_len(np.strings.strip(fraction, "0")) > 0)
+    return well_formed, positive, whole_digits
+
+
+def validate_dates(dates):
+    """
+    Vectorized YYYYMMdd check of an array or Series of date strings.
+    Returns a boolean mask and the reason each invalid date was rejected.
+    """
+    dates = _strings(dates)
+    valid = _calendar_mask(dates, 8)
+    return valid, _reasons(valid, dates, " is not a valid YYYYMMdd date.")
+
+
+def validate_months(months):
+    """
+    Vectorized YYYYMM check, returning a boolean mask and reasons.
+    """
+    months = _strings(months)
+    valid = _calendar_mask(months, 6)
+    return valid, _reasons(valid, months, " is not a valid YYYYMM date.")
+
+
+def validate_amounts(amounts):
+    """
+    Vectorized check for positive amounts with up to 2 decimal places,
+    returning a boolean mask and reasons.
+    """
+    amounts = _strings(amounts)
+    well_formed, positive, _ = _number_parts(amounts)
+    valid = well_formed & positive
+    return valid, _reasons(valid, amounts, " is not a valid amount.")
+
+
+def validate_rates(rates):
+    """
+    Vectorized check for rates between 0 and 100 exclusive with up to 2
+    decimal places, returning a boolean mask and reasons.
+    """
+    rates = _strings(rates)
+    well_formed, positive, whole_digits = _number_parts(rates)
+    valid = well_formed & positive & (whole_digits <= 2)
+    return valid, _reasons(valid, rates, " is not a valid rate.")
+
 
 def validate_date_format(date_string):
-    try:
-        # Attempt to parse the date string
-        datetime.strptime(date_string, '%Y%m%d')
-        return True
-    except ValueError:
-        # If parsing fails, the format is invalid
-        return False
+    return bool(validate_dates([date_string])[0][0])
 
 def validate_month_format(date_string):
-    try:
-        # Attempt to parse the date string
-        datetime.strptime(date_string, '%Y%m')
-        return True
-    except ValueError:
-        # If parsing fails, the format is invalid
-        return False
+    return bool(validate_months([date_string])[0][0])
 
 def validate_amount(amount_string):
-    # Regular expression to match a positive number with up to 2 decimal places
-    pattern = r'^\d+(\.\d{1,2})?$'
-
-    # Check if the input matches the pattern and is greater than zero
-    if re.match(pattern, amount_string):
-        if float(amount_string) > 0:
-            return True
-    return False
+    return bool(validate_amounts([amount_string])[0][0])
 
 def validate_rate(rate_string):
-    # Regular expression to match a positive number with up to 2 decimal places
-    pattern = r'^\d+(\.\d{1,2})?$'
-
-    # Check if the input matches the pattern and is greater than zero
-    if re.match(pattern, rate_string):
-        if float(rate_string) > 0 and float(rate_string) < 100:
-            return True
-    return False
\ No newline at end of file
+    return bool(validate_rates([rate_string])[0][0])
+
+def to_day_ordinals(dates):
+    """
+    Convert YYYYMMdd integers (or datetime64 values) to days since 1970-01-01.
+    """
+    values = np.asarray(dates)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[D]").astype(np.int64)
+
+    values = values.astype(np.int64)
+    months = (values // 10000 - 1970) * 12 + values // 100 % 100 - 1
+    return months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + values % 100 - 1
+
+
+def from_day_ordinals(days):
+    """
+    Convert days since 1970-01-01 back to YYYYMMdd integers.
+    """
+    days = np.asarray(days, dtype=np.int64).astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]")
+    return ((years.astype(np.int64) + 1970) * 10000
+            + (months - years).astype(np.int64) * 100 + 100
+            + (days - months).astype(np.int64) + 1)
+
+
+def to_cents(amounts):
+    """
+    Convert amounts with up to 2 decimal places to int64 cents.
+    """
+    return np.rint(np.asarray(amounts, dtype=float) * MONEY_SCALE).astype(np.int64)
+
+
+def from_cents(cents):
+    return np.asarray(cents, dtype=np.int64) / MONEY_SCALE
+
+
+def round_div(numerators, denominator):
+    """
+    Integer division rounded half away from zero, vectorized over int64 numerators.
+    """
+    numerators = np.asarray(numerators, dtype=np.int64)
+    return np.sign(numerators) * ((np.abs(numerators) + denominator // 2) // denominator)
@@ -0,0 +1,206 @@
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+from compute_transaction import ComputeTransaction
+from metrics import METRICS
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found"}
+
+
+class HttpService:
+    """
+    Local HTTP service over Account, Rule and ComputeTransaction, using asyncio only.
+
+    POST /transactions and POST /rules are queued to a single writer task that
+    posts concurrent transactions as one micro-batch, applied on a dedicated
+    writer thread so the event loop keeps serving requests meanwhile. GET /statements/<Account>/<YYYYMM>[-<YYYYMM>]
+    is computed in worker threads from the account's and rule's latest
+    published snapshots, which only change once a batch is fully applied. GET /metrics reports request latency percentiles per route.
+    """
+
+    def __init__(self, config, account, rule, max_batch=None, batch_window=None):
+        self.config = config
+        self.account = account
+        self.rule = rule
+        self.max_batch = max_batch or config.get("service_max_batch", 1000)
+        # Seconds the writer waits for more requests to join a batch
+        self.batch_window = batch_window if batch_window is not None else config.get("service_batch_window", 0.002)
+        self.latencies = defaultdict(lambda: deque(maxlen=10000))
+        self.batch_sizes = deque(maxlen=10000)
+        self.server = None
+        self._queue = None
+        self._writer = None
+        self._write_executor = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._queue = asyncio.Queue()
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ledger-writer")
+        self._writer = asyncio.create_task(self._write_loop())
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self._writer.cancel()
+        self._write_executor.shutdown(wait=True)
+
+    # Writes
+
+    async def post_transaction(self, date, account_id, type, amount):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(("post", f"{date} {account_id} {type} {amount}", future))
+        return await future
+
+    async def define_rule(self, date, rule_id, rate):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(("rule", (str(date), rule_id, str(rate)), future))
+        return await future
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.batch_window:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(self._write_executor, self._apply, batch)
+            except Exception as error:
+                results = [{"ok": False, "error": str(error)}] * len(batch)
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _apply(self, batch):
+        results = [None] * len(batch)
+        postings = [number for number, (kind, _, _) in enumerate(batch) if kind == "post"]
+        if postings:
+            self.batch_sizes.append(len(postings))
+            posted = self.account.post_transactions(pd.Series([batch[number][1] for number in postings], index=postings))
+            for number, row in posted.iterrows():
+                if row["reason"]:
+                    results[number] = {"ok": False, "error": row["reason"]}
+                else:
+                    results[number] = {"ok": True, "account_id": row["account_id"], "date": int(row["date"]),
+                                       "transaction_code": row["transaction_code"], "type": row["type"],
+                                       "amount": float(row["amount"]), "balance": float(row["balance"])}
+
+        # Rules only change interest, so applying them after the batch's postings is equivalent
+        previous_timeline = self.rule.snapshot().timeline
+        for number, (kind, arguments, _) in enumerate(batch):
+            if kind == "rule":
+                error = self.rule.check_rule(*arguments)
+                if error is not None:
+                    results[number] = {"ok": False, "error": error}
+                else:
+                    added = self.rule.set_rule(*arguments)
+                    results[number] = {"ok": True, "date": int(arguments[0]), "rule_id": arguments[1],
+                                       "rate": float(arguments[2]), "added": added}
+        # Posted interest is adjusted once for all of the batch's rule changes
+        if self.rule.snapshot().timeline is not previous_timeline:
+            ComputeTransaction(self.config).recalculate_interest(self.account, previous_timeline, self.rule.timeline)
+        return results
+
+    # Reads
+
+    def _statement(self, ledger, rules, account_id, month):
+        compute_transaction = ComputeTransaction(self.config)
+        error = compute_transaction.check_statement(ledger, account_id, month)
+        if error is not None:
+            return {"ok": False, "error": error}
+        first_month, last_month = compute_transaction.month_range(month)
+        if first_month != last_month:
+            rows = list(compute_transaction.range_statement_rows(ledger, rules, account_id, first_month, last_month))
+        else:
+            rows = list(compute_transaction.statement_rows(ledger, rules, account_id, first_month))
+        return {"ok": True, "account_id": account_id, "month": month, "rows": rows}
+
+    async def get_statement(self, account_id, month):
+        return await asyncio.get_running_loop().run_in_executor(None, self._statement, self.account.snapshot(), self.rule.snapshot(),
+                                                                account_id, month)
+
+    def latency_percentiles(self):
+        """
+        p50/p95/p99 request latencies in milliseconds per route.
+        """
+        metrics = {}
+        for route, latencies in self.latencies.items():
+            p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+            metrics[route] = {"count": len(latencies), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+        metrics["batch_size_mean"] = float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0
+        if METRICS.enabled:
+            metrics["stages"] = METRICS.snapshot()
+        return metrics
+
+    # HTTP
+
+    async def _route(self, method, path, body):
+        parts = [part for part in path.split("/") if part]
+        if parts == ["transactions"] and method == "POST":
+            return "POST /transactions", await self.post_transaction(body["date"], body["account"], body["type"], body["amount"])
+        if parts == ["rules"] and method == "POST":
+            return "POST /rules", await self.define_rule(body["date"], body["rule_id"], body["rate"])
+        if len(parts) == 3 and parts[0] == "statements" and method == "GET":
+            return "GET /statements", await self.get_statement(parts[1], parts[2])
+        if parts == ["metrics"] and method == "GET":
+            return "GET /metrics", self.latency_percentiles()
+        return None, None
+
+    async def _handle_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None, True
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        close = headers.get("connection", "").lower() == "close"
+
+        started = time.perf_counter()
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            body = json.loads(body) if body else {}
+            if not isinstance(body, dict):
+                raise ValueError("the body must be a JSON object")
+            route, result = await self._route(method, urlsplit(target).path, body)
+            status = 404 if route is None else 200 if result.get("ok", True) else 400
+            result = result if route is not None else {"ok": False, "error": f"No route for {method} {target}."}
+        except (KeyError, ValueError) as error:
+            route, status, result = None, 400, {"ok": False, "error": f"Invalid request: {error}"}
+        if route is not None:
+            self.latencies[route].append(time.perf_counter() - started)
+        return (status, result), close
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                response, close = await self._handle_request(reader)
+                if response is None:
+                    break
+                status, result = response
+                payload = json.dumps(result).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(config, account, rule, host="127.0.0.1", port=8080):
+    service = HttpService(config, account, rule)
+    host, port = await service.start(host, port)
+    print(f"Serving on http://{host}:{port}")
+    async with service.server:
+        await service.server.serve_forever()
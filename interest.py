@@ -0,0 +1,295 @@
+import numpy as np
+import pandas as pd
+from helper import to_day_ordinals, from_day_ordinals, to_cents, from_cents, round_div, RATE_SCALE
+from ledger_index import BalanceHistory, transaction_keys
+from rate_timeline import stacked_rate_unit_days
+
+DAYS_IN_YEAR = 365
+
+# Cents x rate units x days over this divisor gives interest in cents
+INTEREST_DIVISOR = 100 * RATE_SCALE * DAYS_IN_YEAR
+# Account/month keys: account code * MONTH_KEY + months since 1970-01
+MONTH_KEY = 100_000
+
+
+def _month_start(day):
+    return np.datetime64(int(day), "D").astype("datetime64[M]")
+
+
+def month_bounds(month):
+    """
+    Return the first and last day ordinals of a YYYYMM month.
+    """
+    first_day = to_day_ordinals([int(f"{month}01")])[0]
+    last_day = (_month_start(first_day) + np.timedelta64(1, "M")).astype("datetime64[D]").astype(np.int64) - 1
+    return int(first_day), int(last_day)
+
+
+def daily_balances(txn_days, txn_balances, first_day, month_end_day):
+    """
+    Balance earning interest on each day from first_day to month_end_day inclusive.
+
+    Each transaction day opens a segment carrying its end-of-day balance up to
+    the next transaction day. The closing segment starts the day before the
+    last transaction day and runs up to the month end, which matches the
+    statement's inclusive day count for the final period.
+    """
+    txn_days = np.asarray(txn_days, dtype=np.int64)
+    txn_balances = np.asarray(txn_balances)
+
+    # Keep the end-of-day balance of each transaction day
+    last_of_day = np.append(txn_days[1:] != txn_days[:-1], True)
+    days = txn_days[last_of_day]
+    balances = txn_balances[last_of_day]
+
+    starts = days.copy()
+    starts[-1] -= 1
+    ends = np.append(days[1:], month_end_day)
+
+    # Piecewise-constant segments summed into a daily array via a difference array
+    deltas = np.zeros(month_end_day - first_day + 2, dtype=balances.dtype)
+    np.add.at(deltas, starts - first_day, balances)
+    np.add.at(deltas, ends - first_day, -balances)
+    return np.cumsum(deltas)[:-1]
+
+
+def _segments(groups, days, balances, period_ends):
+    """
+    Constant-balance segments of rows sorted by group then transaction order,
+    as in daily_balances: each day's end-of-day balance runs up to the next
+    transaction day, and each group's last segment from the day before its
+    last transaction day up to its period end. Returns groups, starts, ends
+    and balances of the segments.
+    """
+    last_of_group = np.append(groups[1:] != groups[:-1], True)[:len(groups)]
+    last_of_day = last_of_group | np.append(days[1:] != days[:-1], True)[:len(days)]
+    groups, days, balances, period_ends, last_of_group = (groups[last_of_day], days[last_of_day], balances[last_of_day],
+                                                          period_ends[last_of_day], last_of_group[last_of_day])
+    starts = days - last_of_group
+    ends = np.where(last_of_group, period_ends, np.append(days[1:], 0)[:len(days)])
+    return groups, starts, ends, balances
+
+
+def monthly_interest(txn_days, txn_balances, timeline, month_end_day, opening_balance=0.0):
+    """
+    Interest earned over a month as one dot product of daily balances and rates.
+
+    txn_days/txn_balances are the month's transactions in ledger order,
+    timeline the RateTimeline of the interest rules. The opening balance
+    carried into the month earns interest until the first transaction day,
+    or over the whole month when there are no transactions.
+
+    The sum is exact in integer cents and rate units, rounded to the cent once.
+    """
+    month_first_day = int(_month_start(month_end_day).astype("datetime64[D]").astype(np.int64))
+    if len(txn_days) == 0:
+        opening_end = month_end_day + 1
+        interest = 0
+    else:
+        first_day = int(np.min(txn_days)) - 1
+        # The opening balance earns until the first transaction day, however many days follow it
+        opening_end = max(first_day + 1, month_first_day)
+        balances = daily_balances(txn_days, to_cents(txn_balances), first_day, month_end_day)
+        interest = int(np.dot(balances, timeline.daily_rate_units(first_day, month_end_day)))
+
+    if opening_balance:
+        interest += int(to_cents(opening_balance)) * int(timeline.rate_unit_days([month_first_day], [opening_end])[0])
+    return float(from_cents(round_div(interest, INTEREST_DIVISOR)))
+
+
+def account_monthly_interest(transactions_df, timeline, month, opening_balance=0.0):
+    """
+    Interest for one account's transactions within a YYYYMM month.
+    """
+    _, month_end_day = month_bounds(month)
+    return monthly_interest(to_day_ordinals(transactions_df["date"]), transactions_df["balance"].to_numpy(dtype=float),
+                            timeline, month_end_day, opening_balance)
+
+
+def batch_monthly_interest(ledger_df, timeline, month, opening_balances=None):
+    """
+    Interest for every account with transactions in a YYYYMM month, in one
+    grouped pass over the ledger. Accounts whose interest for the month is
+    already posted are skipped. opening_balances (a Series indexed by
+    account_id) also earns interest, including for accounts without
+    transactions in the month. Returns a Series indexed by account_id.
+    """
+    first_day, month_end_day = month_bounds(month)
+    days = to_day_ordinals(ledger_df["date"])
+    in_month = (days >= first_day) & (days <= month_end_day)
+
+    posted = ledger_df["account_id"][in_month & (ledger_df["type"] == "I").to_numpy()].unique()
+    month_df = ledger_df[in_month & ~ledger_df["account_id"].isin(posted).to_numpy() & (ledger_df["type"] != "I").to_numpy()]
+
+    # Order the month's rows by account, then transaction code
+    dates, running_numbers, _ = transaction_keys(month_df["transaction_code"]) if len(month_df) else (np.array([], dtype=np.int64),) * 3
+    order = np.lexsort((running_numbers, dates, month_df["account_id"].to_numpy(dtype=str)))
+    accounts = month_df["account_id"].to_numpy()[order]
+    days = to_day_ordinals(month_df["date"])[order]
+    balances = to_cents(month_df["balance"].to_numpy(dtype=float)[order])
+    first_days = pd.Series(days).groupby(accounts, sort=False).first()
+
+    accounts, starts, ends, balances = _segments(accounts, days, balances, np.full(len(days), month_end_day))
+
+    if opening_balances is not None:
+        # Opening segments run from the month start up to each account's first transaction day, or the whole month
+        opening_balances = opening_balances[(opening_balances != 0) & ~opening_balances.index.isin(posted)]
+        opening_ends = first_days.reindex(opening_balances.index).fillna(month_end_day + 1).to_numpy(dtype=np.int64)
+        accounts = np.concatenate((accounts, opening_balances.index.to_numpy(dtype=object)))
+        balances = np.concatenate((balances, to_cents(opening_balances.to_numpy(dtype=float))))
+        starts = np.concatenate((starts, np.full(len(opening_balances), first_day)))
+        ends = np.concatenate((ends, np.maximum(opening_ends, first_day)))
+
+    if len(accounts) == 0:
+        return pd.Series(dtype=float)
+
+    # Exact rate-days per segment from the timeline's accumulated rates, rounded once per account
+    segment_interest = balances * timeline.rate_unit_days(starts, ends)
+
+    interest = pd.Series(segment_interest).groupby(accounts, sort=False).sum()
+    return pd.Series(from_cents(round_div(interest.to_numpy(), INTEREST_DIVISOR)), index=interest.index)
+
+
+def _month_days(months):
+    # First and last day ordinals of months counted since 1970-01
+    months = np.asarray(months, dtype=np.int64)
+    return (months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64),
+            (months + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) - 1)
+
+
+def _ledger_months(ledger_df):
+    # Account codes, account ids, day ordinals and account/month keys of the ledger rows
+    codes, account_ids = pd.factorize(ledger_df["account_id"], sort=True)
+    days = to_day_ordinals(ledger_df["date"])
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return codes.astype(np.int64), np.asarray(account_ids, dtype=object), days, codes.astype(np.int64) * MONTH_KEY + months
+
+
+def _open_pairs(codes, account_ids, days, months):
+    # Sorted account/month keys of every account with a row before the end of each of the months
+    first_days = pd.Series(days).groupby(codes).min().to_numpy() if len(days) else np.array([], dtype=np.int64)
+    grid_codes, grid_months = np.repeat(np.arange(len(account_ids)), len(months)), np.tile(months, len(account_ids))
+    open_accounts = first_days[grid_codes] <= _month_days(grid_months)[1]
+    return grid_codes[open_accounts] * MONTH_KEY + grid_months[open_accounts]
+
+
+def _month_segments(ledger_df, codes, account_ids, days, pair_keys, pairs):
+    """
+    Interest segments of sorted account/month keys, as in batch_monthly_interest:
+    each month's rows other than interest, and its opening balance from the
+    month start up to the first transaction day, or over the whole month. Returns the
+    segments' keys, starts, ends and balances in cents.
+    """
+    pair_firsts, pair_ends = _month_days(pairs % MONTH_KEY)
+    rows = np.flatnonzero((ledger_df["type"] != "I").to_numpy() & np.isin(pair_keys, pairs))
+    _, _, keys = transaction_keys(ledger_df["transaction_code"].iloc[rows]) if len(rows) else (None, None, np.array([], dtype=np.int64))
+    rows = rows[np.lexsort((keys, pair_keys[rows]))]
+    first_days = pd.Series(days[rows]).groupby(pair_keys[rows]).first().reindex(pairs).to_numpy()
+    groups, starts, ends, balances = _segments(pair_keys[rows], days[rows], to_cents(ledger_df["balance"].to_numpy(dtype=float)[rows]),
+                                               _month_days(pair_keys[rows] % MONTH_KEY)[1])
+
+    opening_balances = to_cents(BalanceHistory(ledger_df).balances_as_of(account_ids[pairs // MONTH_KEY], from_day_ordinals(pair_firsts - 1)))
+    opening_ends = np.where(np.isnan(first_days), pair_ends + 1, np.maximum(np.nan_to_num(first_days), pair_firsts))
+    return (np.concatenate((groups, pairs)), np.concatenate((starts, pair_firsts)),
+            np.concatenate((ends, opening_ends.astype(np.int64))), np.concatenate((balances, opening_balances)))
+
+
+def _compounded_adjustments(pairs, previous, current, rate_days):
+    """
+    Adjustments in cents of sorted account/month pairs from their segment
+    totals under both timelines. Each account's adjustments of earlier months
+    are carried into the month's balances, which earn at the month's current
+    rate-days, as if every month's interest had been posted afresh.
+    """
+    codes = pairs // MONTH_KEY
+    firsts = np.flatnonzero(np.append(True, codes[1:] != codes[:-1]))
+    owners = np.repeat(np.arange(len(firsts)), np.diff(np.append(firsts, len(pairs))))
+    ranks = np.arange(len(pairs)) - firsts[owners]
+
+    # Each month's rounding depends on the carry before it, so the running sum advances one month rank at a time
+    previous_cents = round_div(previous, INTEREST_DIVISOR)
+    carried = np.zeros(len(firsts), dtype=np.int64)
+    cents = np.zeros(len(pairs), dtype=np.int64)
+    by_rank = np.argsort(ranks, kind="stable")
+    bounds = np.searchsorted(ranks[by_rank], np.arange(ranks.max() + 2))
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        at = by_rank[first:last]
+        cents[at] = round_div(current[at] + carried[owners[at]] * rate_days[at], INTEREST_DIVISOR) - previous_cents[at]
+        carried[owners[at]] += cents[at]
+    return cents
+
+
+def interest_adjustments(ledger_df, previous_timeline, timeline):
+    """
+    Interest deltas for every account and month whose interest is already
+    posted and whose rates differ between the two timelines, or whose
+    balances an earlier month's delta changes, in one pass.
+
+    Only the months' interest segments are priced, under both timelines, and
+    each total is rounded to the cent as when it was posted; no statement is
+    rebuilt. Each account's deltas are carried into its later months'
+    balances, so the posted interest matches posting every month afresh
+    under the new rates. Returns a frame of account_id, date (the month end)
+    and amount for the non-zero adjustments.
+    """
+    adjustments = pd.DataFrame({"account_id": pd.Series(dtype=object), "date": pd.Series(dtype=np.int64),
+                                "amount": pd.Series(dtype=float)})
+    changed = timeline.changed_range(previous_timeline)
+    if changed is None or ledger_df.empty:
+        return adjustments
+    first_changed, _ = changed
+
+    # Months whose interest is posted, from the first changed rate on; later months earn on the earlier deltas.
+    # Month-end posting covers every open account, including those whose interest rounded to nothing
+    codes, account_ids, days, pair_keys = _ledger_months(ledger_df)
+    _, month_ends = _month_days(pair_keys % MONTH_KEY)
+    affected = (ledger_df["type"] == "I").to_numpy() & (month_ends >= first_changed)
+    pairs = _open_pairs(codes, account_ids, days, np.unique(pair_keys[affected] % MONTH_KEY))
+    if not len(pairs):
+        return adjustments
+
+    groups, starts, ends, balances = _month_segments(ledger_df, codes, account_ids, days, pair_keys, pairs)
+    rate_days = timeline.rate_unit_days(starts, ends)
+    totals = pd.DataFrame({"previous": balances * previous_timeline.rate_unit_days(starts, ends),
+                           "current": balances * rate_days, "rate_days": rate_days}).groupby(groups).sum().reindex(pairs)
+    cents = _compounded_adjustments(pairs, *(totals[column].to_numpy() for column in ["previous", "current", "rate_days"]))
+    adjusted = cents != 0
+    return pd.DataFrame({
+        "account_id": account_ids[pairs[adjusted] // MONTH_KEY],
+        "date": from_day_ordinals(_month_days(pairs[adjusted] % MONTH_KEY)[1]),
+        "amount": from_cents(cents[adjusted]),
+    }).sort_values(by=["date", "account_id"], ignore_index=True)
+
+
+def simulation_segments(ledger_df, first_month, last_month):
+    """
+    The interest segments of every account and month from YYYYMM first_month
+    to last_month, built once for pricing against any number of timelines.
+    Every account with a row before a month's end earns that month.
+    """
+    codes, account_ids, days, pair_keys = _ledger_months(ledger_df)
+    months = np.arange(_month_start(month_bounds(first_month)[0]).astype(np.int64),
+                       _month_start(month_bounds(last_month)[0]).astype(np.int64) + 1)
+    pairs = _open_pairs(codes, account_ids, days, months)
+    return account_ids, pairs, _month_segments(ledger_df, codes, account_ids, days, pair_keys, pairs)
+
+
+def price_segments(segments, timelines):
+    """
+    Interest of simulation_segments under each of K timelines, priced as one
+    K x segments matrix and rounded to the cent per account and month.
+    Returns a frame indexed by account_id with one column per timeline.
+    """
+    account_ids, pairs, (groups, starts, ends, balances) = segments
+    month_interest = pd.DataFrame((stacked_rate_unit_days(timelines, starts, ends) * balances).T).groupby(groups).sum().reindex(pairs)
+    cents = pd.DataFrame(round_div(month_interest.to_numpy(), INTEREST_DIVISOR)).groupby(pairs // MONTH_KEY).sum()
+    cents = cents.reindex(columns=range(len(timelines)), fill_value=0)
+    return pd.DataFrame(from_cents(cents.to_numpy()), index=pd.Index(account_ids[cents.index], name="account_id"))
+
+
+def simulate_interest(ledger_df, timelines, first_month, last_month):
+    """
+    Interest each account would earn from YYYYMM first_month to last_month
+    under each of K rate timelines, in one pass over the ledger.
+    """
+    return price_segments(simulation_segments(ledger_df, first_month, last_month), timelines)
@@ -0,0 +1,292 @@
+import bisect
+from itertools import chain
+import numpy as np
+import pandas as pd
+from helper import to_cents, from_cents
+
+# Transaction codes are YYYYMMdd-NN, ordered by date then running number
+KEY_SCALE = 1_000_000
+# YYYYMMdd dates fit in 25 bits, leaving the high bits of a history key for the account
+DATE_BITS = 25
+
+
+def transaction_key(date, running_number):
+    return int(date) * KEY_SCALE + int(running_number)
+
+
+def transaction_keys(codes):
+    """
+    Vectorized transaction_key for a Series of YYYYMMdd-NN transaction codes.
+    """
+    if isinstance(codes.dtype, pd.CategoricalDtype):
+        # Parse each distinct code once and look the rows up by category code
+        dates, running_numbers, keys = transaction_keys(pd.Series(codes.cat.categories))
+        category_codes = codes.cat.codes.to_numpy()
+        return dates[category_codes], running_numbers[category_codes], keys[category_codes]
+
+    parts = codes.astype(str).str.split("-", n=1, expand=True)
+    dates = parts[0].astype(np.int64).to_numpy()
+    running_numbers = parts[1].astype(np.int64).to_numpy()
+    return dates, running_numbers, dates * KEY_SCALE + running_numbers
+
+
+class LedgerIndex:
+    """
+    In-memory lookups over the ledger frame, maintained on insert:
+    account -> row positions in transaction order, account -> date -> last
+    running number, account -> latest balance, account -> month-end balances
+    and account -> suffix minimums of its balances.
+
+    Every lookup is keyed by account first, so a copy for a posting only
+    duplicates the posted account's entries and shares the others.
+    """
+
+    def __init__(self, df):
+        self.keys = {}
+        self.positions = {}
+        self.running_numbers = {}
+        self.balances = {}
+        # account -> (sorted YYYYMM months with activity, closing balance of each)
+        self.month_ends = {}
+        # account -> lowest balance in cents from each ledger entry onwards, aligned with keys
+        self.suffix_minimums = {}
+        # Every account's month ends as flat arrays, built on the first batch query
+        self._month_end_arrays = None
+
+        if df.empty:
+            return
+
+        dates, running_numbers, keys = transaction_keys(df["transaction_code"])
+        accounts = df["account_id"].to_numpy()
+        balances = pd.to_numeric(df["balance"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+        order = np.argsort(keys, kind="stable")
+        for account, indices in pd.Series(accounts[order]).groupby(accounts[order], sort=False).indices.items():
+            positions = order[indices]
+            self.keys[account] = keys[positions].tolist()
+            self.positions[account] = positions.tolist()
+            # Rows are in transaction order, so the last number kept for each date is its highest
+            self.running_numbers[account] = dict(zip(dates[positions].tolist(), running_numbers[positions].tolist()))
+            self.balances[account] = float(balances[positions[-1]])
+            self.month_ends[account] = self._month_ends(dates[positions] // 100, balances[positions])
+            self.suffix_minimums[account] = self._suffix_minimums(to_cents(balances[positions]))
+
+    @staticmethod
+    def _month_ends(months, balances):
+        last_of_month = np.append(months[1:] != months[:-1], True)
+        return months[last_of_month].tolist(), balances[last_of_month].astype(float).tolist()
+
+    @staticmethod
+    def _suffix_minimums(balances):
+        return np.minimum.accumulate(balances[::-1])[::-1]
+
+    def copy(self, *accounts):
+        """
+        A copy that can be updated for the given accounts without changing this
+        index. Only those accounts' entries are duplicated; the rest are shared.
+        """
+        index = LedgerIndex.__new__(LedgerIndex)
+        index.keys, index.positions, index.running_numbers = dict(self.keys), dict(self.positions), dict(self.running_numbers)
+        # Balances and suffix minimum arrays are replaced rather than changed in place, so they are shared
+        index.balances, index.month_ends, index.suffix_minimums = dict(self.balances), dict(self.month_ends), dict(self.suffix_minimums)
+        index._month_end_arrays = self._month_end_arrays if not accounts else None
+        for account in accounts:
+            if account in self.keys:
+                index.keys[account], index.positions[account] = list(self.keys[account]), list(self.positions[account])
+                index.running_numbers[account] = dict(self.running_numbers[account])
+            if account in self.month_ends:
+                months, balances = self.month_ends[account]
+                index.month_ends[account] = (list(months), list(balances))
+        return index
+
+    def __contains__(self, account):
+        return account in self.positions
+
+    def account_positions(self, account):
+        return self.positions.get(account, [])
+
+    def latest_balance(self, account):
+        return self.balances.get(account, 0.0)
+
+    def next_running_number(self, account, date):
+        return self.running_numbers.get(account, {}).get(int(date), 0) + 1
+
+    def insert(self, account, date, running_number, position):
+        """
+        Slot a new row into the account's ordered ledger and return its ordinal.
+        """
+        key = transaction_key(date, running_number)
+        keys = self.keys.setdefault(account, [])
+        start = bisect.bisect_right(keys, key)
+        keys.insert(start, key)
+        self.positions.setdefault(account, []).insert(start, position)
+
+        running_numbers = self.running_numbers.setdefault(account, {})
+        running_numbers[int(date)] = max(running_numbers.get(int(date), 0), int(running_number))
+        return start
+
+    def merge(self, account, keys, positions):
+        """
+        Slot several new rows into the account's ordered ledger at once and
+        return the ordinal of the earliest.
+        """
+        order = np.argsort(keys, kind="stable")
+        keys, positions = np.asarray(keys, dtype=np.int64)[order], np.asarray(positions, dtype=np.int64)[order]
+        account_keys, account_positions = self.keys.setdefault(account, []), self.positions.setdefault(account, [])
+        start = bisect.bisect_right(account_keys, int(keys[0]))
+        if start == len(account_keys):
+            # Rows posted after the account's latest row are appended
+            account_keys += keys.tolist()
+            account_positions += positions.tolist()
+        else:
+            tail_keys = np.concatenate((np.asarray(account_keys[start:], dtype=np.int64), keys))
+            tail_positions = np.concatenate((np.asarray(account_positions[start:], dtype=np.int64), positions))
+            merged = np.argsort(tail_keys, kind="stable")
+            account_keys[start:] = tail_keys[merged].tolist()
+            account_positions[start:] = tail_positions[merged].tolist()
+
+        # Keys are in order, so the last number kept for each date is its highest
+        running_numbers = self.running_numbers.setdefault(account, {})
+        for date, number in dict(zip((keys // KEY_SCALE).tolist(), (keys % KEY_SCALE).tolist())).items():
+            running_numbers[date] = max(running_numbers.get(date, 0), number)
+        return start
+
+    def update_balance(self, account, balance):
+        self.balances[account] = float(balance)
+
+    def update_month_ends(self, account, start, balances):
+        """
+        Refresh the account's month-end balances after its balances from
+        ordinal start onwards were recomputed.
+        """
+        # Every month from the start row's month on closes within the recomputed rows
+        months, closing = self._month_ends(np.asarray(self.keys[account][start:]) // KEY_SCALE // 100, np.asarray(balances))
+        snapshot_months, snapshot_balances = self.month_ends.setdefault(account, ([], []))
+        self._month_end_arrays = None
+        cut = bisect.bisect_left(snapshot_months, months[0])
+        snapshot_months[cut:] = months
+        snapshot_balances[cut:] = closing
+
+    def update_suffix_minimums(self, account, start, balances, head_balances):
+        """
+        Refresh the account's suffix minimums after its balances from ordinal
+        start onwards were recomputed, or a row was inserted at start.
+        head_balances returns the unchanged balances before start, in cents,
+        and is only called when a raised minimum has to be recomputed.
+        """
+        tail = self._suffix_minimums(np.asarray(balances, dtype=np.int64))
+        previous = self.suffix_minimums.get(account, np.array([], dtype=np.int64))
+        head = previous[:start]
+        if len(head) and start < len(previous) and tail[0] > previous[start]:
+            # The lowest later balance rose, so the head's minimums may rise too
+            head = self._suffix_minimums(np.asarray(head_balances(), dtype=np.int64))
+        self.suffix_minimums[account] = np.concatenate((np.minimum(head, tail[0]), tail))
+
+    def lowest_balance_from(self, account, date):
+        """
+        The lowest balance, in cents, that a posting at the end of a YYYYMMdd
+        date would shift: the balance just before it and every later balance.
+        """
+        start = bisect.bisect_right(self.keys.get(account, []), transaction_key(date, KEY_SCALE - 1))
+        minimums = self.suffix_minimums.get(account, [])
+        if start > 0:
+            # The minimum from the previous entry covers its balance and every later one
+            return int(minimums[start - 1])
+        return min(0, int(minimums[0])) if len(minimums) else 0
+
+    def opening_balance(self, account, month):
+        """
+        Balance carried into a YYYYMM month: the closing balance of the account's last earlier active month.
+        """
+        months, balances = self.month_ends.get(account, ([], []))
+        position = bisect.bisect_left(months, int(month))
+        return balances[position - 1] if position > 0 else 0.0
+
+    def _flat_month_ends(self):
+        # Accounts, and every account's (code * KEY_SCALE + YYYYMM month) keys in sorted order with their closing balances
+        if self._month_end_arrays is None:
+            accounts = list(self.month_ends)
+            lengths = np.fromiter((len(months) for months, _ in self.month_ends.values()), dtype=np.int64, count=len(accounts))
+            months = np.fromiter(chain.from_iterable(months for months, _ in self.month_ends.values()), dtype=np.int64, count=lengths.sum())
+            balances = np.fromiter(chain.from_iterable(balances for _, balances in self.month_ends.values()), dtype=float, count=lengths.sum())
+            keys = np.repeat(np.arange(len(accounts), dtype=np.int64), lengths) * KEY_SCALE + months
+            self._month_end_arrays = (pd.Index(accounts, dtype=object), keys, balances)
+        return self._month_end_arrays
+
+    def opening_balances(self, month):
+        """
+        Opening balances of every account for a YYYYMM month, as a Series indexed
+        by account_id, by one binary search over the flat month-end arrays.
+        """
+        accounts, keys, balances = self._flat_month_ends()
+        if not len(keys):
+            return pd.Series([], index=accounts, dtype=float)
+        codes = np.arange(len(accounts), dtype=np.int64)
+        positions = np.searchsorted(keys, codes * KEY_SCALE + int(month)) - 1
+        clipped = np.maximum(positions, 0)
+        # A month before the account's first active month lands on the previous account, or before the start
+        found = (positions >= 0) & (keys[clipped] // KEY_SCALE == codes)
+        return pd.Series(np.where(found, balances[clipped], 0.0), index=accounts, dtype=float)
+
+
+class BalanceHistory:
+    """
+    End-of-day balances of every account for point-in-time queries: each
+    account's sorted activity dates and the cumulative sum of its signed
+    amounts in cents at the close of each date, stored as flat arrays.
+    """
+
+    def __init__(self, df):
+        codes, accounts = pd.factorize(df["account_id"], sort=True)
+        self.accounts = {account: code for code, account in enumerate(accounts)}
+        if df.empty:
+            self.keys = np.array([], dtype=np.int64)
+            self.dates = np.array([], dtype=np.int64)
+            self.balances = np.array([], dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+
+        dates, _, keys = transaction_keys(df["transaction_code"])
+        order = np.lexsort((keys, codes))
+        codes, dates = codes[order].astype(np.int64), dates[order]
+        amounts = to_cents(df["amount"].to_numpy(dtype=float)[order])
+        types = df["type"].to_numpy()[order]
+        signed = np.where(types == "W", -amounts, np.where(np.isin(types, ["D", "I"]), amounts, 0))
+
+        # Running balance per account: the global cumsum less the total before the account's first row
+        starts = np.searchsorted(codes, np.arange(len(accounts) + 1))
+        cumulative = np.cumsum(signed)
+        before = np.concatenate(([0], cumulative))[starts[:-1]]
+        balances = cumulative - np.repeat(before, np.diff(starts))
+
+        # Only the last row of each account and date closes the day
+        end_of_day = np.append((codes[1:] != codes[:-1]) | (dates[1:] != dates[:-1]), True)
+        self.dates = dates[end_of_day]
+        self.balances = balances[end_of_day]
+        self.keys = (codes[end_of_day] << DATE_BITS) | self.dates
+        self.offsets = np.searchsorted(codes[end_of_day], np.arange(len(accounts) + 1))
+
+    def balance_as_of(self, account, date):
+        """
+        The account's balance at the end of a YYYYMMdd date, 0.0 before its first transaction.
+        """
+        code = self.accounts.get(account)
+        if code is None:
+            return 0.0
+        start, end = self.offsets[code], self.offsets[code + 1]
+        position = start + np.searchsorted(self.dates[start:end], int(date), side="right") - 1
+        return float(from_cents(self.balances[position])) if position >= start else 0.0
+
+    def balances_as_of(self, accounts, dates):
+        """
+        Vectorized balance_as_of over arrays of accounts and YYYYMMdd dates.
+        """
+        codes = pd.Series(accounts).map(self.accounts).fillna(-1).to_numpy(dtype=np.int64)
+        if not len(self.keys):
+            return np.zeros(len(codes))
+        queries = (codes << DATE_BITS) | np.asarray(dates, dtype=np.int64)
+        positions = np.searchsorted(self.keys, queries, side="right") - 1
+        clipped = np.maximum(positions, 0)
+        # A query before the account's first date lands on the previous account, or before the start
+        found = (codes >= 0) & (positions >= 0) & (self.keys[clipped] >> DATE_BITS == codes)
+        return from_cents(np.where(found, self.balances[clipped], 0))
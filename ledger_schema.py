@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from helper import to_day_ordinals, from_day_ordinals
+from ledger_index import transaction_keys, KEY_SCALE
+
+TYPE_CODES = np.array(["D", "W", "I"])
+
+# In-memory ledger frame: repeated strings are categorical, so each row holds small integer codes
+LEDGER_DTYPES = {
+    "account_id": pd.CategoricalDtype(),
+    "date": np.int32,
+    "transaction_code": pd.CategoricalDtype(),
+    "type": pd.CategoricalDtype(TYPE_CODES),
+    "amount": np.float64,
+    "balance": np.float64,
+}
+
+# Columnar snapshot and shared-memory arrays, sorted by account then transaction code
+LEDGER_COLUMNS = {
+    "account": np.int32,
+    "day": np.int64,
+    "running_number": np.int32,
+    "type": np.int8,
+    "amount": np.float64,
+    "balance": np.float64,
+}
+
+
+def _open_categories(dtype):
+    # Categorical columns whose categories grow with the data
+    return isinstance(dtype, pd.CategoricalDtype) and dtype.categories is None
+
+
+def _compact_column(values, dtype):
+    if values.dtype == dtype or (isinstance(values.dtype, pd.CategoricalDtype) and _open_categories(dtype)):
+        return values
+    if _open_categories(dtype):
+        # Sorted categories keep sorting by the column in string order
+        return pd.Series(pd.Categorical(values.astype(str)), index=values.index)
+    if isinstance(dtype, pd.CategoricalDtype):
+        return values.astype(str).astype(dtype)
+    return values.astype(dtype)
+
+
+def compact_ledger(ledger_df):
+    """
+    The ledger frame in the compact schema of LEDGER_DTYPES.
+    """
+    columns = {name: _compact_column(ledger_df[name], dtype) for name, dtype in LEDGER_DTYPES.items()}
+    return pd.DataFrame(columns, index=ledger_df.index)
+
+
+def concat_ledger(frames):
+    """
+    Concatenate ledger frames into one compact frame with a fresh RangeIndex.
+    Categories are merged instead of falling back to strings.
+    """
+    frames = [compact_ledger(frame) for frame in frames]
+    columns = {}
+    for name, dtype in LEDGER_DTYPES.items():
+        if _open_categories(dtype):
+            columns[name] = union_categoricals([frame[name] for frame in frames], sort_categories=True)
+        else:
+            columns[name] = pd.concat([frame[name] for frame in frames], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def encode_ledger(ledger_df):
+    """
+    Columnar numeric arrays of the ledger sorted by account then transaction
+    code, the account ids and each account's [start, end) row offsets.
+    """
+    account_codes, account_ids = pd.factorize(ledger_df["account_id"], sort=True)
+    dates, running_numbers, _ = transaction_keys(ledger_df["transaction_code"]) if len(ledger_df) else (np.array([], dtype=np.int64),) * 3
+    order = np.lexsort((running_numbers, dates, account_codes))
+
+    columns = {
+        "account": account_codes[order],
+        "day": to_day_ordinals(dates[order]),
+        "running_number": running_numbers[order],
+        "type": pd.Categorical(ledger_df["type"], categories=TYPE_CODES).codes[order],
+        "amount": ledger_df["amount"].to_numpy(dtype=float)[order],
+        "balance": ledger_df["balance"].to_numpy(dtype=float)[order],
+    }
+    columns = {name: np.ascontiguousarray(values, dtype=LEDGER_COLUMNS[name]) for name, values in columns.items()}
+    offsets = np.searchsorted(columns["account"], np.arange(len(account_ids) + 1))
+    return columns, list(account_ids), offsets
+
+
+def decode_ledger(columns, account_ids):
+    """
+    Ledger frame in the compact schema from the columnar arrays of encode_ledger.
+    Categorical columns are built from their codes, so only distinct
+    transaction codes are formatted as strings.
+    """
+    dates = from_day_ordinals(columns["day"])
+    keys = dates * KEY_SCALE + np.asarray(columns["running_number"], dtype=np.int64)
+    unique_keys, key_codes = np.unique(keys, return_inverse=True)
+    codes = pd.Series(unique_keys // KEY_SCALE).astype(str) + "-" + pd.Series(unique_keys % KEY_SCALE).astype(str).str.zfill(2)
+    # Categories are kept in string order, as compact_ledger builds them
+    order = np.argsort(codes.to_numpy(dtype=str), kind="stable")
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+
+    return pd.DataFrame({
+        "account_id": pd.Categorical.from_codes(np.asarray(columns["account"]), categories=pd.Index(account_ids).astype(str)),
+        "date": dates.astype(LEDGER_DTYPES["date"]),
+        "transaction_code": pd.Categorical.from_codes(ranks[key_codes], categories=pd.Index(codes.to_numpy()[order]).astype(str)),
+        "type": pd.Categorical.from_codes(np.asarray(columns["type"]), dtype=LEDGER_DTYPES["type"]),
+        "amount": np.asarray(columns["amount"], dtype=float),
+        "balance": np.asarray(columns["balance"], dtype=float),
+    })
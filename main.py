@@ -1,9 +1,18 @@
 import os
+import sys
+import atexit
+import json
+import argparse
+import asyncio
 import yaml
 
 from account import Account
 from compute_transaction import ComputeTransaction
 from rule import Rule
+from repository import ConnectionPool, SqlLedgerRepository, SqlRuleRepository
+from service import BankService
+from http_service import serve
+from metrics import METRICS
 
 # Menu
 def main(config, account, rule, compute_transaction):
@@ -29,7 +38,9 @@ def main(config, account, rule, compute_transaction):
             account.transactions_input()
             print(f"{config["menu_continue"]}")
         elif choice == 'i':
+            previous_timeline = rule.snapshot().timeline
             rule.interest_input()
+            compute_transaction.recalculate_interest(account, previous_timeline, rule.timeline)
             print(f"{config["menu_continue"]}")
         elif choice == 'p':
             compute_transaction.print_input(account, rule)
@@ -39,14 +50,62 @@ def main(config, account, rule, compute_transaction):
             break
 
 
+# Batch commands
+def cli(argv, service):
+    parser = argparse.ArgumentParser(description="Run bank actions without the interactive menu. Results are printed as JSON lines.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    post = commands.add_parser("post", help="post a transaction")
+    post.add_argument("arguments", nargs=4, metavar=("date", "account", "type", "amount"))
+    rule = commands.add_parser("rule", help="define an interest rule")
+    rule.add_argument("arguments", nargs=3, metavar=("date", "rule_id", "rate"))
+    statement = commands.add_parser("statement", help="print a monthly statement")
+    statement.add_argument("arguments", nargs=2, metavar=("account", "month"))
+    balance = commands.add_parser("balance", help="print an account's balance at the end of a date")
+    balance.add_argument("arguments", nargs=2, metavar=("account", "date"))
+    batch = commands.add_parser("batch", help="run one command per line of a file, - for stdin")
+    batch.add_argument("file")
+    server = commands.add_parser("serve", help="serve the actions over HTTP on localhost")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        asyncio.run(serve(service.config, service.account, service.rule, args.host, args.port))
+        return 0
+
+    if args.command == "batch":
+        failed = 0
+        with (open(args.file, encoding="utf-8") if args.file != "-" else sys.stdin) as lines:
+            for result in service.run_batch(lines):
+                failed += not result["ok"]
+                print(json.dumps(result))
+        return 1 if failed else 0
+
+    result = service.execute(args.command, *args.arguments)
+    print(json.dumps(result))
+    return 0 if result["ok"] else 1
+
+
 if __name__ == "__main__":
     with open(os.path.dirname(os.path.realpath(__file__)) + '/config.yaml') as f:
         config = yaml.load(f, Loader=yaml.FullLoader)
 
+    postgresql_config = config["postgresql"]
     config = config["settings"]
-    account = Account(config)
-    rule = Rule(config)
+    # Stage timings and counters are written to metrics_file on exit
+    if METRICS.configure(config).enabled:
+        atexit.register(METRICS.dump)
+    if config.get("ledger_backend") == "postgresql":
+        pool = ConnectionPool.for_postgresql(postgresql_config)
+        account = Account(config, store=SqlLedgerRepository(pool))
+        rule = Rule(config, store=SqlRuleRepository(pool))
+    else:
+        account = Account(config)
+        rule = Rule(config)
     compute_transaction = ComputeTransaction(config)
 
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:], BankService(config, account, rule, compute_transaction)))
+
     print(f"Welcome to {config["bank_name"]}! What would you like to do?")
     main(config, account, rule, compute_transaction)
\ No newline at end of file
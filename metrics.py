@@ -0,0 +1,130 @@
+import json
+import time
+import threading
+from contextlib import nullcontext
+from collections import defaultdict
+
+PROMETHEUS_PREFIX = "bank"
+
+
+class _Stage:
+    # Times one run of a stage; counters recorded meanwhile are attributed to it
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.metrics._stack().append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.metrics._stack().pop()
+        self.metrics._record(self.name, elapsed)
+        return False
+
+
+class Metrics:
+    """
+    Opt-in per-stage timers and counters for the posting, rule and statement
+    paths. Disabled by default, in which case stage() and count() do nothing.
+
+    Enable with metrics_enabled: True in config.yaml; dump() writes to
+    metrics_file as Prometheus text, or as JSON when the file ends in .json.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def configure(self, config):
+        self.enabled = bool(config.get("metrics_enabled", False))
+        self.path = config.get("metrics_file")
+        return self
+
+    def reset(self):
+        with self._lock:
+            # stage -> [calls, total seconds, max seconds]
+            self.timers = defaultdict(lambda: [0, 0.0, 0.0])
+            # (counter, stage) -> total
+            self.counters = defaultdict(int)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _record(self, name, elapsed):
+        with self._lock:
+            timer = self.timers[name]
+            timer[0] += 1
+            timer[1] += elapsed
+            timer[2] = max(timer[2], elapsed)
+
+    def stage(self, name):
+        """
+        Context manager timing a named stage, e.g. with METRICS.stage("account.rebalance").
+        """
+        return _Stage(self, name) if self.enabled else nullcontext()
+
+    def count(self, counter, value=1):
+        """
+        Add value to a counter such as rows_scanned, attributed to the innermost open stage.
+        """
+        if not self.enabled:
+            return
+        stack = self._stack()
+        with self._lock:
+            self.counters[(counter, stack[-1] if stack else "")] += int(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "stages": {name: {"calls": calls, "seconds": seconds, "max_seconds": max_seconds}
+                           for name, (calls, seconds, max_seconds) in sorted(self.timers.items())},
+                "counters": [{"counter": counter, "stage": stage, "value": value}
+                             for (counter, stage), value in sorted(self.counters.items())],
+            }
+
+    def prometheus_text(self):
+        """
+        The timers and counters in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for metric, field, help_text in [("stage_calls_total", "calls", "Runs of each stage."),
+                                         ("stage_seconds_total", "seconds", "Time spent in each stage."),
+                                         ("stage_seconds_max", "max_seconds", "Slowest run of each stage.")]:
+            name = f"{PROMETHEUS_PREFIX}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {'gauge' if metric.endswith('max') else 'counter'}"]
+            lines += [f'{name}{{stage="{stage}"}} {values[field]}' for stage, values in snapshot["stages"].items()]
+
+        for counter in sorted({row["counter"] for row in snapshot["counters"]}):
+            name = f"{PROMETHEUS_PREFIX}_{counter}_total"
+            lines += [f"# TYPE {name} counter"]
+            lines += [f'{name}{{stage="{row["stage"]}"}} {row["value"]}' for row in snapshot["counters"] if row["counter"] == counter]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path=None):
+        """
+        Write the metrics to path (default metrics_file). Returns the path written, or None.
+        """
+        path = path or self.path
+        if path is None:
+            return None
+        with open(path, "w", encoding="utf-8") as file:
+            if str(path).endswith(".json"):
+                json.dump(self.snapshot(), file, indent=2)
+            else:
+                file.write(self.prometheus_text())
+        return path
+
+
+# Shared by every module so one dump covers the whole process
+METRICS = Metrics()
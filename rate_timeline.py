@@ -0,0 +1,158 @@
+import numpy as np
+from helper import to_day_ordinals, RATE_SCALE
+
+# Day ordinals fit in 32 bits, leaving the high bits of a stacked key for the timeline
+SCENARIO_SHIFT = 32
+
+
+class RateTimeline:
+    """
+    Interest rules as a sorted timeline of day ordinals and rates (in %). Each
+    rate is effective from its day until the next rule's day. Rates are kept
+    as integer hundredths of a percent so rate-days accumulate exactly.
+    """
+
+    def __init__(self, days=(), rates=()):
+        order = np.argsort(np.asarray(days, dtype=np.int64), kind="stable")
+        self.days = np.asarray(days, dtype=np.int64)[order]
+        self.rate_units = np.rint(np.asarray(rates, dtype=float) * RATE_SCALE).astype(np.int64)[order]
+        self._refresh()
+
+    @classmethod
+    def from_rules(cls, rules_df):
+        return cls(to_day_ordinals(rules_df["date"]), rules_df["rate"].to_numpy(dtype=float))
+
+    @property
+    def rates(self):
+        return self.rate_units / RATE_SCALE
+
+    def _refresh(self):
+        # Derived once per change: effective-until days and the rate-days accumulated up to each rule
+        self.effective_until = np.append(self.days[1:], np.iinfo(np.int64).max)
+        self._accumulated = np.concatenate(([0], np.cumsum(self.rate_units[:-1] * np.diff(self.days)))).astype(np.int64)
+
+    def copy(self):
+        timeline = RateTimeline.__new__(RateTimeline)
+        timeline.days, timeline.rate_units = self.days.copy(), self.rate_units.copy()
+        timeline._refresh()
+        return timeline
+
+    def __len__(self):
+        return len(self.days)
+
+    def set_rate(self, day, rate):
+        """
+        Add the rule effective from day, or replace the rule already on that day.
+        Returns True if a new rule was added.
+        """
+        position = np.searchsorted(self.days, day)
+        rate_units = int(round(float(rate) * RATE_SCALE))
+        added = bool(position == len(self.days) or self.days[position] != day)
+        if added:
+            self.days = np.insert(self.days, position, day)
+            self.rate_units = np.insert(self.rate_units, position, rate_units)
+        else:
+            self.rate_units[position] = rate_units
+        self._refresh()
+        return added
+
+    def rule_positions(self, days):
+        # Index of the rule in force on each day, -1 before the first rule
+        return np.searchsorted(self.days, days, side="right") - 1
+
+    def rate_units_at(self, day):
+        position = self.rule_positions(day)
+        return int(self.rate_units[position]) if position >= 0 else 0
+
+    def _rate_units_on(self, days):
+        # Vectorized rate_units_at
+        positions = self.rule_positions(days)
+        return np.where(positions >= 0, self.rate_units[np.maximum(positions, 0)], 0) if len(self.days) else np.zeros(len(days), dtype=np.int64)
+
+    def changed_range(self, other):
+        """
+        The [first_day, until_day) range of days whose rate differs from the
+        other timeline's, with until_day None when it runs on indefinitely.
+        Returns None when both timelines give the same rate on every day.
+        """
+        days = np.union1d(self.days, other.days)
+        differ = np.flatnonzero(self._rate_units_on(days) != other._rate_units_on(days))
+        if not len(differ):
+            return None
+        # Rates only change on rule days, so the difference ends at the boundary after the last differing one
+        until = differ[-1] + 1
+        return int(days[differ[0]]), int(days[until]) if until < len(days) else None
+
+    def rate_at(self, day):
+        return self.rate_units_at(day) / RATE_SCALE
+
+    def _segment_units(self, first_day, end_day):
+        # Rules starting inside the range split it
+        inside = slice(np.searchsorted(self.days, first_day, side="right"), np.searchsorted(self.days, end_day))
+        starts = np.concatenate(([first_day], self.days[inside]))
+        ends = np.append(self.days[inside], end_day)
+        rate_units = np.concatenate(([self.rate_units_at(first_day)], self.rate_units[inside])).astype(np.int64)
+        return starts, ends, rate_units
+
+    def segments(self, first_day, end_day):
+        """
+        Constant-rate segments covering [first_day, end_day) as starts, ends and rates.
+        """
+        starts, ends, rate_units = self._segment_units(first_day, end_day)
+        return starts, ends, rate_units / RATE_SCALE
+
+    def daily_rate_units(self, first_day, last_day):
+        """
+        Rate units in force on each day from first_day to last_day inclusive.
+        """
+        starts, ends, rate_units = self._segment_units(first_day, last_day + 1)
+        return np.repeat(rate_units, ends - starts)
+
+    def daily_rates(self, first_day, last_day):
+        return self.daily_rate_units(first_day, last_day) / RATE_SCALE
+
+    def accumulated_units(self, days):
+        """
+        Rate-unit days accumulated from the first rule up to (not including) each day.
+        """
+        days = np.asarray(days, dtype=np.int64)
+        if not len(self.days):
+            return np.zeros(days.shape, dtype=np.int64)
+        positions = self.rule_positions(days)
+        clipped = np.maximum(positions, 0)
+        return np.where(positions >= 0, self._accumulated[clipped] + self.rate_units[clipped] * (days - self.days[clipped]), 0)
+
+    def rate_unit_days(self, start_days, end_days):
+        """
+        Exact sum of the daily rate units over each [start, end) range, vectorized over arrays of ranges.
+        """
+        return self.accumulated_units(end_days) - self.accumulated_units(start_days)
+
+    def rate_days(self, start_days, end_days):
+        return self.rate_unit_days(start_days, end_days) / RATE_SCALE
+
+
+def stacked_rate_unit_days(timelines, start_days, end_days):
+    """
+    rate_unit_days of every [start, end) range under each of K timelines, as
+    a K x N matrix. The timelines are stacked into one sorted array keyed by
+    (timeline, day), so all K x N lookups are a single searchsorted.
+    """
+    start_days, end_days = np.asarray(start_days, dtype=np.int64), np.asarray(end_days, dtype=np.int64)
+    scenarios = np.repeat(np.arange(len(timelines)), [len(timeline) for timeline in timelines])
+    if not len(scenarios):
+        return np.zeros((len(timelines), len(start_days)), dtype=np.int64)
+    days = np.concatenate([timeline.days for timeline in timelines])
+    rate_units = np.concatenate([timeline.rate_units for timeline in timelines])
+    accumulated = np.concatenate([timeline._accumulated for timeline in timelines])
+    keys = (scenarios << SCENARIO_SHIFT) + days
+
+    def accumulated_units(query_days):
+        query_scenarios = np.arange(len(timelines))[:, None]
+        positions = np.searchsorted(keys, (query_scenarios << SCENARIO_SHIFT) + query_days[None, :], side="right") - 1
+        clipped = np.maximum(positions, 0)
+        # Days before a timeline's first rule land on the previous timeline, or before the start
+        found = (positions >= 0) & (scenarios[clipped] == query_scenarios)
+        return np.where(found, accumulated[clipped] + rate_units[clipped] * (query_days[None, :] - days[clipped]), 0)
+
+    return accumulated_units(end_days) - accumulated_units(start_days)
@@ -0,0 +1,259 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from ledger_index import transaction_keys
+from ledger_schema import compact_ledger
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    account_id VARCHAR(32) NOT NULL,
+    date INTEGER NOT NULL,
+    running_number INTEGER NOT NULL,
+    type CHAR(1) NOT NULL,
+    amount NUMERIC(18, 2) NOT NULL,
+    PRIMARY KEY (account_id, date, running_number)
+)
+"""
+
+# One row per account, locked by each transaction posting to it
+LOCK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_lock (
+    account_id VARCHAR(32) PRIMARY KEY,
+    version INTEGER NOT NULL
+)
+"""
+
+RULE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS interest_rule (
+    date INTEGER PRIMARY KEY,
+    rule_id VARCHAR(32) NOT NULL,
+    rate NUMERIC(6, 2) NOT NULL
+)
+"""
+
+SIGNED_AMOUNT = "CASE WHEN type = 'W' THEN -amount ELSE amount END"
+
+# Running balances are aggregated by the database instead of stored per row
+LEDGER_SELECT = f"""
+SELECT account_id, date, running_number, type, amount,
+       SUM({SIGNED_AMOUNT}) OVER (PARTITION BY account_id ORDER BY date, running_number) AS balance
+FROM ledger
+"""
+
+
+class ConnectionPool:
+    """
+    A fixed-size pool of DB-API connections shared by the repositories.
+    """
+
+    def __init__(self, connect, size=5, placeholder="%s"):
+        self.placeholder = placeholder
+        self._connections = queue.Queue()
+        # The connection of each thread's open transaction, if any
+        self._bound = threading.local()
+        for _ in range(size):
+            self._connections.put(connect())
+
+    @classmethod
+    def for_postgresql(cls, postgresql_config, size=5):
+        try:
+            import psycopg2
+        except ImportError as error:
+            raise ImportError("psycopg2 is required for the postgresql ledger backend") from error
+
+        def connect():
+            return psycopg2.connect(dbname=postgresql_config["database"], user=postgresql_config["user"],
+                                    password=postgresql_config["password"], host=postgresql_config["host"],
+                                    port=postgresql_config["port"], sslmode=postgresql_config["sslmode"])
+
+        return cls(connect, size=size, placeholder="%s")
+
+    @classmethod
+    def for_sqlite(cls, path, size=5):
+        return cls(lambda: sqlite3.connect(path, check_same_thread=False), size=size, placeholder="?")
+
+    @contextmanager
+    def connection(self):
+        bound = getattr(self._bound, "connection", None)
+        if bound is not None:
+            # Part of the thread's open transaction, which commits or rolls back as a whole
+            yield bound
+            return
+        connection = self._connections.get()
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self._connections.put(connection)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run every query and execute of this thread on one connection until the
+        block ends, then commit, or roll back on error.
+        """
+        with self.connection() as connection:
+            self._bound.connection = connection
+            try:
+                yield connection
+            finally:
+                self._bound.connection = None
+
+    def query(self, sql, params=()):
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql.replace("?", self.placeholder), params)
+            columns = [column[0] for column in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    def execute(self, sql, rows=None, batch_size=1000):
+        with self.connection() as connection:
+            cursor = connection.cursor()
+            sql = sql.replace("?", self.placeholder)
+            if rows is None:
+                cursor.execute(sql)
+                return
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[start:start + batch_size])
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get().close()
+
+
+class SqlLedgerRepository:
+    """
+    Ledger backed by a SQL database, with the same interface as storage.LedgerStore.
+
+    Several processes may post to the same database. Each posting runs in a
+    transaction() that locks its accounts, in which Account merges the rows
+    other processes have posted to them before checking and numbering its
+    own, and statements read the month's rows and opening balance from the
+    database rather than from the process's copy.
+    """
+
+    # Account merges other processes' postings and reads statements through the repository
+    shared = True
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.wal_rows = 0
+        self.pool.execute(LEDGER_SCHEMA)
+        self.pool.execute(LOCK_SCHEMA)
+
+    def _ledger_frame(self, rows_df):
+        rows_df = rows_df.astype({"date": np.int64, "running_number": np.int64, "amount": float, "balance": float})
+        rows_df["transaction_code"] = rows_df["date"].astype(str) + "-" + rows_df["running_number"].astype(str).str.zfill(2)
+        return compact_ledger(rows_df)
+
+    def is_empty(self):
+        return self.pool.query("SELECT COUNT(*) AS count FROM ledger")["count"].iloc[0] == 0
+
+    def load(self, accounts=None):
+        # Account reads the whole table at startup, then the accounts other processes have posted to
+        if accounts is None:
+            rows_df = self.pool.query(LEDGER_SELECT)
+        else:
+            accounts = list(accounts)
+            rows_df = self.pool.query(f"{LEDGER_SELECT} WHERE account_id IN ({', '.join('?' * len(accounts))})", accounts)
+        return self._ledger_frame(rows_df), np.array([], dtype=object)
+
+    def append(self, rows_df):
+        """
+        Batched insert of new postings.
+        """
+        if rows_df.empty:
+            return
+        dates, running_numbers, _ = transaction_keys(rows_df["transaction_code"])
+        rows = list(zip(rows_df["account_id"], dates.tolist(), running_numbers.tolist(), rows_df["type"],
+                        rows_df["amount"].astype(float).tolist()))
+        self.pool.execute("INSERT INTO ledger (account_id, date, running_number, type, amount) VALUES (?, ?, ?, ?, ?)", rows)
+
+    def compact(self, ledger_df):
+        # Replace the table contents with the given ledger; only used to seed an empty database
+        self.pool.execute("DELETE FROM ledger")
+        self.append(ledger_df)
+
+    def versions(self, accounts=None):
+        """
+        The number of transactions that have locked each account, for the accounts or every account.
+        """
+        if accounts is None:
+            versions_df = self.pool.query("SELECT account_id, version FROM ledger_lock")
+        elif not accounts:
+            return {}
+        else:
+            versions_df = self.pool.query(f"SELECT account_id, version FROM ledger_lock "
+                                          f"WHERE account_id IN ({', '.join('?' * len(accounts))})", list(accounts))
+        return dict(zip(versions_df["account_id"], versions_df["version"].astype(int).tolist()))
+
+    @contextmanager
+    def transaction(self, accounts=None):
+        """
+        Lock the accounts, or every account when None, until the end of one
+        transaction in which this thread's appends commit together. Yields
+        each account's version, this transaction included.
+        """
+        with self.pool.transaction():
+            accounts = sorted(set(self.versions() if accounts is None else accounts))
+            # Locks are taken in account order, so two transactions never wait on each other
+            rows = [(account,) for account in accounts]
+            self.pool.execute("INSERT INTO ledger_lock (account_id, version) VALUES (?, 0) ON CONFLICT (account_id) DO NOTHING", rows)
+            self.pool.execute("UPDATE ledger_lock SET version = version + 1 WHERE account_id = ?", rows)
+            yield self.versions(accounts)
+
+    # Statement reads, answered by the database so they include every process's postings
+
+    def has_account(self, account):
+        return self.pool.query("SELECT COUNT(*) AS count FROM ledger WHERE account_id = ?", (account,))["count"].iloc[0] > 0
+
+    def opening_balance(self, account, date):
+        """
+        The account's balance carried into a YYYYMMdd date.
+        """
+        balance_df = self.pool.query(f"SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) AS balance FROM ledger WHERE account_id = ? AND date < ?",
+                                     (account, int(date)))
+        return float(balance_df["balance"].iloc[0])
+
+    def month_transactions(self, account, first_date, last_date):
+        """
+        One account's rows between two YYYYMMdd dates, with balances carried from earlier rows.
+        """
+        rows_df = self.pool.query(f"SELECT * FROM ({LEDGER_SELECT} WHERE account_id = ?) account_ledger "
+                                  "WHERE date BETWEEN ? AND ? ORDER BY date, running_number",
+                                  (account, int(first_date), int(last_date)))
+        return self._ledger_frame(rows_df)
+
+
+class SqlRuleRepository:
+    """
+    Interest rules backed by a SQL database, with the same interface as storage.RuleStore.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.wal_rows = 0
+        self.pool.execute(RULE_SCHEMA)
+
+    def is_empty(self):
+        return self.pool.query("SELECT COUNT(*) AS count FROM interest_rule")["count"].iloc[0] == 0
+
+    def load(self):
+        rules_df = self.pool.query("SELECT date, rule_id, rate FROM interest_rule ORDER BY date, rule_id")
+        return rules_df.astype({"date": np.int64, "rule_id": object, "rate": float})
+
+    def append(self, rules_df):
+        # A rule replaces any earlier rule of the same date
+        rows = list(zip(rules_df["date"].astype(int).tolist(), rules_df["rule_id"], rules_df["rate"].astype(float).tolist()))
+        self.pool.execute("INSERT INTO interest_rule (date, rule_id, rate) VALUES (?, ?, ?) "
+                          "ON CONFLICT (date) DO UPDATE SET rule_id = excluded.rule_id, rate = excluded.rate", rows)
+
+    def compact(self, rules_df):
+        self.pool.execute("DELETE FROM interest_rule")
+        self.append(rules_df)
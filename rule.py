@@ -1,35 +1,139 @@
 import os
+import threading
+import numpy as np
 import pandas as pd
-from helper import validate_date_format, validate_rate
+from helper import validate_date_format, validate_rate, to_day_ordinals, from_day_ordinals
+from rate_timeline import RateTimeline
+from storage import RuleStore
+from metrics import METRICS
 from datetime import datetime
 
+class RuleSnapshot:
+    """
+    A published version of the rules and their rate timeline, never mutated by writers.
+    """
+
+    def __init__(self, version, df, timeline):
+        self.version = version
+        self.df = df
+        self._timeline = timeline
+
+    @property
+    def timeline(self):
+        if self._timeline is None:
+            self._timeline = RateTimeline.from_rules(self.df)
+        return self._timeline
+
+
 class Rule:
-    def __init__(self, config):
+    def __init__(self, config, store=None):
         filename = "/rule.txt"
+        # Called with the YYYYMMdd range [first_date, until_date) whose rates changed, None meaning unbounded
+        self.listeners = []
+        # Writers are serialized; readers take snapshot() without locking
+        self._write_lock = threading.RLock()
+        self.version = 0
         pd.options.display.float_format = "{:,.2f}".format
-        self.df = pd.read_csv(os.path.dirname(os.path.realpath(__file__)) + filename, delimiter=',', encoding="utf-8", skipinitialspace=True)
         self.config = config
+        self.store = store
 
-    def clean_rule(self, date, rule, rate):
-        # Filter transactions for the same account_id and date
-        print(self.df)
-        existing_rule = self.df[(self.df["date"] == int(date))]
+        if self.store is None and config.get("storage_dir"):
+            self.store = RuleStore(os.path.join(os.path.dirname(os.path.realpath(__file__)), config["storage_dir"], "rules"))
+
+        if self.store is not None and not self.store.is_empty():
+            self.df = self.store.load()
+        else:
+            self.df = pd.read_csv(os.path.dirname(os.path.realpath(__file__)) + filename, delimiter=',', encoding="utf-8", skipinitialspace=True)
+            if self.store is not None:
+                self.store.compact(self.df)
+
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        self._df = value
+        # The rate timeline is rebuilt lazily from the new frame
+        self._timeline = None
+        self._publish()
+        self._notify(None, None)
+
+    def _publish(self):
+        self.version += 1
+        self._snapshot = RuleSnapshot(self.version, self._df, self._timeline)
+
+    def snapshot(self):
+        """
+        The latest published version of the rules, safe to read from any thread.
+        """
+        return self._snapshot
 
-        if not existing_rule.empty:
+    def _notify(self, first_date, until_date):
+        for listener in self.listeners:
+            listener(first_date, until_date)
+
+    @property
+    def timeline(self):
+        if self._timeline is None:
+            with METRICS.stage("rule.timeline"):
+                if not self._df["date"].is_monotonic_increasing:
+                    METRICS.count("rows_sorted", len(self._df))
+                    self._df = self._df.sort_values(by=["date", "rule_id"]).reset_index(drop=True)
+                self._timeline = RateTimeline.from_rules(self._df)
+            # Share the timeline with the published snapshot of the same rules
+            if self._snapshot.version == self.version and self._snapshot._timeline is None:
+                self._snapshot._timeline = self._timeline
+        return self._timeline
+
+    def set_rule(self, date, rule, rate):
+        """
+        Add or replace the rule effective from date without printing.
+        Returns True if a new rule was added.
+        """
+        with self._write_lock, METRICS.stage("rule.set_rule"):
+            return self._set_rule(date, rule, rate)
+
+    def _set_rule(self, date, rule, rate):
+        day = to_day_ordinals([int(date)])[0]
+        position = int(np.searchsorted(self.timeline.days, day))
+
+        # Copy on write: the published frame and timeline are never changed in place
+        timeline = self.timeline.copy()
+        added = timeline.set_rate(day, float(rate))
+        METRICS.count("rules_evaluated", len(timeline))
+        METRICS.count("frames_copied")
+
+        # The rows stay in date order, aligned with the timeline
+        if not added:
             # Replace the existing rule
-            self.df.loc[self.df["date"] == int(date), ["rule_id", "rate"]] = [rule, float(rate)]
+            df = self._df.copy()
+            df.iloc[position, [df.columns.get_loc("rule_id"), df.columns.get_loc("rate")]] = [rule, float(rate)]
         else:
             # Create the new row
             new_rule = {
-                "date": date,
+                "date": int(date),
                 "rule_id": rule,
-                "rate": rate,
+                "rate": float(rate),
             }
-            self.df = pd.concat([self.df, pd.DataFrame([new_rule])], ignore_index=True)
+            df = pd.concat([self._df.iloc[:position], pd.DataFrame([new_rule]), self._df.iloc[position:]], ignore_index=True)
+        # Log the rule durably before readers can see it
+        if self.store is not None:
+            self.store.append(pd.DataFrame([{"date": int(date), "rule_id": rule, "rate": float(rate)}]))
+
+        self._df, self._timeline = df, timeline
+        self._publish()
 
+        # The rule's rate applies until the next rule
+        until_day = timeline.effective_until[position]
+        self._notify(int(date), None if position == len(timeline) - 1 else int(from_day_ordinals([until_day])[0]))
+        return added
+
+    def clean_rule(self, date, rule, rate):
+        # Filter transactions for the same account_id and date
+        print(self.df)
+        self.set_rule(date, rule, rate)
 
-        # Sort the DataFrame by date and rule_id for consistency
-        self.df = self.df.sort_values(by=["date", "rule_id"]).reset_index(drop=True)
         rule_df = self.df.copy()
         rule_df.rename({"date": self.config["date_col"], "rule_id": self.config["rule_col"],
                                  "rate": self.config["rate_col"]},
@@ -41,23 +145,28 @@ class Rule:
         print("")
 
 
+    def check_rule(self, date, rule, rate):
+        """
+        Validate one rule's fields. Returns the reason it is rejected, or None.
+        """
+        if not validate_date_format(date):
+            return f"{date} is not a valid YYYYMMdd date."
+        if not validate_rate(rate):
+            return f"{rate} is not a valid rate."
+        return None
+
     def validate_rule_input(self, response):
         response_list = response.split()
 
         if len(response_list) != 3:
             print("Please enter a valid transaction details")
-        else:
-            date = response_list[0]
-            rate = response_list[2]
-
-            if not validate_date_format(date):
-                print(f"{date} is not a valid YYYYMMdd date.")
-                return False
-            if not validate_rate(rate):
-                print(f"{rate} is not a valid rate.")
-                return False
+            return False
 
-            return True
+        error = self.check_rule(*response_list)
+        if error is not None:
+            print(error)
+            return False
+        return True
 
 
     def interest_input(self):
@@ -0,0 +1,100 @@
+import shlex
+import inspect
+from compute_transaction import ComputeTransaction
+from helper import validate_date_format
+
+
+class BankService:
+    """
+    Non-interactive access to the menu actions. Each action takes structured
+    arguments and returns a dict result instead of prompting and printing.
+    """
+
+    def __init__(self, config, account, rule, compute_transaction=None):
+        self.config = config
+        self.account = account
+        self.rule = rule
+        self.compute_transaction = compute_transaction or ComputeTransaction(config)
+        self.commands = {
+            "post": self.post_transaction,
+            "rule": self.define_rule,
+            "statement": self.get_statement,
+            "balance": self.get_balance,
+        }
+
+    def post_transaction(self, date, account_id, type, amount):
+        date, type, amount = str(date), str(type), str(amount)
+        error = self.account.check_transaction(date, account_id, type, amount)
+        if error is not None:
+            return {"ok": False, "error": error}
+
+        try:
+            row = self.account.post_transaction(date, account_id, type, amount)
+        except ValueError as error:
+            # Another process posted to the account between the check and the posting
+            return {"ok": False, "error": str(error)}
+        return {"ok": True, "account_id": account_id, "date": row["date"], "transaction_code": row["transaction_code"],
+                "type": row["type"], "amount": row["amount"], "balance": row["balance"]}
+
+    def define_rule(self, date, rule_id, rate):
+        date, rate = str(date), str(rate)
+        error = self.rule.check_rule(date, rule_id, rate)
+        if error is not None:
+            return {"ok": False, "error": error}
+
+        previous_timeline = self.rule.snapshot().timeline
+        added = self.rule.set_rule(date, rule_id, rate)
+        result = {"ok": True, "date": int(date), "rule_id": rule_id, "rate": float(rate), "added": added}
+
+        # Interest already posted under the previous rates is adjusted
+        adjustments = self.compute_transaction.recalculate_interest(self.account, previous_timeline, self.rule.timeline)
+        if not adjustments.empty:
+            result["adjustments"] = [{"account_id": row.account_id, "date": int(row.date), "amount": float(row.amount)}
+                                     for row in adjustments.itertuples()]
+        return result
+
+    def get_statement(self, account_id, month):
+        month = str(month)
+        error = self.compute_transaction.check_statement(self.account, account_id, month)
+        if error is not None:
+            return {"ok": False, "error": error}
+
+        first_month, last_month = self.compute_transaction.month_range(month)
+        if first_month != last_month:
+            rows = list(self.compute_transaction.range_statement_rows(self.account, self.rule, account_id, first_month, last_month))
+        else:
+            rows = list(self.compute_transaction.statement_rows(self.account, self.rule, account_id, first_month))
+        return {"ok": True, "account_id": account_id, "month": month, "rows": rows}
+
+    def get_balance(self, account_id, date):
+        date = str(date)
+        if account_id not in self.account.ledger_index:
+            return {"ok": False, "error": f"Account {account_id} not found."}
+        if not validate_date_format(date):
+            return {"ok": False, "error": f"{date} is not a valid YYYYMMdd date."}
+
+        return {"ok": True, "account_id": account_id, "date": int(date), "balance": self.account.balance_as_of(account_id, date)}
+
+    def execute(self, command, *args):
+        """
+        Run one action by name: post <Date> <Account> <Type> <Amount>,
+        rule <Date> <RuleId> <Rate>, statement <Account> <YYYYMM>[-<YYYYMM>] or
+        balance <Account> <Date>.
+        """
+        action = self.commands.get(command.lower())
+        if action is None:
+            return {"ok": False, "error": f"Unknown command {command}."}
+        try:
+            inspect.signature(action).bind(*args)
+        except TypeError:
+            return {"ok": False, "error": f"Wrong number of arguments for {command}."}
+        return action(*args)
+
+    def run_batch(self, lines):
+        """
+        Execute one command per line, yielding each result. Blank lines and # comments are skipped.
+        """
+        for line in lines:
+            arguments = shlex.split(line, comments=True)
+            if arguments:
+                yield self.execute(*arguments)
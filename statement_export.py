@@ -0,0 +1,97 @@
+import os
+import csv
+import json
+from compute_transaction import ComputeTransaction
+
+# Statement column titles and the record fields written under them
+STATEMENT_FIELDS = {
+    "Account": "account_id",
+    "Date": "date",
+    "Txn Id": "transaction_code",
+    "Type": "type",
+    "Amount": "amount",
+    "Balance": "balance",
+}
+MONEY_FIELDS = ("amount", "balance")
+
+
+def _format_record(record):
+    # Numbers are only formatted here, as rows are written
+    return {field: f"{value:.2f}" if field in MONEY_FIELDS else value for field, value in record.items()}
+
+
+class _CsvWriter:
+    def __init__(self, file, with_account):
+        self.titles = list(STATEMENT_FIELDS) if with_account else list(STATEMENT_FIELDS)[1:]
+        self.writer = csv.writer(file)
+        self.writer.writerow(self.titles)
+
+    def write(self, record):
+        record = _format_record(record)
+        self.writer.writerow([record[STATEMENT_FIELDS[title]] for title in self.titles])
+
+
+class _JsonLinesWriter:
+    def __init__(self, file, with_account):
+        self.file = file
+
+    def write(self, record):
+        record = dict(record, amount=round(record["amount"], 2), balance=round(record["balance"], 2))
+        self.file.write(json.dumps(record) + "\n")
+
+
+WRITERS = {"csv": _CsvWriter, "jsonl": _JsonLinesWriter}
+
+
+class StatementExport:
+    """
+    Streams statements for many accounts to CSV or JSON Lines files, one
+    account at a time, so memory stays bounded by the largest statement.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.compute_transaction = ComputeTransaction(config)
+
+    def _account_ids(self, account, account_ids):
+        return account_ids if account_ids is not None else sorted(account.ledger_index.positions)
+
+    def records(self, account, rule, month, account_ids=None):
+        """
+        Yield every statement row of the accounts for a YYYYMM month, account by account.
+        """
+        for account_id in self._account_ids(account, account_ids):
+            yield from self.compute_transaction.statement_rows(account, rule, account_id, month)
+
+    def export(self, account, rule, month, output_dir, format="csv", consolidated=False, account_ids=None):
+        """
+        Write the statements to {account}_{month}.{format} files, or to one
+        statements_{month}.{format} file when consolidated. Accounts with an
+        empty statement get no file. Returns the paths written.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        writer_class = WRITERS[format]
+
+        if consolidated:
+            path = os.path.join(output_dir, f"statements_{month}.{format}")
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                writer = writer_class(file, with_account=True)
+                for record in self.records(account, rule, month, account_ids):
+                    writer.write(record)
+            return [path]
+
+        paths = []
+        for account_id in self._account_ids(account, account_ids):
+            records = self.compute_transaction.statement_rows(account, rule, account_id, month)
+            first_record = next(records, None)
+            if first_record is None:
+                continue
+
+            path = os.path.join(output_dir, f"{account_id}_{month}.{format}")
+            with open(path, "w", encoding="utf-8", newline="") as file:
+                writer = writer_class(file, with_account=False)
+                writer.write(first_record)
+                for record in records:
+                    writer.write(record)
+            paths.append(path)
+        return paths
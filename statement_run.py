@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from compute_transaction import ComputeTransaction
+from helper import from_day_ordinals
+from interest import month_bounds
+from ledger_schema import encode_ledger, LEDGER_COLUMNS, TYPE_CODES
+
+# Per-process state set up by _attach_ledger
+_worker = {}
+
+
+def _attach_ledger(blocks, length, account_ids, offsets, rate_timeline, config):
+    for name, block_name in blocks.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker[name] = np.ndarray((length,), dtype=LEDGER_COLUMNS[name], buffer=block.buf)
+        _worker.setdefault("blocks", []).append(block)
+    _worker["account_ids"] = account_ids
+    _worker["offsets"] = offsets
+    _worker["compute_transaction"] = ComputeTransaction(config)
+    _worker["rate_timeline"] = rate_timeline
+
+
+def _account_month_df(account_code, first_day, last_day):
+    """
+    The account's rows within the month and the balance carried into it.
+    """
+    # The account's rows are contiguous and sorted by day, so the month is a binary-searched slice
+    account_start, end = _worker["offsets"][account_code], _worker["offsets"][account_code + 1]
+    days = _worker["day"][account_start:end]
+    start, end = account_start + np.searchsorted(days, first_day), account_start + np.searchsorted(days, last_day, side="right")
+    opening_balance = float(_worker["balance"][start - 1]) if start > account_start else 0.0
+
+    dates = from_day_ordinals(_worker["day"][start:end])
+    running_numbers = _worker["running_number"][start:end]
+    return pd.DataFrame({
+        "account_id": _worker["account_ids"][account_code],
+        "date": dates,
+        "transaction_code": [f"{date}-{number:02}" for date, number in zip(dates, running_numbers)],
+        "type": TYPE_CODES[_worker["type"][start:end]],
+        "amount": _worker["amount"][start:end],
+        "balance": _worker["balance"][start:end],
+    }), opening_balance
+
+
+def _write_statements(account_codes, month, output_dir):
+    first_day, last_day = month_bounds(month)
+    compute_transaction = _worker["compute_transaction"]
+
+    paths = []
+    for account_code in account_codes:
+        account_id = _worker["account_ids"][account_code]
+        month_df, opening_balance = _account_month_df(account_code, first_day, last_day)
+        statement_df = compute_transaction.preprocess(month_df, account_id, month, opening_balance, _worker["rate_timeline"])
+
+        path = os.path.join(output_dir, f"{account_id}_{month}.csv")
+        statement_df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+class StatementRun:
+    """
+    Writes the statements of many accounts for a month across a process pool.
+    The ledger is shared read-only with the workers through shared memory.
+    """
+
+    def __init__(self, config, processes=None):
+        self.config = config
+        self.processes = processes or os.cpu_count()
+
+    def run(self, account, rule, month, output_dir, account_ids=None):
+        if account.df.empty:
+            return []
+
+        columns, all_account_ids, offsets = encode_ledger(account.df)
+        if account_ids is None:
+            account_codes = np.arange(len(all_account_ids))
+        else:
+            account_codes = np.flatnonzero(np.isin(all_account_ids, account_ids))
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        blocks = {}
+        try:
+            for name, values in columns.items():
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+                blocks[name] = block
+
+            # One contiguous chunk of accounts per task, a few tasks per process for load balancing
+            chunks = [chunk for chunk in np.array_split(account_codes, self.processes * 4) if len(chunk)]
+            initargs = ({name: block.name for name, block in blocks.items()}, len(account.df),
+                        all_account_ids, offsets, rule.timeline, self.config)
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_attach_ledger, initargs=initargs) as executor:
+                results = executor.map(_write_statements, chunks, [month] * len(chunks), [output_dir] * len(chunks))
+                return [path for paths in results for path in paths]
+        finally:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
@@ -0,0 +1,175 @@
+import os
+import glob
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from ledger_schema import compact_ledger, concat_ledger, encode_ledger, decode_ledger
+
+class ColumnStore:
+    """
+    A compacted columnar snapshot (one .npy file per column, memory-mapped on
+    load) plus append-only CSV write-ahead logs. Each append is fsynced.
+
+    Compaction rotates the log first, so a crash at any point either keeps
+    the old snapshot with every log or the new snapshot with the newer logs.
+    """
+
+    def __init__(self, directory, wal_columns):
+        self.directory = directory
+        self.wal_columns = wal_columns
+        os.makedirs(directory, exist_ok=True)
+
+        self.generation = max([self._generation(path) for path in self._wal_paths()] + [self._snapshot_meta().get("wal_generation", 0)])
+        self.wal_rows = sum(len(self._read_wal(path)) for path in self._wal_paths())
+
+    def _generation(self, path):
+        return int(os.path.basename(path).split("-")[1].split(".")[0])
+
+    def _wal_paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, "wal-*.csv")), key=self._generation)
+
+    def _wal_path(self, generation):
+        return os.path.join(self.directory, f"wal-{generation}.csv")
+
+    def _read_wal(self, path):
+        return pd.read_csv(path, header=None, names=self.wal_columns, dtype=str, keep_default_na=False)
+
+    def _snapshot_dir(self):
+        current = os.path.join(self.directory, "CURRENT")
+        if not os.path.exists(current):
+            return None
+        with open(current, encoding="utf-8") as file:
+            return os.path.join(self.directory, file.read().strip())
+
+    def _snapshot_meta(self):
+        snapshot_dir = self._snapshot_dir()
+        if snapshot_dir is None:
+            return {}
+        with open(os.path.join(snapshot_dir, "meta.json"), encoding="utf-8") as file:
+            return json.load(file)
+
+    def is_empty(self):
+        return self._snapshot_dir() is None and self.wal_rows == 0
+
+    def append(self, rows_df):
+        """
+        Durably append rows to the current write-ahead log.
+        """
+        if rows_df.empty:
+            return
+        with open(self._wal_path(self.generation), "a", encoding="utf-8", newline="") as file:
+            rows_df[self.wal_columns].to_csv(file, header=False, index=False)
+            file.flush()
+            os.fsync(file.fileno())
+        self.wal_rows += len(rows_df)
+
+    def read_snapshot(self):
+        """
+        Memory-mapped snapshot columns and the snapshot metadata.
+        """
+        snapshot_dir = self._snapshot_dir()
+        if snapshot_dir is None:
+            return None, {}
+        meta = self._snapshot_meta()
+        arrays = {name: np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode="r") for name in meta["columns"]}
+        return arrays, meta
+
+    def read_log(self):
+        """
+        Rows appended since the snapshot, in append order.
+        """
+        start = self._snapshot_meta().get("wal_generation", 0)
+        logs = [self._read_wal(path) for path in self._wal_paths() if self._generation(path) >= start]
+        return pd.concat(logs, ignore_index=True) if logs else pd.DataFrame(columns=self.wal_columns)
+
+    def compact(self, arrays, meta):
+        """
+        Write a new snapshot of arrays covering every log appended so far.
+        """
+        # Rotate the log so later appends are not covered by this snapshot
+        self.generation += 1
+        meta = dict(meta, columns=list(arrays), wal_generation=self.generation)
+
+        name = f"snapshot-{self.generation}"
+        snapshot_dir = os.path.join(self.directory, name)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        for column, values in arrays.items():
+            np.save(os.path.join(snapshot_dir, f"{column}.npy"), values)
+        with open(os.path.join(snapshot_dir, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+
+        # Atomically switch to the new snapshot, then drop what it replaces
+        previous_dir = self._snapshot_dir()
+        current_tmp = os.path.join(self.directory, "CURRENT.tmp")
+        with open(current_tmp, "w", encoding="utf-8") as file:
+            file.write(name)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(current_tmp, os.path.join(self.directory, "CURRENT"))
+
+        if previous_dir is not None and previous_dir != snapshot_dir:
+            shutil.rmtree(previous_dir, ignore_errors=True)
+        for path in self._wal_paths():
+            if self._generation(path) < self.generation:
+                os.remove(path)
+        self.wal_rows = 0
+
+
+class LedgerStore(ColumnStore):
+    """
+    Persistent ledger: postings are logged as they happen and compacted into
+    a snapshot sorted by account. Account loads the whole ledger at startup.
+    """
+
+    def __init__(self, directory):
+        super().__init__(directory, ["account_id", "date", "transaction_code", "type", "amount", "balance"])
+
+    def load(self):
+        """
+        The ledger frame and the accounts with postings logged since the
+        snapshot, whose balances are rebuilt by the caller.
+        """
+        arrays, meta = self.read_snapshot()
+        if arrays is None:
+            ledger_df = compact_ledger(pd.DataFrame(columns=self.wal_columns))
+        else:
+            ledger_df = compact_ledger(decode_ledger(arrays, meta["account_ids"]))
+
+        log_df = self.read_log()
+        if not log_df.empty:
+            ledger_df = concat_ledger([ledger_df, log_df])
+        return ledger_df, log_df["account_id"].unique()
+
+    def compact(self, ledger_df):
+        columns, account_ids, _ = encode_ledger(ledger_df)
+        super().compact(columns, {"account_ids": account_ids})
+
+
+class RuleStore(ColumnStore):
+    """
+    Persistent interest rules; a logged rule replaces any earlier rule of the same date.
+    """
+
+    def __init__(self, directory):
+        super().__init__(directory, ["date", "rule_id", "rate"])
+
+    def load(self):
+        arrays, _ = self.read_snapshot()
+        if arrays is None:
+            rules_df = pd.DataFrame(columns=self.wal_columns)
+        else:
+            rules_df = pd.DataFrame({name: np.asarray(values) for name, values in arrays.items()})
+
+        log_df = self.read_log()
+        if not log_df.empty:
+            rules_df = pd.concat([rules_df, log_df], ignore_index=True) if not rules_df.empty else log_df
+        rules_df = rules_df.astype({"date": np.int64, "rule_id": object, "rate": float})
+        return rules_df.drop_duplicates(subset="date", keep="last").sort_values(by=["date", "rule_id"]).reset_index(drop=True)
+
+    def compact(self, rules_df):
+        super().compact({
+            "date": rules_df["date"].to_numpy(dtype=np.int64),
+            "rule_id": rules_df["rule_id"].to_numpy(dtype=str),
+            "rate": rules_df["rate"].to_numpy(dtype=float),
+        }, {})
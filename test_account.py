@@ -50,6 +50,17 @@ def test_compute_balance(test_account):
     assert test_account.df.loc[1, "balance"] == 50.0  # 100 - 50
 
 
+# Test compute_balance - published snapshots
+def test_compute_balance_leaves_the_published_index_unchanged(test_account):
+    """Test that a rebalance does not change the index a published snapshot shares."""
+    test_account.df = test_account.df.assign(balance=0.0)
+    snapshot = test_account.snapshot()
+    test_account.compute_balance("AC001")
+    assert snapshot.ledger_index.latest_balance("AC001") == 0.0
+    assert snapshot.df["balance"].tolist() == [0.0, 0.0, 0.0]
+    assert test_account.snapshot().ledger_index.latest_balance("AC001") == 50.0
+
+
 # Test clean_transaction
 def test_clean_transaction(test_account):
     """Test that a transaction is added successfully and balance is updated."""
@@ -63,6 +74,86 @@ def test_clean_transaction(test_account):
     assert latest_transaction["balance"] == 250.0  # Previous balance (50) + 200
 
 
+
+# Test clean_transaction with a backdated transaction
+def test_clean_transaction_backdated(test_account):
+    """Test that a backdated transaction only shifts the later balances of its account."""
+    test_account.clean_transaction(20230101, "AC001", "D", 30.0)  # Deposit before the withdrawal
+
+    account_df = test_account.df[test_account.df["account_id"] == "AC001"].sort_values(by="transaction_code")
+    assert account_df["transaction_code"].tolist() == ["20230101-01", "20230101-02", "20230102-01"]
+    assert account_df["balance"].tolist() == [100.0, 130.0, 80.0]
+    assert test_account.df.loc[2, "balance"] == 200.0  # AC002 untouched
+
+
+# Test rebuild_balances
+def test_rebuild_balances(test_account):
+    """Test that a full rebuild recomputes every account's running balance."""
+    test_account.df["balance"] = 0.0
+    test_account.rebuild_balances()
+    assert test_account.df["balance"].tolist() == [100.0, 50.0, 200.0]
+
+
+# Test post_interest
+def test_post_interest(test_account):
+    """Test that interest rows are posted in bulk and carried into later balances."""
+    test_account.post_interest(20230101, pd.Series({"AC001": 1.5, "AC002": 0.0}))
+
+    interest_row = test_account.df.iloc[-1]
+    assert interest_row["account_id"] == "AC001"
+    assert interest_row["transaction_code"] == "20230101-02"
+    assert interest_row["type"] == "I"
+    assert interest_row["balance"] == 101.5
+    assert test_account.df.loc[1, "balance"] == 51.5  # Later withdrawal includes the interest
+    assert len(test_account.df[test_account.df["account_id"] == "AC002"]) == 1
+
+
+# Test import_transactions
+def test_import_transactions(test_account, tmp_path):
+    """Test bulk import assigns running numbers, rejects invalid lines and overdrafts, and rebalances."""
+    path = tmp_path / "transactions.txt"
+    path.write_text("20230102 AC001 D 25\n"
+                    "20230103 AC001 W 100\n"
+                    "\n"
+                    "20230103 AC001 w 75\n"
+                    "20230103 AC004 D 1.234\n"
+                    "20230101 AC002 D 10\n")
+
+    rejected = test_account.import_transactions(str(path), chunksize=2)
+    assert rejected.index.tolist() == [2, 5]
+    assert rejected["reason"].tolist() == ["You cannot withdraw more than your current balance.", "1.234 is not a valid amount."]
+
+    account_df = test_account.df[test_account.df["account_id"] == "AC001"].sort_values(by="transaction_code")
+    assert account_df["transaction_code"].tolist() == ["20230101-01", "20230102-01", "20230102-02", "20230103-01"]
+    assert account_df["balance"].tolist() == [100.0, 50.0, 75.0, 0.0]
+    assert test_account.ledger_index.latest_balance("AC002") == 210.0
+
+
+# Test post_transactions - overdrafts in date order
+def test_post_transactions_checks_overdrafts_in_date_order(test_account):
+    """Test that batch withdrawals are checked against the balance on their date, not in file order."""
+    posted = test_account.post_transactions(pd.Series(["20230105 AC003 D 100", "20230101 AC003 W 50",
+                                                       "20221231 AC001 W 10", "20230106 AC003 W 60", "20230104 AC003 D 10"]))
+    assert posted["reason"].tolist() == ["", "You cannot withdraw more than your current balance.",
+                                         "You cannot withdraw more than your current balance.", "", ""]
+    account_df = test_account.df[test_account.df["account_id"] == "AC003"].sort_values(by="transaction_code")
+    assert account_df["balance"].tolist() == [10.0, 110.0, 50.0]
+
+
+# Test import_transactions - chunks of blank lines
+def test_import_transactions_skips_blank_chunks(test_account, tmp_path):
+    """Test that a chunk of only blank lines is skipped and the other chunks are still imported."""
+    path = tmp_path / "transactions.txt"
+    path.write_text("20230103 AC001 D 25\n"
+                    "\n"
+                    "  \n"
+                    "20230104 AC001 W 5\n")
+
+    assert test_account.import_transactions(str(path), chunksize=1).empty
+    assert test_account.ledger_index.latest_balance("AC001") == 70.0
+    assert test_account.post_transactions(pd.Series([], dtype=object)).empty
+    assert test_account.post_transactions(pd.Series([" "]))["reason"].tolist() == ["Please enter a valid transaction details"]
+
 # Test validate_transactions_input - valid case
 @patch("account.validate_date_format", return_value=True)  # Patch where the function is used
 @patch("account.validate_amount", return_value=True)
@@ -109,5 +200,59 @@ def test_compute_balance_empty(test_account):
     assert test_account.df.empty
 
 
+# Test month-end balance snapshots
+def test_clean_transaction_updates_month_ends(test_account):
+    """Test that a backdated posting shifts the month-end balances from its month onwards."""
+    test_account.clean_transaction(20230201, "AC001", "D", 25.0)
+    test_account.clean_transaction(20221215, "AC001", "D", 10.0)
+    assert test_account.ledger_index.month_ends["AC001"] == ([202212, 202301, 202302], [10.0, 60.0, 85.0])
+    assert test_account.ledger_index.opening_balance("AC001", "202305") == 85.0
+
+
+# Test fixed-point balances
+def test_balances_do_not_drift(test_account, tmp_path):
+    """Test that running balances are summed in integer cents."""
+    path = tmp_path / "transactions.txt"
+    path.write_text("".join(f"202302{day:02} AC003 D 0.10\n" for day in range(1, 29)) * 10)
+    test_account.import_transactions(str(path))
+    assert test_account.ledger_index.latest_balance("AC003") == 28.0
+    assert test_account.df[test_account.df["account_id"] == "AC003"]["balance"].max() == 28.0
+
+
+# Test validate_transactions_input - withdrawal from a new account
+def test_validate_transactions_input_new_account_withdrawal(test_account):
+    """Test that a withdrawal is rejected for an account without a balance."""
+    assert test_account.validate_transactions_input("20230101 AC009 W 10") is False
+    assert test_account.check_transaction("20230101", "AC009", "D", "10") is None
+
+
+# Test check_transaction - backdated withdrawal
+def test_check_transaction_backdated_withdrawal(test_account):
+    """Test that a backdated withdrawal may not push a later balance below zero."""
+    # AC001 holds 100.00 on 20230101, 50.00 on 20230102 and 150.00 from 20230103
+    test_account.post_transaction("20230103", "AC001", "D", "100")
+    assert test_account.check_transaction("20230101", "AC001", "W", "60") == \
+        "You cannot withdraw 60 on 20230101 as it would overdraw a later balance."
+    assert test_account.check_transaction("20230101", "AC001", "W", "50") is None
+    test_account.post_transaction("20230101", "AC001", "W", "50")
+    assert test_account.ledger_index.lowest_balance_from("AC001", "20230101") == 0
+
+
+# Test import_transactions - backdated withdrawal
+def test_import_rejects_backdated_overdraft(test_account, tmp_path):
+    """Test that bulk import rejects a withdrawal that would push a later balance below zero."""
+    # AC001 holds 100.00 on 20230101 and 50.00 from 20230102
+    path = tmp_path / "transactions.txt"
+    path.write_text("20230101 AC001 W 60\n"
+                    "20230101 AC001 W 40\n"
+                    "20230103 AC001 W 10\n")
+
+    rejected = test_account.import_transactions(str(path))
+    assert rejected["reason"].tolist() == ["You cannot withdraw 60 on 20230101 as it would overdraw a later balance."]
+    assert rejected.index.tolist() == [1]
+    account_df = test_account.df[test_account.df["account_id"] == "AC001"].sort_values(by="transaction_code")
+    assert account_df["balance"].tolist() == [100.0, 60.0, 10.0, 0.0]
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,51 @@
+import pytest
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import synthetic_ledger, run_benchmarks, save_baseline, compare_baseline, BENCHMARKS
+
+
+@pytest.fixture
+def mock_config():
+    return {
+        "date_col": "date",
+        "tansaction_col": "transaction_code",
+        "type_col": "type",
+        "amount_col": "amount",
+        "rule_col": "rule_id",
+        "rate_col": "rate",
+        "account_title": "Account",
+        "interest_rule_title": "Interest rules",
+    }
+
+
+def test_synthetic_ledger():
+    """Test that the generated ledger has consistent codes and never overdraws."""
+    ledger_df, rules_df = synthetic_ledger(accounts=20, transactions_per_account=50, rules_per_year=6)
+    assert len(ledger_df) == 1000
+    assert not ledger_df.duplicated(subset=["account_id", "transaction_code"]).any()
+    assert (ledger_df["balance"] >= 0).all()
+    assert len(rules_df) == 6
+    assert rules_df["date"].is_monotonic_increasing
+
+
+def test_run_benchmarks(mock_config):
+    """Test that every benchmark reports throughput and peak memory."""
+    results = run_benchmarks(mock_config, [200], transactions_per_account=20, repeat=2)
+    assert [result["benchmark"] for result in results] == list(BENCHMARKS)
+    assert all(result["rows"] == 200 and result["throughput"] > 0 and result["peak_mb"] > 0 for result in results)
+
+
+def test_compare_baseline(tmp_path):
+    """Test that only throughput drops beyond the tolerance are reported."""
+    baseline = [{"benchmark": "post", "rows": 1000, "throughput": 100.0},
+                {"benchmark": "statement", "rows": 1000, "throughput": 100.0}]
+    save_baseline(baseline, tmp_path / "baseline.json")
+
+    results = [{"benchmark": "post", "rows": 1000, "throughput": 80.0},
+               {"benchmark": "statement", "rows": 1000, "throughput": 60.0},
+               {"benchmark": "ingest", "rows": 1000, "throughput": 1.0}]
+    regressions = compare_baseline(results, tmp_path / "baseline.json", tolerance=0.25)
+    assert [(regression["benchmark"], regression["baseline_throughput"]) for regression in regressions] == [("statement", 100.0)]
@@ -0,0 +1,223 @@
+import pytest
+import pandas as pd
+import sys
+import os
+import threading
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from rule import Rule
+from compute_transaction import ComputeTransaction
+
+
+@pytest.fixture
+def mock_config():
+    return {
+        "date_col": "date",
+        "tansaction_col": "transaction_code",
+        "type_col": "type",
+        "amount_col": "amount",
+        "rule_col": "rule_id",
+        "rate_col": "rate",
+        "account_title": "Account",
+        "interest_rule_title": "Interest rules",
+    }
+
+
+@pytest.fixture
+def account(mock_config):
+    account = Account(mock_config, test_enabled=True)
+    account.df = pd.DataFrame(
+        {
+            "account_id": ["AC003", "AC003", "AC002", "AC003", "AC003"],
+            "date": [20230505, 20230601, 20230601, 20230626, 20230626],
+            "transaction_code": ["20230505-01", "20230601-01", "20230601-01", "20230626-01", "20230626-02"],
+            "type": ["D", "D", "D", "W", "W"],
+            "amount": [100.0, 150.0, 2000.0, 20.0, 100.0],
+            "balance": [100.0, 250.0, 2000.0, 230.0, 130.0],
+        }
+    )
+    return account
+
+
+@pytest.fixture
+def rule(mock_config):
+    # rule.txt holds RULE01 1.95 from 20230101, RULE02 1.90 from 20230520 and RULE03 2.20 from 20230615
+    return Rule(mock_config)
+
+
+def test_statement(mock_config, account, rule):
+    """Test the month's transactions followed by the interest row."""
+    statement_df = ComputeTransaction(mock_config).statement(account, rule, "AC003", "202306")
+    assert statement_df["Txn Id"].tolist() == ["20230601-01", "20230626-01", "20230626-02", ""]
+    assert statement_df.iloc[-1].tolist() == ["20230630", "", "I", "0.39", "130.39"]
+
+
+def test_statement_cache_hits(mock_config, account, rule):
+    """Test that a repeated statement is served from the cache."""
+    compute_transaction = ComputeTransaction(mock_config)
+    first = compute_transaction.statement(account, rule, "AC003", "202306")
+    assert compute_transaction.statement(account, rule, "AC003", "202306") is first
+    assert compute_transaction.statement_cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_statement_cache_invalidated_by_posting(mock_config, account, rule):
+    """Test that a posting only invalidates the account's statements from its month onwards."""
+    compute_transaction = ComputeTransaction(mock_config)
+    for account_id, month in [("AC003", "202305"), ("AC003", "202306"), ("AC002", "202306")]:
+        compute_transaction.statement(account, rule, account_id, month)
+
+    account.clean_transaction("20230610", "AC003", "D", "10")
+    assert set(compute_transaction.statement_cache.statements) == {("AC003", "202305"), ("AC002", "202306")}
+    assert compute_transaction.statement(account, rule, "AC003", "202306").iloc[-1]["Balance"] != "130.39"
+
+
+def test_statement_cache_invalidated_by_rule(mock_config, account, rule):
+    """Test that a rule change only invalidates the months it covers."""
+    compute_transaction = ComputeTransaction(mock_config)
+    for month in ["202305", "202306"]:
+        compute_transaction.statement(account, rule, "AC003", month)
+
+    rule.clean_rule("20230501", "RULE04", "3.00")  # Applies until RULE02 on 20230520
+    assert set(compute_transaction.statement_cache.statements) == {("AC003", "202306")}
+
+
+def test_statement_cache_skips_statements_of_a_replaced_snapshot(mock_config, account, rule):
+    """Test that a statement computed while a posting is published is returned but not cached."""
+    class PostingDuringStatement(ComputeTransaction):
+        def preprocess(self, *args):
+            statement_df = super().preprocess(*args)
+            account.post_transaction("20230610", "AC003", "D", "10")
+            return statement_df
+
+    compute_transaction = PostingDuringStatement(mock_config)
+    assert compute_transaction.statement(account, rule, "AC003", "202306").iloc[-1]["Balance"] == "130.39"
+    assert compute_transaction.statement_cache.stats()["size"] == 0
+
+    compute_transaction.preprocess = ComputeTransaction(mock_config).preprocess
+    assert compute_transaction.statement(account, rule, "AC003", "202306").iloc[-1]["Balance"] != "130.39"
+    assert compute_transaction.statement_cache.stats()["size"] == 1
+
+
+def test_statement_cache_lru_eviction():
+    """Test that the least recently used statement is evicted first."""
+    compute_transaction = ComputeTransaction({"statement_cache_size": 2})
+    cache = compute_transaction.statement_cache
+    cache.put("AC001", "202301", "first")
+    cache.put("AC001", "202302", "second")
+    cache.get("AC001", "202301")
+    cache.put("AC001", "202303", "third")
+    assert list(cache.statements) == [("AC001", "202301"), ("AC001", "202303")]
+
+
+def test_statement_without_transactions(mock_config, account, rule):
+    """Test that a month without transactions earns interest on the carried balance."""
+    statement_df = ComputeTransaction(mock_config).statement(account, rule, "AC003", "202307")
+    assert statement_df.values.tolist() == [["20230731", "", "I", "0.24", "130.24"]]
+
+
+def test_post_month_end_interest_carries_balances(mock_config, account, rule):
+    """Test that month-end posting includes accounts without transactions in the month."""
+    interest = ComputeTransaction(mock_config).post_month_end_interest(account, rule, "202307")
+    assert interest.to_dict() == {"AC002": 3.74, "AC003": 0.24}
+    assert account.ledger_index.latest_balance("AC003") == pytest.approx(130.24)
+
+
+def test_recalculated_interest_matches_posting_afresh(mock_config, rule):
+    """Test that adjustments compound into later months as if every month were posted under the new rules."""
+    # AC004's interest rounds to nothing under the old rates, so none is posted for it
+    ledger_df = pd.DataFrame({"account_id": ["AC001", "AC004", "AC001"], "date": [20230503, 20230503, 20230620],
+                              "transaction_code": ["20230503-01", "20230503-01", "20230620-01"], "type": ["D", "D", "W"],
+                              "amount": [2000000.0, 3.0, 500000.0], "balance": [2000000.0, 3.0, 1500000.0]})
+    account, fresh = Account(mock_config, test_enabled=True), Account(mock_config, test_enabled=True)
+    account.df = fresh.df = ledger_df
+    fresh_rule = Rule(mock_config)
+    compute_transaction = ComputeTransaction(mock_config)
+    months = ["202305", "202306", "202307", "202308"]
+
+    for month in months:
+        compute_transaction.post_month_end_interest(account, rule, month)
+    for date, rate in [("20230510", "9.50"), ("20230701", "0.40")]:
+        previous_timeline = rule.timeline
+        rule.set_rule(date, f"RULE{date}", rate)
+        compute_transaction.recalculate_interest(account, previous_timeline, rule.timeline)
+
+        fresh_rule.set_rule(date, f"RULE{date}", rate)
+    for month in months:
+        compute_transaction.post_month_end_interest(fresh, fresh_rule, month)
+
+    def interest(ledger):
+        # Adjustments that cancel out leave a month with no net interest
+        totals = ledger.df[ledger.df["type"] == "I"].groupby(["account_id", "date"], observed=True)["amount"].sum().round(2)
+        return totals[totals != 0].to_dict()
+    assert interest(account) == interest(fresh)
+    assert account.ledger_index.balances == pytest.approx(fresh.ledger_index.balances)
+
+
+def test_snapshots_are_unchanged_by_writes(account, rule):
+    """Test that published snapshots keep their data while new versions are written."""
+    ledger, rules = account.snapshot(), rule.snapshot()
+    account.post_transaction("20230627", "AC003", "D", "10")
+    rule.set_rule("20230620", "RULE04", "3.00")
+    assert len(ledger.df) == 5 and len(account.snapshot().df) == 6
+    assert ledger.ledger_index.latest_balance("AC003") == 130.0
+    assert len(rules.timeline) == 3 and len(rule.snapshot().timeline) == 4
+    assert account.snapshot().version == ledger.version + 1
+    assert rule.snapshot().version == rules.version + 1
+
+
+def test_statements_during_concurrent_postings(mock_config, account, rule):
+    """Test that statements read from snapshots stay consistent while a writer posts."""
+    errors = []
+
+    def write():
+        for day in range(1, 29):
+            account.post_transaction(f"202307{day:02}", "AC003", "D", "1")
+
+    def read():
+        compute_transaction = ComputeTransaction(mock_config)
+        for _ in range(20):
+            ledger = account.snapshot()
+            rows = list(compute_transaction.statement_rows(ledger, rule.snapshot(), "AC003", "202307"))
+            deposits = len(rows) - 1
+            if rows and rows[-2 if deposits else -1]["balance"] != pytest.approx(130.0 + deposits, abs=0.5):
+                errors.append(rows)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert account.ledger_index.latest_balance("AC003") == 158.0
+
+
+def test_range_statement(mock_config, account, rule):
+    """Test that a range statement credits each month's interest and carries it forward."""
+    compute_transaction = ComputeTransaction(mock_config)
+    statement_df = compute_transaction.statement(account, rule, "AC003", "202305-202307")
+    assert statement_df["Type"].tolist() == ["D", "I", "D", "W", "W", "I", "I"]
+    assert statement_df["Balance"].tolist() == ["100.00", "100.14", "250.14", "230.14", "130.14", "130.53", "130.77"]
+
+    # The same as posting each month's interest, then printing the range
+    for month in ["202305", "202306", "202307"]:
+        compute_transaction.post_month_end_interest(account, rule, month)
+    assert compute_transaction.range_statement(account, rule, "AC003", "202305", "202307").equals(statement_df)
+
+
+def test_check_statement_range(mock_config, account):
+    """Test validation of a YYYYMM-YYYYMM range."""
+    compute_transaction = ComputeTransaction(mock_config)
+    assert compute_transaction.check_statement(account, "AC003", "202301-202312") is None
+    assert compute_transaction.check_statement(account, "AC003", "202312-202301") == "202312-202301 is not a valid YYYYMM-YYYYMM range."
+    assert compute_transaction.check_statement(account, "AC003", "202301-2023") == "202301-2023 is not a valid YYYYMM date."
+    assert compute_transaction.check_statement(account, "AC003", "202301-") == "202301- is not a valid YYYYMM date."
+
+
+def test_one_month_range_statement(mock_config, account, rule):
+    """Test that a range of one month is that month's statement."""
+    compute_transaction = ComputeTransaction(mock_config)
+    assert compute_transaction.check_statement(account, "AC003", "202306-202306") is None
+    assert compute_transaction.statement(account, rule, "AC003", "202306-202306").equals(
+        compute_transaction.statement(account, rule, "AC003", "202306"))
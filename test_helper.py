@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from helper import validate_dates, validate_months, validate_amounts, validate_rates, validate_date_format, validate_amount, validate_rate
+
+
+def test_validate_dates():
+    """Test that only real calendar dates of 8 digits are accepted."""
+    valid, reasons = validate_dates(pd.Series(["20240229", "20230229", "20231131", "2023011", "abcdefgh", ""]))
+    assert valid.tolist() == [True, False, False, False, False, False]
+    assert reasons[0] == "" and reasons[1] == "20230229 is not a valid YYYYMMdd date."
+
+
+def test_validate_months():
+    """Test YYYYMM validation of a batch."""
+    valid, reasons = validate_months(np.array(["202301", "202313", "20230"]))
+    assert valid.tolist() == [True, False, False]
+    assert reasons[1] == "202313 is not a valid YYYYMM date."
+
+
+def test_validate_amounts():
+    """Test that amounts must be positive with up to 2 decimal places."""
+    valid, reasons = validate_amounts(["10", "10.5", "007.10", "10.555", "0.00", ".5", "1e3", "-1", "1."])
+    assert valid.tolist() == [True, True, True, False, False, False, False, False, False]
+    assert reasons[3] == "10.555 is not a valid amount."
+
+
+def test_validate_rates():
+    """Test that rates must lie strictly between 0 and 100."""
+    valid, _ = validate_rates(["0.01", "99.99", "099.9", "100", "0"])
+    assert valid.tolist() == [True, True, True, False, False]
+
+
+def test_batch_validators_accept_empty_batches():
+    """Test that every batch validator returns empty masks and reasons for no values."""
+    for validate in [validate_dates, validate_months, validate_amounts, validate_rates]:
+        valid, reasons = validate([])
+        assert valid.dtype == bool and len(valid) == 0 and len(reasons) == 0
+
+
+def test_scalar_validators_wrap_batches():
+    """Test that the scalar validators agree with the batch validators."""
+    assert validate_date_format("20230101") is True
+    assert validate_date_format("20230132") is False
+    assert validate_amount("1.25") is True
+    assert validate_rate("100.00") is False
@@ -0,0 +1,168 @@
+import pytest
+import json
+import asyncio
+import threading
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from rule import Rule
+from http_service import HttpService
+from compute_transaction import ComputeTransaction
+
+
+@pytest.fixture
+def mock_config():
+    return {}
+
+
+@pytest.fixture
+def account(mock_config):
+    account = Account(mock_config, test_enabled=True)
+    account.df = pd.DataFrame(
+        {
+            "account_id": ["AC003", "AC003", "AC003", "AC003"],
+            "date": [20230505, 20230601, 20230626, 20230626],
+            "transaction_code": ["20230505-01", "20230601-01", "20230626-01", "20230626-02"],
+            "type": ["D", "D", "W", "W"],
+            "amount": [100.0, 150.0, 20.0, 100.0],
+            "balance": [100.0, 250.0, 230.0, 130.0],
+        }
+    )
+    return account
+
+
+async def request(address, method, path, body=None):
+    reader, writer = await asyncio.open_connection(*address)
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                 f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def run_service(config, account, test, **options):
+    async def main():
+        service = HttpService(config, account, Rule(config), **options)
+        address = await service.start()
+        try:
+            return await test(service, address)
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+def test_concurrent_postings_are_batched(mock_config, account):
+    """Test that concurrent postings are applied as one micro-batch in arrival order."""
+    async def test(service, address):
+        return await asyncio.gather(*[service.post_transaction("20230701", "AC003", "D", "10") for _ in range(20)]), service
+
+    results, service = run_service(mock_config, account, test, batch_window=0.05)
+    assert all(result["ok"] for result in results)
+    assert [result["transaction_code"] for result in results] == [f"20230701-{number:02}" for number in range(1, 21)]
+    assert results[-1]["balance"] == 330.0
+    assert list(service.batch_sizes) == [20]
+
+
+def test_reads_are_served_while_a_batch_is_applied(mock_config, account):
+    """Test that batches are applied off the event loop, so statements are answered meanwhile."""
+    applying, release = threading.Event(), threading.Event()
+
+    async def test(service, address):
+        apply = service._apply
+
+        def slow_apply(batch):
+            applying.set()
+            release.wait(5)
+            return apply(batch)
+
+        service._apply = slow_apply
+        posting = asyncio.ensure_future(service.post_transaction("20230701", "AC003", "D", "10"))
+        await asyncio.get_running_loop().run_in_executor(None, applying.wait, 5)
+        statement = await service.get_statement("AC003", "202306")
+        posted_before_release = posting.done()
+        release.set()
+        return statement, posted_before_release, await posting
+
+    statement, posted_before_release, posted = run_service(mock_config, account, test, batch_window=0)
+    assert statement["ok"] and not posted_before_release
+    assert posted["balance"] == 140.0
+
+
+def test_http_routes(mock_config, account):
+    """Test posting, rejection, statements and metrics over HTTP."""
+    async def test(service, address):
+        posted = await request(address, "POST", "/transactions", {"date": "20230701", "account": "AC003", "type": "W", "amount": "30"})
+        rejected = await request(address, "POST", "/transactions", {"date": "20230701", "account": "AC003", "type": "W", "amount": "500"})
+        rule = await request(address, "POST", "/rules", {"date": "20230801", "rule_id": "RULE04", "rate": "3.00"})
+        statement = await request(address, "GET", "/statements/AC003/202306")
+        missing = await request(address, "GET", "/unknown")
+        metrics = await request(address, "GET", "/metrics")
+        return posted, rejected, rule, statement, missing, metrics
+
+    posted, rejected, rule, statement, missing, metrics = run_service(mock_config, account, test, batch_window=0)
+    assert posted == (200, {"ok": True, "account_id": "AC003", "date": 20230701, "transaction_code": "20230701-01",
+                            "type": "W", "amount": 30.0, "balance": 100.0})
+    assert rejected == (400, {"ok": False, "error": "You cannot withdraw more than your current balance."})
+    assert rule[0] == 200 and rule[1]["added"] is True
+    assert statement[0] == 200 and statement[1]["rows"][-1]["balance"] == 130.39
+    assert missing[0] == 404
+    assert metrics[1]["POST /transactions"]["count"] == 2
+    assert metrics[1]["GET /statements"]["p99_ms"] >= metrics[1]["GET /statements"]["p50_ms"] > 0
+
+
+def test_malformed_requests_get_400(mock_config, account):
+    """Test that a request line without spaces and a body that is not a JSON object are answered with 400."""
+    async def test(service, address):
+        reader, writer = await asyncio.open_connection(*address)
+        writer.write(b"GARBAGE\r\nConnection: close\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        responses = [int(response.split()[1])]
+        for body in [[1, 2], "x"]:
+            responses.append(await request(address, "POST", "/transactions", body))
+        return responses
+
+    garbage, listed, string = run_service(mock_config, account, test, batch_window=0)
+    assert garbage == 400
+    assert listed == string == (400, {"ok": False, "error": "Invalid request: the body must be a JSON object"})
+
+
+def test_backdated_overdraft_is_rejected(mock_config, account):
+    """Test that a posting may not push a later balance below zero."""
+    async def test(service, address):
+        return await request(address, "POST", "/transactions", {"date": "20230601", "account": "AC003", "type": "W", "amount": "200"})
+
+    status, result = run_service(mock_config, account, test, batch_window=0)
+    assert (status, result["error"]) == (400, "You cannot withdraw 200 on 20230601 as it would overdraw a later balance.")
+    assert account.ledger_index.latest_balance("AC003") == 130.0
+
+
+def test_statements_read_a_consistent_snapshot(mock_config, account):
+    """Test that a statement only sees batches fully applied before it started."""
+    async def test(service, address):
+        before = await service.get_statement("AC003", "202307")
+        await service.post_transaction("20230702", "AC003", "D", "70")
+        after = await service.get_statement("AC003", "202307")
+        return before, after
+
+    before, after = run_service(mock_config, account, test, batch_window=0)
+    assert [row["type"] for row in before["rows"]] == ["I"]
+    assert [row["balance"] for row in after["rows"]] == [200.0, 200.37]
+
+
+def test_range_statement_route(mock_config, account):
+    """Test that GET /statements serves a YYYYMM-YYYYMM range like the service layer."""
+    async def test(service, address):
+        return await request(address, "GET", "/statements/AC003/202306-202308")
+
+    status, statement = run_service(mock_config, account, test, batch_window=0)
+    expected = list(ComputeTransaction(mock_config).range_statement_rows(account, Rule(mock_config), "AC003", "202306", "202308"))
+    assert status == 200 and statement["month"] == "202306-202308"
+    assert statement["rows"] == expected
+    assert [row["date"] for row in statement["rows"] if row["type"] == "I"] == [20230630, 20230731, 20230831]
@@ -0,0 +1,162 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from helper import to_day_ordinals
+from interest import month_bounds, daily_balances, monthly_interest, account_monthly_interest, batch_monthly_interest, interest_adjustments, simulate_interest
+from rate_timeline import RateTimeline
+
+
+@pytest.fixture
+def timeline():
+    rules_df = pd.DataFrame(
+        {
+            "date": [20230101, 20230520, 20230615],
+            "rule_id": ["RULE01", "RULE02", "RULE03"],
+            "rate": [1.95, 1.90, 2.20],
+        }
+    )
+    return RateTimeline.from_rules(rules_df)
+
+
+def test_month_bounds():
+    """Test first and last day of a month, including leap years."""
+    first_day, last_day = month_bounds("202402")
+    assert last_day - first_day == 28
+    assert first_day == to_day_ordinals([20240201])[0]
+
+
+def test_daily_balances():
+    """Test that transaction days become piecewise-constant balance segments."""
+    days = to_day_ordinals([20230601, 20230603, 20230603])
+    balances = daily_balances(days, [100.0, 50.0, 40.0], days[0], days[0] + 4)
+    assert balances.tolist() == [100.0, 140.0, 40.0, 40.0, 0.0]
+
+
+def test_account_monthly_interest(timeline):
+    """Test the June 2023 interest of the sample statement."""
+    transactions_df = pd.DataFrame(
+        {
+            "date": [20230601, 20230626, 20230626],
+            "balance": [250.0, 230.0, 130.0],
+        }
+    )
+    assert account_monthly_interest(transactions_df, timeline, "202306") == 0.39
+
+
+def test_monthly_interest_without_transactions(timeline):
+    """Test that a month without transactions earns nothing."""
+    assert monthly_interest(np.array([], dtype=np.int64), np.array([]), timeline, month_bounds("202306")[1]) == 0.0
+
+
+def test_batch_monthly_interest_matches_single_account(timeline):
+    """Test that the batch pass gives each account the same interest as a single statement."""
+    ledger_df = pd.DataFrame(
+        {
+            "account_id": ["AC003", "AC003", "AC002", "AC003", "AC003", "AC001"],
+            "date": [20230505, 20230601, 20230601, 20230626, 20230626, 20230701],
+            "transaction_code": ["20230505-01", "20230601-01", "20230601-01", "20230626-01", "20230626-02", "20230701-01"],
+            "type": ["D", "D", "D", "W", "W", "D"],
+            "amount": [100.0, 150.0, 2000.0, 20.0, 100.0, 10.0],
+            "balance": [100.0, 250.0, 2000.0, 230.0, 130.0, 10.0],
+        }
+    )
+    interest = batch_monthly_interest(ledger_df, timeline, "202306")
+    assert interest.to_dict() == {"AC002": 3.37, "AC003": 0.39}
+
+    # Accounts with interest already posted for the month are skipped
+    posted_df = pd.concat([ledger_df, pd.DataFrame([{"account_id": "AC003", "date": 20230630, "transaction_code": "20230630-01",
+                                                     "type": "I", "amount": 0.39, "balance": 130.39}])], ignore_index=True)
+    assert batch_monthly_interest(posted_df, timeline, "202306").to_dict() == {"AC002": 3.37}
+
+
+def test_monthly_interest_on_opening_balance(timeline):
+    """Test that the opening balance earns interest in a month without transactions."""
+    _, month_end_day = month_bounds("202307")
+    assert monthly_interest(np.array([], dtype=np.int64), np.array([]), timeline, month_end_day, opening_balance=130.0) == 0.24
+
+
+def test_batch_monthly_interest_with_opening_balances(timeline):
+    """Test that opening balances earn interest in the batch pass as in a single statement."""
+    ledger_df = pd.DataFrame(
+        {
+            "account_id": ["AC001", "AC002"],
+            "date": [20230701, 20230715],
+            "transaction_code": ["20230701-01", "20230715-01"],
+            "type": ["D", "D"],
+            "amount": [10.0, 500.0],
+            "balance": [10.0, 2500.0],
+        }
+    )
+    opening_balances = pd.Series({"AC002": 2000.0, "AC003": 130.0})
+    interest = batch_monthly_interest(ledger_df, timeline, "202307", opening_balances)
+    assert interest.to_dict() == {
+        "AC001": account_monthly_interest(ledger_df[ledger_df["account_id"] == "AC001"], timeline, "202307"),
+        "AC002": account_monthly_interest(ledger_df[ledger_df["account_id"] == "AC002"], timeline, "202307", 2000.0),
+        "AC003": 0.24,
+    }
+
+
+def test_opening_balance_segment_matches_batch(timeline):
+    """Test that statements and month-end posting give the opening balance the same days."""
+    month_df = pd.DataFrame({"account_id": ["AC001", "AC001"], "date": [20230612, 20230620],
+                             "transaction_code": ["20230612-01", "20230620-01"], "type": ["D", "D"],
+                             "amount": [100.0, 100.0], "balance": [1100.0, 1200.0]})
+    batch = batch_monthly_interest(month_df, timeline, "202306", pd.Series({"AC001": 1000.0}))
+    assert account_monthly_interest(month_df, timeline, "202306", 1000.0) == batch["AC001"]
+
+
+def test_opening_balance_earns_every_day_of_the_month(timeline):
+    """Test that a month with one transaction day earns as many days as one with none or two."""
+    months_df = pd.DataFrame({"account_id": ["AC001", "AC002", "AC002"], "date": [20230815, 20230815, 20230820],
+                              "transaction_code": ["20230815-01", "20230815-01", "20230820-01"], "type": ["D", "D", "D"],
+                              "amount": [0.01, 0.01, 0.01], "balance": [100000.01, 100000.01, 100000.02]})
+    _, month_end_day = month_bounds("202308")
+    no_postings = monthly_interest(np.array([], dtype=np.int64), np.array([]), timeline, month_end_day, opening_balance=100000.0)
+    assert no_postings == 186.85
+
+    opening_balances = pd.Series({"AC001": 100000.0, "AC002": 100000.0, "AC003": 100000.0})
+    batch = batch_monthly_interest(months_df, timeline, "202308", opening_balances)
+    assert batch.to_dict() == {"AC001": 186.85, "AC002": 186.85, "AC003": 186.85}
+    for account_id in ["AC001", "AC002"]:
+        assert account_monthly_interest(months_df[months_df["account_id"] == account_id], timeline, "202308", 100000.0) == 186.85
+
+
+def test_interest_adjustments(timeline):
+    """Test that posted interest is adjusted by the difference a backdated rule makes."""
+    ledger_df = pd.DataFrame({"account_id": ["AC001", "AC001", "AC001", "AC002"],
+                              "date": [20230505, 20230531, 20230610, 20230601],
+                              "transaction_code": ["20230505-01", "20230531-01", "20230610-01", "20230601-01"],
+                              "type": ["D", "I", "D", "D"], "amount": [1000.0, 0.0, 500.0, 200.0],
+                              "balance": [1000.0, 1000.0, 1500.0, 200.0]})
+    month_df = ledger_df.iloc[[0]]
+    ledger_df.loc[1, "amount"] = account_monthly_interest(month_df, timeline, "202305")
+    ledger_df.loc[[1, 2], "balance"] += ledger_df.loc[1, "amount"]
+
+    updated = timeline.copy()
+    updated.set_rate(to_day_ordinals([20230510])[0], 5.00)
+    adjustments = interest_adjustments(ledger_df, timeline, updated)
+    # Only AC001's posted May is adjusted; June's interest is not posted yet
+    expected = account_monthly_interest(month_df, updated, "202305") - ledger_df.loc[1, "amount"]
+    assert adjustments.to_dict("records") == [{"account_id": "AC001", "date": 20230531, "amount": pytest.approx(expected)}]
+    assert interest_adjustments(ledger_df, timeline, timeline.copy()).empty
+
+
+def test_simulate_interest_matches_monthly_batches(timeline):
+    """Test that each scenario column equals the month-end interest under that timeline."""
+    ledger_df = pd.DataFrame({"account_id": ["AC001", "AC002", "AC001", "AC001"],
+                              "date": [20230505, 20230520, 20230601, 20230626],
+                              "transaction_code": ["20230505-01", "20230520-01", "20230601-01", "20230626-01"],
+                              "type": ["D", "D", "D", "W"], "amount": [100.0, 300.0, 150.0, 20.0],
+                              "balance": [100.0, 300.0, 250.0, 230.0]})
+    doubled = RateTimeline(timeline.days, timeline.rates * 2)
+    simulated = simulate_interest(ledger_df, [timeline, doubled], "202305", "202306")
+
+    may = batch_monthly_interest(ledger_df, timeline, "202305")
+    june = batch_monthly_interest(ledger_df, timeline, "202306", pd.Series({"AC001": 100.0, "AC002": 300.0}))
+    assert simulated[0].to_dict() == pytest.approx((may + june).to_dict())
+    assert simulated.loc["AC002", 1] == pytest.approx(2 * simulated.loc["AC002", 0], abs=0.01)
@@ -0,0 +1,147 @@
+import pytest
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from ledger_index import LedgerIndex, BalanceHistory, transaction_key
+
+
+@pytest.fixture
+def ledger_df():
+    return pd.DataFrame(
+        {
+            "account_id": ["AC001", "AC002", "AC001", "AC001"],
+            "date": [20230102, 20230101, 20230101, 20230102],
+            "transaction_code": ["20230102-01", "20230101-01", "20230101-01", "20230102-02"],
+            "type": ["W", "D", "D", "D"],
+            "amount": [50.0, 200.0, 100.0, 10.0],
+            "balance": [50.0, 200.0, 100.0, 60.0],
+        }
+    )
+
+
+def test_index_orders_positions_by_transaction_code(ledger_df):
+    """Test that each account's row positions follow transaction order."""
+    index = LedgerIndex(ledger_df)
+    assert index.account_positions("AC001") == [2, 0, 3]
+    assert index.account_positions("AC002") == [1]
+    assert index.account_positions("AC999") == []
+
+
+def test_index_latest_balance_and_running_number(ledger_df):
+    """Test the O(1) latest balance and running number lookups."""
+    index = LedgerIndex(ledger_df)
+    assert "AC001" in index
+    assert index.latest_balance("AC001") == 60.0
+    assert index.latest_balance("AC999") == 0.0
+    assert index.next_running_number("AC001", 20230102) == 3
+    assert index.next_running_number("AC001", "20230103") == 1
+
+
+def test_index_insert(ledger_df):
+    """Test that inserting a backdated row returns its ordinal in the account's ledger."""
+    index = LedgerIndex(ledger_df)
+    assert index.insert("AC001", 20230101, 2, 4) == 1
+    assert index.account_positions("AC001") == [2, 4, 0, 3]
+    assert index.keys["AC001"][1] == transaction_key(20230101, 2)
+    assert index.next_running_number("AC001", 20230101) == 3
+
+
+def test_index_merge(ledger_df):
+    """Test that several new rows, some backdated, are slotted into the account's ledger at once."""
+    index = LedgerIndex(ledger_df)
+    keys = [transaction_key(20230103, 1), transaction_key(20230101, 2)]
+    assert index.merge("AC001", keys, [5, 4]) == 1
+    assert index.account_positions("AC001") == [2, 4, 0, 3, 5]
+    assert index.next_running_number("AC001", 20230101) == 3
+    assert index.merge("AC001", [transaction_key(20230104, 1)], [6]) == 5
+    assert index.account_positions("AC001")[-1] == 6
+
+
+def test_index_copy_only_duplicates_the_posted_account(ledger_df):
+    """Test that a copy for one account shares every other account's entries and leaves the original unchanged."""
+    index = LedgerIndex(ledger_df)
+    copied = index.copy("AC001")
+    copied.insert("AC001", 20230101, 2, 4)
+    assert copied.running_numbers["AC002"] is index.running_numbers["AC002"]
+    assert copied.positions["AC002"] is index.positions["AC002"]
+    assert index.account_positions("AC001") == [2, 0, 3]
+    assert index.next_running_number("AC001", 20230101) == 2
+    assert copied.next_running_number("AC001", 20230101) == 3
+
+
+def test_index_empty_frame():
+    """Test building an index over an empty ledger."""
+    index = LedgerIndex(pd.DataFrame(columns=["account_id", "date", "transaction_code", "type", "amount", "balance"]))
+    assert "AC001" not in index
+    assert index.next_running_number("AC001", 20230101) == 1
+
+
+def test_index_opening_balance():
+    """Test that month-end balances carry forward into later months."""
+    ledger_df = pd.DataFrame(
+        {
+            "account_id": ["AC001", "AC001", "AC001"],
+            "date": [20230105, 20230120, 20230310],
+            "transaction_code": ["20230105-01", "20230120-01", "20230310-01"],
+            "type": ["D", "W", "D"],
+            "amount": [100.0, 30.0, 10.0],
+            "balance": [100.0, 70.0, 80.0],
+        }
+    )
+    index = LedgerIndex(ledger_df)
+    assert index.month_ends["AC001"] == ([202301, 202303], [70.0, 80.0])
+    assert index.opening_balance("AC001", "202301") == 0.0
+    assert index.opening_balance("AC001", "202302") == 70.0
+    assert index.opening_balance("AC001", "202303") == 70.0
+    assert index.opening_balance("AC001", "202306") == 80.0
+    assert index.opening_balance("AC999", "202306") == 0.0
+
+
+def test_index_opening_balances_match_single_lookups(ledger_df):
+    """Test that the batched opening balances agree with opening_balance for every account and month."""
+    index = LedgerIndex(ledger_df)
+    index.month_ends["AC003"] = ([202212, 202302], [30.0, 40.0])
+    for month in ["202211", "202212", "202301", "202302", "202305"]:
+        expected = {account: index.opening_balance(account, month) for account in index.month_ends}
+        assert index.opening_balances(month).to_dict() == expected
+    assert LedgerIndex(ledger_df.iloc[:0]).opening_balances("202301").empty
+
+
+def test_balance_history_as_of(ledger_df):
+    """Test end-of-day balances found by binary search, including same-day postings."""
+    history = BalanceHistory(ledger_df)
+    assert history.balance_as_of("AC001", 20221231) == 0.0
+    assert history.balance_as_of("AC001", 20230101) == 100.0
+    assert history.balance_as_of("AC001", 20230102) == 60.0
+    assert history.balance_as_of("AC001", 20240101) == 60.0
+    assert history.balance_as_of("AC999", 20230101) == 0.0
+
+
+def test_balance_history_batched(ledger_df):
+    """Test that the batched form matches the scalar queries."""
+    history = BalanceHistory(ledger_df)
+    accounts = ["AC001", "AC002", "AC002", "AC999", "AC001"]
+    dates = [20230102, 20221231, 20230101, 20230101, 20230101]
+    assert history.balances_as_of(accounts, dates).tolist() == [60.0, 0.0, 200.0, 0.0, 100.0]
+    assert BalanceHistory(ledger_df.iloc[:0]).balances_as_of(accounts, dates).tolist() == [0.0] * 5
+
+
+def test_index_lowest_balance_from(ledger_df):
+    """Test the lowest balance a posting at a date would shift, in cents."""
+    index = LedgerIndex(ledger_df)
+    assert index.suffix_minimums["AC001"].tolist() == [5000, 5000, 6000]
+    assert index.lowest_balance_from("AC001", 20221231) == 0
+    assert index.lowest_balance_from("AC001", 20230101) == 5000
+    assert index.lowest_balance_from("AC001", 20230105) == 6000
+    assert index.lowest_balance_from("AC999", 20230101) == 0
+
+
+def test_index_update_suffix_minimums(ledger_df):
+    """Test that a backdated deposit raising the minimum recomputes the earlier minimums."""
+    index = LedgerIndex(ledger_df)
+    index.insert("AC001", 20230101, 2, 4)
+    index.update_suffix_minimums("AC001", 1, [13000, 8000, 9000], lambda: [10000])
+    assert index.suffix_minimums["AC001"].tolist() == [8000, 8000, 8000, 9000]
@@ -0,0 +1,65 @@
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from ledger_index import transaction_keys
+from ledger_schema import LEDGER_DTYPES, compact_ledger, concat_ledger
+
+
+@pytest.fixture
+def ledger_df():
+    return pd.DataFrame(
+        {
+            "account_id": ["AC002", "AC001", "AC001"],
+            "date": [20230101, 20230101, 20230102],
+            "transaction_code": ["20230101-01", "20230101-01", "20230102-01"],
+            "type": ["D", "D", "W"],
+            "amount": [200.0, 100.0, 50.0],
+            "balance": [200.0, 100.0, 50.0],
+        }
+    )
+
+
+def test_compact_ledger(ledger_df):
+    """Test that strings become categorical codes and dates 32-bit integers."""
+    compact_df = compact_ledger(ledger_df)
+    assert compact_df["account_id"].cat.categories.tolist() == ["AC001", "AC002"]
+    assert compact_df["type"].cat.codes.dtype == np.int8
+    assert compact_df["date"].dtype == np.int32
+    assert compact_df["account_id"].tolist() == ["AC002", "AC001", "AC001"]
+    assert compact_df["date"].iloc[0] == 20230101
+
+
+def test_concat_ledger_merges_categories(ledger_df):
+    """Test that new codes extend the sorted categories instead of falling back to strings."""
+    new_row = pd.DataFrame([{"account_id": "AC000", "date": 20230101, "transaction_code": "20230101-02",
+                             "type": "I", "amount": 1.0, "balance": 1.0}])
+    combined_df = concat_ledger([compact_ledger(ledger_df), new_row])
+    assert list(combined_df.index) == [0, 1, 2, 3]
+    assert all(combined_df[name].dtype == LEDGER_DTYPES[name] for name in ["date", "type", "amount", "balance"])
+    assert combined_df["account_id"].cat.categories.tolist() == ["AC000", "AC001", "AC002"]
+    assert combined_df.sort_values(by="transaction_code")["transaction_code"].tolist() == \
+        ["20230101-01", "20230101-01", "20230101-02", "20230102-01"]
+
+
+def test_transaction_keys_of_categorical_codes(ledger_df):
+    """Test that categorical codes parse to the same keys as strings."""
+    for expected, parsed in zip(transaction_keys(ledger_df["transaction_code"]),
+                                transaction_keys(compact_ledger(ledger_df)["transaction_code"])):
+        assert expected.tolist() == parsed.tolist()
+
+
+def test_account_ledger_stays_compact(ledger_df):
+    """Test that postings keep the account's ledger in the compact schema."""
+    account = Account({"date_col": "date", "tansaction_col": "transaction_code", "type_col": "type",
+                       "amount_col": "amount", "account_title": "Account"}, test_enabled=True)
+    account.df = ledger_df
+    account.clean_transaction("20230103", "AC003", "D", "10")
+    assert isinstance(account.df["account_id"].dtype, pd.CategoricalDtype)
+    assert isinstance(account.df["transaction_code"].dtype, pd.CategoricalDtype)
+    assert account.df["date"].dtype == np.int32
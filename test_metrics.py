@@ -0,0 +1,76 @@
+import pytest
+import json
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from metrics import Metrics, METRICS
+
+
+@pytest.fixture
+def metrics():
+    return Metrics().configure({"metrics_enabled": True})
+
+
+@pytest.fixture
+def enabled_metrics():
+    # The shared registry, enabled for one test only
+    METRICS.configure({"metrics_enabled": True})
+    METRICS.reset()
+    yield METRICS
+    METRICS.configure({})
+    METRICS.reset()
+
+
+def test_disabled_metrics_record_nothing():
+    """Test that stages and counters are no-ops unless enabled."""
+    metrics = Metrics().configure({})
+    with metrics.stage("account.rebalance"):
+        metrics.count("rows_scanned", 10)
+    assert metrics.snapshot() == {"stages": {}, "counters": []}
+
+
+def test_counters_are_attributed_to_the_innermost_stage(metrics):
+    """Test that nested stages are timed separately and own their counters."""
+    with metrics.stage("account.post_transaction"):
+        metrics.count("frames_copied")
+        with metrics.stage("account.rebalance"):
+            metrics.count("rows_scanned", 5)
+    snapshot = metrics.snapshot()
+    assert snapshot["stages"]["account.rebalance"]["calls"] == 1
+    assert snapshot["stages"]["account.post_transaction"]["seconds"] >= snapshot["stages"]["account.rebalance"]["seconds"]
+    assert snapshot["counters"] == [{"counter": "frames_copied", "stage": "account.post_transaction", "value": 1},
+                                    {"counter": "rows_scanned", "stage": "account.rebalance", "value": 5}]
+
+
+def test_prometheus_text(metrics):
+    """Test the Prometheus text exposition of timers and counters."""
+    with metrics.stage("rule.set_rule"):
+        metrics.count("rules_evaluated", 3)
+    text = metrics.prometheus_text()
+    assert 'bank_stage_calls_total{stage="rule.set_rule"} 1' in text
+    assert 'bank_rules_evaluated_total{stage="rule.set_rule"} 3' in text
+    assert "# TYPE bank_stage_seconds_total counter" in text
+
+
+def test_dump_json(metrics, tmp_path):
+    """Test that a .json metrics file holds the snapshot."""
+    with metrics.stage("statement.preprocess"):
+        pass
+    path = metrics.dump(str(tmp_path / "metrics.json"))
+    with open(path, encoding="utf-8") as file:
+        assert json.load(file)["stages"]["statement.preprocess"]["calls"] == 1
+
+
+def test_posting_is_instrumented(enabled_metrics):
+    """Test that a posting reports its stages and the rows it rebalanced."""
+    account = Account({}, test_enabled=True)
+    account.df = pd.DataFrame({"account_id": ["AC001"], "date": [20230101], "transaction_code": ["20230101-01"],
+                               "type": ["D"], "amount": [100.0], "balance": [100.0]})
+    account.post_transaction("20230102", "AC001", "D", "10")
+    snapshot = enabled_metrics.snapshot()
+    assert snapshot["stages"]["account.post_transaction"]["calls"] == 1
+    assert {"counter": "rows_scanned", "stage": "account.rebalance", "value": 1} in snapshot["counters"]
@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from helper import to_day_ordinals
+from rate_timeline import RateTimeline, stacked_rate_unit_days
+
+
+@pytest.fixture
+def timeline():
+    return RateTimeline(to_day_ordinals([20230520, 20230101, 20230615]), [1.90, 1.95, 2.20])
+
+
+def test_rate_at(timeline):
+    """Test that each day picks up the latest rule on or before it."""
+    assert timeline.rate_at(to_day_ordinals([20221231])[0]) == 0.0
+    assert timeline.rate_at(to_day_ordinals([20230519])[0]) == 1.95
+    assert timeline.rate_at(to_day_ordinals([20230520])[0]) == 1.90
+    assert timeline.effective_until[0] == to_day_ordinals([20230520])[0]
+
+
+def test_segments_and_daily_rates(timeline):
+    """Test the constant-rate segments between two days."""
+    first_day, last_day = to_day_ordinals([20230519, 20230616])
+    starts, ends, rates = timeline.segments(first_day, last_day + 1)
+    assert (ends - starts).tolist() == [1, 26, 2]
+    assert rates.tolist() == [1.95, 1.90, 2.20]
+    assert timeline.daily_rates(first_day, first_day + 2).tolist() == [1.95, 1.90, 1.90]
+
+
+def test_rate_days(timeline):
+    """Test that accumulated rate-days match summing the daily rates."""
+    starts = to_day_ordinals([20221225, 20230510, 20230601])
+    ends = to_day_ordinals([20230105, 20230620, 20230602])
+    expected = [timeline.daily_rates(start, end - 1).sum() for start, end in zip(starts, ends)]
+    assert np.allclose(timeline.rate_days(starts, ends), expected)
+
+
+def test_set_rate(timeline):
+    """Test adding and replacing rules incrementally."""
+    assert timeline.set_rate(to_day_ordinals([20230301])[0], 1.5) is True
+    assert timeline.set_rate(to_day_ordinals([20230520])[0], 3.0) is False
+    assert timeline.rates.tolist() == [1.95, 1.5, 3.0, 2.20]
+    assert timeline.rate_days(to_day_ordinals([20230519]), to_day_ordinals([20230521]))[0] == pytest.approx(4.5)
+
+
+def test_rate_unit_days_are_exact(timeline):
+    """Test that rates accumulate as integer hundredths of a percent."""
+    assert timeline.rate_units.tolist() == [195, 190, 220]
+    unit_days = timeline.rate_unit_days(to_day_ordinals([20230101]), to_day_ordinals([20231231]))
+    assert unit_days.dtype == np.int64
+    assert unit_days[0] == 195 * 139 + 190 * 26 + 220 * 199
+
+
+def test_changed_range(timeline):
+    """Test the days whose rate differs after a rule is added or replaced."""
+    backdated = timeline.copy()
+    backdated.set_rate(to_day_ordinals([20230301])[0], 3.00)
+    assert backdated.changed_range(timeline) == tuple(to_day_ordinals([20230301, 20230520]))
+    latest = timeline.copy()
+    latest.set_rate(to_day_ordinals([20230615])[0], 2.50)
+    assert latest.changed_range(timeline) == (to_day_ordinals([20230615])[0], None)
+    assert timeline.copy().changed_range(timeline) is None
+
+
+def test_stacked_rate_unit_days(timeline):
+    """Test that stacked timelines give each timeline's own rate-unit days."""
+    other = RateTimeline(to_day_ordinals([20230301]), [4.00])
+    starts, ends = to_day_ordinals([20221220, 20230215, 20230601]), to_day_ordinals([20230110, 20230315, 20230630])
+    matrix = stacked_rate_unit_days([timeline, other, RateTimeline()], starts, ends)
+    assert matrix.shape == (3, 3)
+    assert matrix[0].tolist() == timeline.rate_unit_days(starts, ends).tolist()
+    assert matrix[1].tolist() == other.rate_unit_days(starts, ends).tolist()
+    assert matrix[2].tolist() == [0, 0, 0]
@@ -0,0 +1,152 @@
+import pytest
+import pandas as pd
+import sys
+import os
+import threading
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from rule import Rule
+from compute_transaction import ComputeTransaction
+from repository import ConnectionPool, SqlLedgerRepository, SqlRuleRepository
+
+
+@pytest.fixture
+def pool(tmp_path):
+    # SQLite stands in for PostgreSQL
+    pool = ConnectionPool.for_sqlite(str(tmp_path / "ledger.db"), size=2)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def ledger_df():
+    return pd.DataFrame(
+        {
+            "account_id": ["AC001", "AC001", "AC002"],
+            "date": [20230101, 20230102, 20230101],
+            "transaction_code": ["20230101-01", "20230102-01", "20230101-01"],
+            "type": ["D", "W", "D"],
+            "amount": [100.0, 50.0, 200.0],
+            "balance": [100.0, 50.0, 200.0],
+        }
+    )
+
+
+def test_ledger_repository_statement_reads(pool, ledger_df):
+    """Test that statement rows and opening balances are computed by the database."""
+    repository = SqlLedgerRepository(pool)
+    assert repository.is_empty()
+    repository.compact(ledger_df)
+    repository.append(pd.DataFrame([{"account_id": "AC001", "date": 20230101, "transaction_code": "20230101-02",
+                                     "type": "D", "amount": 5.0, "balance": 0.0}]))
+
+    assert repository.has_account("AC001") and not repository.has_account("AC009")
+    assert repository.opening_balance("AC001", 20230102) == 105.0
+    month_df = repository.month_transactions("AC001", 20230102, 20230131)
+    assert month_df["transaction_code"].tolist() == ["20230102-01"]
+    assert month_df["balance"].tolist() == [55.0]
+
+
+def test_ledger_repository_transaction_versions(pool):
+    """Test that each transaction counts against the accounts it locks, and a failed one commits nothing."""
+    repository = SqlLedgerRepository(pool)
+    with repository.transaction(["AC002", "AC001"]) as versions:
+        assert versions == {"AC001": 1, "AC002": 1}
+    with pytest.raises(RuntimeError):
+        with repository.transaction(["AC001"]):
+            repository.append(pd.DataFrame([{"account_id": "AC001", "date": 20230101, "transaction_code": "20230101-01",
+                                             "type": "D", "amount": 5.0}]))
+            raise RuntimeError
+    assert repository.is_empty()
+    with repository.transaction() as versions:
+        assert versions == {"AC001": 2, "AC002": 2}
+
+
+def test_ledger_repository_load(pool, ledger_df):
+    """Test loading running balances for some or all accounts."""
+    repository = SqlLedgerRepository(pool)
+    repository.compact(ledger_df)
+
+    loaded_df, logged_accounts = repository.load(accounts=["AC002"])
+    assert loaded_df["transaction_code"].tolist() == ["20230101-01"]
+    assert len(logged_accounts) == 0
+    assert sorted(repository.load()[0]["balance"].tolist()) == [50.0, 100.0, 200.0]
+
+
+def test_rule_repository_upsert(pool):
+    """Test that a rule replaces the existing rule of the same date."""
+    repository = SqlRuleRepository(pool)
+    repository.compact(pd.DataFrame({"date": [20230101, 20230520], "rule_id": ["RULE01", "RULE02"], "rate": [1.95, 1.90]}))
+    repository.append(pd.DataFrame([{"date": 20230520, "rule_id": "RULE03", "rate": 2.2}]))
+    assert repository.load()["rule_id"].tolist() == ["RULE01", "RULE03"]
+
+
+def test_account_and_rule_on_repository(pool):
+    """Test that Account and Rule seed, persist to and reload from the repository."""
+    config = {"date_col": "date", "tansaction_col": "transaction_code", "type_col": "type", "amount_col": "amount",
+              "account_title": "Account", "rule_col": "rule_id", "rate_col": "rate", "interest_rule_title": "Rules"}
+    account = Account(config, store=SqlLedgerRepository(pool))
+    account.clean_transaction("20230701", "AC003", "D", "10")
+    rule = Rule(config, store=SqlRuleRepository(pool))
+    rule.clean_rule("20230701", "RULE09", "3.00")
+
+    reloaded = Account(config, store=SqlLedgerRepository(pool))
+    assert reloaded.ledger_index.latest_balance("AC003") == 140.0
+    assert len(reloaded.df) == len(account.df)
+    assert Rule(config, store=SqlRuleRepository(pool)).df["rule_id"].iloc[-1] == "RULE09"
+
+
+@pytest.fixture
+def config():
+    return {"date_col": "date", "tansaction_col": "transaction_code", "type_col": "type", "amount_col": "amount",
+            "account_title": "Account", "rule_col": "rule_id", "rate_col": "rate", "interest_rule_title": "Rules"}
+
+
+def test_processes_sharing_the_ledger(pool, config):
+    """Test that each process checks, numbers and reads statements against the postings of the others."""
+    account = Account(config, store=SqlLedgerRepository(pool))
+    other = Account(config, store=SqlLedgerRepository(pool))
+    rule = Rule(config, store=SqlRuleRepository(pool))
+
+    # AC002 holds 2000.00; each process sees the other's withdrawal before checking its own
+    assert account.check_transaction("20230701", "AC002", "W", "1500") is None
+    account.post_transaction("20230701", "AC002", "W", "1500")
+    assert other.check_transaction("20230701", "AC002", "W", "1500") == "You cannot withdraw more than your current balance."
+    assert other.post_transactions(pd.Series(["20230701 AC002 W 1500"]))["reason"].tolist() == \
+        ["You cannot withdraw more than your current balance."]
+    assert SqlLedgerRepository(pool).opening_balance("AC002", 20230702) == 500.0
+
+    # A check passed before the other process posted is repeated under the lock
+    assert other.check_transaction("20230702", "AC002", "W", "400") is None
+    account.post_transaction("20230702", "AC002", "W", "400")
+    with pytest.raises(ValueError, match="You cannot withdraw more than your current balance."):
+        other.post_transaction("20230702", "AC002", "W", "400")
+
+    other.post_transaction("20230701", "AC002", "D", "10")
+    assert other.ledger_index.latest_balance("AC002") == 110.0
+    statement_df = ComputeTransaction(config).statement(account, rule, "AC002", "202307")
+    assert statement_df["Txn Id"].tolist()[:3] == ["20230701-01", "20230701-02", "20230702-01"]
+    assert statement_df["Balance"].tolist()[:3] == ["500.00", "510.00", "110.00"]
+    assert ComputeTransaction(config).check_statement(account.snapshot(), "AC009", "202307") == "Account AC009 not found."
+
+
+def test_concurrent_processes_never_overdraw(pool, config):
+    """Test that withdrawals posted concurrently by several processes never overdraw an account."""
+    accounts = [Account(config, store=SqlLedgerRepository(pool)) for _ in range(2)]
+    posted = []
+
+    def withdraw(account, first_day):
+        # Each process posts on its own days, so only the overdraft check keeps them apart
+        for day in range(first_day, first_day + 10):
+            result = account.post_transactions(pd.Series([f"202307{day:02} AC002 W 300"]))
+            posted.extend(result.loc[result["reason"] == "", "transaction_code"])
+
+    threads = [threading.Thread(target=withdraw, args=(account, 1 + 10 * number)) for number, account in enumerate(accounts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(posted) == 6 and len(set(posted)) == 6
+    assert SqlLedgerRepository(pool).opening_balance("AC002", 20230801) == 200.0
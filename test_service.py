@@ -0,0 +1,97 @@
+import pytest
+import json
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from rule import Rule
+from service import BankService
+from main import cli
+
+
+@pytest.fixture
+def mock_config():
+    return {}
+
+
+@pytest.fixture
+def service(mock_config):
+    account = Account(mock_config, test_enabled=True)
+    account.df = pd.DataFrame(
+        {
+            "account_id": ["AC003", "AC003", "AC003", "AC003"],
+            "date": [20230505, 20230601, 20230626, 20230626],
+            "transaction_code": ["20230505-01", "20230601-01", "20230626-01", "20230626-02"],
+            "type": ["D", "D", "W", "W"],
+            "amount": [100.0, 150.0, 20.0, 100.0],
+            "balance": [100.0, 250.0, 230.0, 130.0],
+        }
+    )
+    return BankService(mock_config, account, Rule(mock_config))
+
+
+def test_post_transaction(service, capsys):
+    """Test that a posting returns the new row without printing."""
+    result = service.post_transaction(20230701, "AC003", "w", 30)
+    assert result == {"ok": True, "account_id": "AC003", "date": 20230701, "transaction_code": "20230701-01",
+                      "type": "W", "amount": 30.0, "balance": 100.0}
+    assert capsys.readouterr().out == ""
+
+
+def test_post_transaction_rejected(service):
+    """Test that invalid postings return the reason instead of printing it."""
+    assert service.post_transaction("20230701", "AC003", "W", "500") == \
+        {"ok": False, "error": "You cannot withdraw more than your current balance."}
+    assert service.post_transaction("20230701", "AC009", "W", "5") == \
+        {"ok": False, "error": "You cannot withdraw before you have a balance."}
+    assert service.post_transaction("2023-07-01", "AC003", "D", "5")["error"] == "2023-07-01 is not a valid YYYYMMdd date."
+
+
+def test_define_rule_and_statement(service):
+    """Test that a new rule is applied to the next statement."""
+    assert service.define_rule("20230615", "RULE09", "3.65") == {"ok": True, "date": 20230615, "rule_id": "RULE09",
+                                                                 "rate": 3.65, "added": False}
+    result = service.get_statement("AC003", "202306")
+    assert result["ok"] and [row["type"] for row in result["rows"]] == ["D", "W", "W", "I"]
+    assert result["rows"][-1]["amount"] == 0.52
+    assert service.get_statement("AC009", "202306") == {"ok": False, "error": "Account AC009 not found."}
+    assert service.get_statement("AC003", "202306-202306")["rows"] == result["rows"]
+    assert service.get_statement("AC003", "202306-") == {"ok": False, "error": "202306- is not a valid YYYYMM date."}
+
+
+def test_get_balance(service):
+    """Test the point-in-time balance, which follows later postings."""
+    assert service.get_balance("AC003", "20230615") == {"ok": True, "account_id": "AC003", "date": 20230615, "balance": 250.0}
+    service.post_transaction("20230610", "AC003", "D", "5")
+    assert service.execute("balance", "AC003", "20230626")["balance"] == 135.0
+    assert service.get_balance("AC003", "20230631")["error"] == "20230631 is not a valid YYYYMMdd date."
+
+
+def test_define_rule_adjusts_posted_interest(service):
+    """Test that a backdated rule posts an adjustment for interest already posted."""
+    service.compute_transaction.post_month_end_interest(service.account, service.rule, "202305")
+    result = service.define_rule("20230501", "RULE04", "3.00")
+    assert [(row["account_id"], row["date"]) for row in result["adjustments"]] == [("AC003", 20230531)]
+    assert result["adjustments"][0]["amount"] > 0
+    assert service.account.df["type"].tolist().count("I") == 2
+
+
+def test_run_batch(service):
+    """Test one result per command line, skipping blanks and comments."""
+    lines = ["post 20230701 AC003 D 10", "", "# comment", "statement AC003 2023-07", "unknown", "rule 20230701"]
+    assert [result.get("error") for result in service.run_batch(lines)] == [
+        None, "2023-07 is not a valid YYYYMM date.", "Unknown command unknown.", "Wrong number of arguments for rule."]
+
+
+def test_cli(service, capsys, tmp_path):
+    """Test the batch subcommands print JSON results and exit non-zero on failures."""
+    assert cli(["post", "20230701", "AC003", "D", "10"], service) == 0
+    assert json.loads(capsys.readouterr().out)["balance"] == 140.0
+
+    path = tmp_path / "commands.txt"
+    path.write_text("post 20230702 AC003 D 10\npost 20230702 AC003 W 1000\n")
+    assert cli(["batch", str(path)], service) == 1
+    assert [json.loads(line)["ok"] for line in capsys.readouterr().out.splitlines()] == [True, False]
@@ -0,0 +1,42 @@
+import pytest
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from rule import Rule
+from simulation import InterestSimulation
+
+
+@pytest.fixture
+def account():
+    account = Account({}, test_enabled=True)
+    account.df = pd.DataFrame(
+        {
+            "account_id": ["AC003", "AC003", "AC002", "AC003", "AC003"],
+            "date": [20230505, 20230601, 20230601, 20230626, 20230626],
+            "transaction_code": ["20230505-01", "20230601-01", "20230601-01", "20230626-01", "20230626-02"],
+            "type": ["D", "D", "D", "W", "W"],
+            "amount": [100.0, 150.0, 2000.0, 20.0, 100.0],
+            "balance": [100.0, 250.0, 2000.0, 230.0, 130.0],
+        }
+    )
+    return account
+
+
+def test_run_scenarios(account):
+    """Test per-account and total interest for each scenario, with nothing posted."""
+    # rule.txt holds RULE01 1.95 from 20230101, RULE02 1.90 from 20230520 and RULE03 2.20 from 20230615
+    rule = Rule({})
+    simulation = InterestSimulation({})
+    scenarios = {"current": rule.timeline, "higher": simulation.scenario(rule, [("20230601", "4.40")])}
+    result = simulation.run(account, scenarios, "202306", "202306")
+
+    assert list(result["per_account"].columns) == ["current", "higher"]
+    assert result["per_account"].loc["AC003", "current"] == 0.39
+    assert result["totals"]["higher"] > result["totals"]["current"]
+    assert result["timing"]["scenarios"] == 2
+    assert result["timing"]["segment_seconds"] > 0 and result["timing"]["marginal_pricing_seconds"] >= 0
+    assert len(account.df) == 5 and len(rule.timeline) == 3
@@ -0,0 +1,65 @@
+import pytest
+import json
+import pandas as pd
+import sys
+import os
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from account import Account
+from rule import Rule
+from statement_export import StatementExport
+
+
+@pytest.fixture
+def mock_config():
+    return {"rule_col": "rule_id", "rate_col": "rate", "interest_rule_title": "Interest rules"}
+
+
+@pytest.fixture
+def account(mock_config):
+    account = Account(mock_config, test_enabled=True)
+    account.df = pd.DataFrame(
+        {
+            "account_id": ["AC003", "AC003", "AC002", "AC003", "AC003", "AC001"],
+            "date": [20230505, 20230601, 20230601, 20230626, 20230626, 20230701],
+            "transaction_code": ["20230505-01", "20230601-01", "20230601-01", "20230626-01", "20230626-02", "20230701-01"],
+            "type": ["D", "D", "D", "W", "W", "D"],
+            "amount": [100.0, 150.0, 2000.0, 20.0, 100.0, 10.0],
+            "balance": [100.0, 250.0, 2000.0, 230.0, 130.0, 10.0],
+        }
+    )
+    return account
+
+
+@pytest.fixture
+def rule(mock_config):
+    return Rule(mock_config)
+
+
+def test_records_are_unformatted(mock_config, account, rule):
+    """Test that statement records are yielded lazily with raw values."""
+    records = StatementExport(mock_config).records(account, rule, "202306")
+    assert next(records) == {"account_id": "AC002", "date": 20230601, "transaction_code": "20230601-01",
+                             "type": "D", "amount": 2000.0, "balance": 2000.0}
+    assert [record["account_id"] for record in records] == ["AC002", "AC003", "AC003", "AC003", "AC003"]
+
+
+def test_export_csv_per_account(mock_config, account, rule, tmp_path):
+    """Test one CSV per account with a statement, formatted at write time."""
+    paths = StatementExport(mock_config).export(account, rule, "202306", str(tmp_path))
+    assert [os.path.basename(path) for path in paths] == ["AC002_202306.csv", "AC003_202306.csv"]
+
+    statement_df = pd.read_csv(tmp_path / "AC003_202306.csv", dtype=str, keep_default_na=False)
+    assert statement_df.columns.tolist() == ["Date", "Txn Id", "Type", "Amount", "Balance"]
+    assert statement_df.iloc[-1].tolist() == ["20230630", "", "I", "0.39", "130.39"]
+
+
+def test_export_consolidated_jsonl(mock_config, account, rule, tmp_path):
+    """Test a single JSON Lines file holding every account's statement."""
+    paths = StatementExport(mock_config).export(account, rule, "202306", str(tmp_path), format="jsonl", consolidated=True)
+    with open(paths[0], encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert len(records) == 6
+    assert records[-1] == {"account_id": "AC003", "date": 20230630, "transaction_code": "", "type": "I",
+                           "amount": 0.39, "balance": 130.39}
@@ -0,0 +1,59 @@
+import pytest
+import pandas as pd
+import sys
+import os
+from unittest.mock import MagicMock
+# Add the current directory to sys.path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from rate_timeline import RateTimeline
+from statement_run import StatementRun, encode_ledger
+
+
+@pytest.fixture
+def account():
+    account = MagicMock()
+    account.df = pd.DataFrame(
+        {
+            "account_id": ["AC003", "AC003", "AC002", "AC003", "AC003"],
+            "date": [20230505, 20230601, 20230601, 20230626, 20230626],
+            "transaction_code": ["20230505-01", "20230601-01", "20230601-01", "20230626-01", "20230626-02"],
+            "type": ["D", "D", "D", "W", "W"],
+            "amount": [100.0, 150.0, 2000.0, 20.0, 100.0],
+            "balance": [100.0, 250.0, 2000.0, 230.0, 130.0],
+        }
+    )
+    return account
+
+
+@pytest.fixture
+def rule():
+    rule = MagicMock()
+    rule.timeline = RateTimeline.from_rules(
+        pd.DataFrame({"date": [20230101, 20230520, 20230615], "rule_id": ["RULE01", "RULE02", "RULE03"], "rate": [1.95, 1.90, 2.20]}))
+    return rule
+
+
+def test_encode_ledger(account):
+    """Test that each account's rows are contiguous and in transaction order."""
+    columns, account_ids, offsets = encode_ledger(account.df)
+    assert account_ids == ["AC002", "AC003"]
+    assert offsets.tolist() == [0, 1, 5]
+    assert columns["balance"].tolist() == [2000.0, 100.0, 250.0, 230.0, 130.0]
+    assert columns["type"].tolist() == [0, 0, 0, 1, 1]
+
+
+def test_statement_run(account, rule, tmp_path):
+    """Test that every account's statement is written by the process pool."""
+    paths = StatementRun({}, processes=2).run(account, rule, "202306", str(tmp_path))
+    assert sorted(os.path.basename(path) for path in paths) == ["AC002_202306.csv", "AC003_202306.csv"]
+
+    statement_df = pd.read_csv(tmp_path / "AC003_202306.csv", dtype=str, keep_default_na=False)
+    assert statement_df["Txn Id"].tolist() == ["20230601-01", "20230626-01", "20230626-02", ""]
+    assert statement_df.iloc[-1].tolist() == ["20230630", "", "I", "0.39", "130.39"]
+
+
+def test_statement_run_selected_accounts(account, rule, tmp_path):
+    """Test restricting the run to some accounts."""
+    paths = StatementRun({}, processes=1).run(account, rule, "202306", str(tmp_path), account_ids=["AC002"])
+    assert [os.path.basename(path) for path in paths] == ["AC002_202306.csv"]